@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""
+Booking import benchmark: tj3 icalreport (.ics) against export report (.tjp) parsing
+
+Runs without tj3 on synthetic report files. Every task is split into two segments in the
+export report, which the ICS report can not express.
+
+    python benchmarks/bench_booking_import.py [sizes...]
+"""
+
+import datetime, os, sys, tempfile, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import juggler
+
+SIZES = [10000, 50000]
+
+def make_juggler(count):
+    jg = juggler.GenericJuggler()
+    jg.src = juggler.JugglerSource()
+    for i in range(1, count + 1):
+        t = juggler.JugglerTask()
+        t.set_id(i)
+        jg.add_task(t)
+    return jg
+
+def make_reports(count, ics_path, export_path):
+    start = datetime.datetime(2017, 10, 10, 9)
+    with open(ics_path, 'w') as ics, open(export_path, 'w') as export:
+        ics.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n")
+        for i in range(1, count + 1):
+            end = start + datetime.timedelta(hours=2)
+            ident = juggler.to_identifier(i)
+            ics.write("BEGIN:VEVENT\r\nUID:default-%s-VEVENT\r\nDTSTART:%s\r\nDTEND:%s\r\nEND:VEVENT\r\n" % (
+                ident, start.strftime("%Y%m%dT%H%M%SZ"), end.strftime("%Y%m%dT%H%M%SZ")))
+            export.write("supplement task %s {\n  booking me %s + 1.0h,\n    %s + 1.0h\n}\n" % (
+                ident, start.strftime("%Y-%m-%d-%H:%M-+0000"), (start + datetime.timedelta(hours=1)).strftime("%Y-%m-%d-%H:%M-+0000")))
+            start = end
+        ics.write("END:VCALENDAR\r\n")
+
+def timed(func, *args):
+    started = time.time()
+    func(*args)
+    return time.time() - started
+
+def bench(count):
+    jg = make_juggler(count)
+    ics = tempfile.mkstemp(".ics")[1]
+    export = tempfile.mkstemp(".tjp")[1]
+    try:
+        make_reports(count, ics, export)
+        return (timed(jg.read_ical_result, ics),
+                timed(jg.read_export_result, export),
+                len(jg.walk(juggler.JugglerBooking)))
+    finally:
+        os.remove(ics)
+        os.remove(export)
+
+def main(sizes):
+    logging.getLogger().setLevel(logging.WARNING)
+    print("%10s %12s %12s %10s" % ("tasks", "ical s", "export s", "bookings"))
+    for count in sizes:
+        print("%10d %12.3f %12.3f %10d" % ((count,) + bench(count)))
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or SIZES)
@@ -0,0 +1,44 @@
+#!/usr/bin/env python
+
+"""
+Bulk import benchmark: DictJuggler object tree vs. columnar TableJuggler
+
+Builds the project from records and renders it to /dev/null, reporting build and render
+time and the memory held by the project (see bench_memory).
+
+    python benchmarks/bench_columnar.py [sizes...]
+"""
+
+import os, sys, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import jsonjuggler, columnar
+from bench_memory import make_issues, reachable_size
+
+SIZES = [10000, 100000, 1000000]
+TREE_LIMIT = 100000 # the object tree gets too big to measure beyond this
+
+def bench(cls, issues):
+    started = time.time()
+    jg = cls(issues)
+    jg.juggle()
+    built = time.time()
+    with open(os.devnull, 'w') as out:
+        jg.src.write_to(out)
+    rendered = time.time()
+    return built - started, rendered - built, reachable_size(jg.src)
+
+def main(sizes):
+    logging.getLogger().setLevel(logging.WARNING)
+    print("%10s %8s %10s %10s %12s" % ("tasks", "store", "build s", "render s", "bytes/task"))
+    for count in sizes:
+        issues = make_issues(count)
+        for name, cls in (("tree", jsonjuggler.DictJuggler), ("columns", columnar.TableJuggler)):
+            if cls is jsonjuggler.DictJuggler and count > TREE_LIMIT:
+                continue
+            build, render, size = bench(cls, issues)
+            print("%10d %8s %10.2f %10.2f %12d" % (count, name, build, render, size // count))
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or SIZES)
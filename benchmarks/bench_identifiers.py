@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""
+Identifier conversion benchmark: to_identifier/from_identifier against the JugglerIdentifiers table
+
+Ids look like tracker keys ("PROJ-123"), every task depends on up to [fan-out] earlier ones, so
+most conversions are dependency references. Also times rendering the whole project.
+
+    python benchmarks/bench_identifiers.py [tasks] [fan-out]
+"""
+
+import os, sys, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import juggler
+
+def make_issues(count, fanout):
+    return [{"id": "PROJ-%d" % i, "effort": 1, "depends": ["PROJ-%d" % (i - d) for d in range(1, min(i, fanout) + 1)]}
+            for i in range(count)]
+
+def timed(func, *args):
+    started = time.time()
+    func(*args)
+    return time.time() - started
+
+def main(count=100000, fanout=10):
+    logging.getLogger().setLevel(logging.WARNING)
+    issues = make_issues(count, fanout)
+    references = [dep for issue in issues for dep in issue["depends"]] + [issue["id"] for issue in issues]
+    table = juggler.JugglerIdentifiers()
+    idents = [table.to_identifier(issue["id"]) for issue in issues]
+    print("%d ids, %d references" % (count, len(references)))
+    print("%-28s %10s" % ("", "seconds"))
+    print("%-28s %10.3f" % ("to_identifier", timed(lambda: [juggler.to_identifier(id) for id in references])))
+    print("%-28s %10.3f" % ("table.to_identifier", timed(lambda: [table.to_identifier(id) for id in references])))
+    print("%-28s %10.3f" % ("from_identifier", timed(lambda: [juggler.from_identifier(ident) for ident in idents])))
+    print("%-28s %10.3f" % ("table.from_identifier", timed(lambda: [table.from_identifier(ident) for ident in idents])))
+    jg = juggler.GenericJuggler()
+    jg.src = juggler.JugglerSource()
+    for issue in issues:
+        task = juggler.JugglerTask()
+        task.set_id(issue["id"])
+        depends = juggler.JugglerTaskDepends()
+        depends.set_value(issue["depends"])
+        task.set_property(depends)
+        jg.src.set_property(task)
+    with open(os.devnull, 'w') as out:
+        print("%-28s %10.3f" % ("write_file", timed(jg.write_file, out)))
+        jg.src.identifiers = juggler.NO_IDENTIFIERS
+        print("%-28s %10.3f" % ("write_file without table", timed(jg.write_file, out)))
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""
+Import-time benchmark: milliseconds to import each module in a fresh interpreter
+
+Reports the median over several runs and the heavy dependencies every import left loaded.
+With --importtime the interpreter's own per-module breakdown (python -X importtime, Python
+3.7+) of the slowest module is printed as well; Python 2 has no such option.
+
+    python benchmarks/bench_import.py [--runs 7] [--importtime] [modules...]
+"""
+
+import argparse, os, subprocess, sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+MODULES = ["taskjuggler_python.juggler", "taskjuggler_python.jsonjuggler", "taskjuggler_python.columnar",
+           "taskjuggler_python.tjpy_client"]
+HEAVY = ["icalendar", "dateutil", "subprocess", "tempfile", "shutil", "multiprocessing", "urllib2",
+         "airtable", "requests", "numpy"]
+
+PROBE = '''
+import sys, time, json
+started = time.time()
+import %s
+elapsed = time.time() - started
+print(json.dumps([elapsed * 1000, [name for name in %r if sys.modules.get(name) is not None]]))
+'''
+
+def measure(module, runs):
+    '''
+    Import a module in fresh interpreters
+
+    Returns:
+        tuple: median milliseconds, heavy modules loaded by the import
+    '''
+    import json
+    times = []
+    for _ in range(runs):
+        out = subprocess.check_output([sys.executable, "-c", PROBE % (module, HEAVY)], cwd=ROOT)
+        elapsed, loaded = json.loads(out.decode())
+        times.append(elapsed)
+    times.sort()
+    return times[len(times) // 2], loaded
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark module import time")
+    parser.add_argument('modules', nargs='*', default=MODULES)
+    parser.add_argument('--runs', type=int, default=7)
+    parser.add_argument('--importtime', action='store_true', help='Print -X importtime of the slowest module')
+    args = parser.parse_args()
+
+    print("%-34s %10s  %s" % ("module", "ms", "heavy modules loaded"))
+    slowest = None
+    for module in args.modules:
+        elapsed, loaded = measure(module, args.runs)
+        print("%-34s %10.1f  %s" % (module, elapsed, ", ".join(loaded) or "-"))
+        if slowest is None or elapsed > slowest[0]:
+            slowest = (elapsed, module)
+    if args.importtime:
+        if sys.version_info < (3, 7):
+            sys.stderr.write("-X importtime needs Python 3.7+\n")
+            return
+        subprocess.call([sys.executable, "-X", "importtime", "-c", "import " + slowest[1]], cwd=ROOT)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python
+
+"""
+JSON ingestion benchmark: peak memory and time of building the tree from a JSON export
+
+Compares JsonJuggler on the whole text (read and parsed at once) with JsonJuggler on the file
+path, which parses the records page by page. Every measurement runs in its own process, so
+the peak RSS is its own.
+
+    python benchmarks/bench_json_stream.py [--tasks 200000] [--ndjson]
+"""
+
+import argparse, json, os, resource, subprocess, sys, tempfile, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from synthetic import make_plan
+
+MODES = ["text", "path"]
+
+def peak_rss():
+    '''Peak resident set size of this process in MB'''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+def measure(mode, path):
+    '''
+    Build the tree of the file
+
+    Returns:
+        tuple: seconds, peak RSS in MB
+    '''
+    from taskjuggler_python import jsonjuggler
+    started = time.time()
+    if mode == "text":
+        with open(path) as src:
+            jg = jsonjuggler.JsonJuggler(src.read())
+    else:
+        jg = jsonjuggler.JsonJuggler(path)
+    jg.juggle()
+    return time.time() - started, peak_rss()
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark streaming JSON ingestion")
+    parser.add_argument('--tasks', type=int, default=200000)
+    parser.add_argument('--ndjson', action='store_true', help='Write the export as NDJSON instead of one array')
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        json.dump(measure(*args.child), sys.stdout)
+        return
+
+    fd, path = tempfile.mkstemp(".json")
+    try:
+        with os.fdopen(fd, 'w') as out:
+            plan = make_plan(args.tasks)
+            if args.ndjson:
+                for rec in plan:
+                    out.write(json.dumps(rec) + "\n")
+            else:
+                json.dump(plan, out)
+            del plan
+        print("%d tasks, %.1f MB %s" % (args.tasks, os.path.getsize(path) / 1e6, "NDJSON" if args.ndjson else "JSON array"))
+        print("%8s %10s %10s" % ("mode", "seconds", "peak MB"))
+        for mode in MODES:
+            out = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--child", mode, path])
+            seconds, peak = json.loads(out)
+            print("%8s %10.2f %10.1f" % (mode, seconds, peak))
+    finally:
+        os.remove(path)
+
+if __name__ == '__main__':
+    main()
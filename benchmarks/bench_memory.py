@@ -0,0 +1,71 @@
+#!/usr/bin/env python
+
+"""
+Memory benchmark: bytes per task of the keyword/property tree built by DictJuggler
+
+Uses tracemalloc where available (Python 3), otherwise sums sys.getsizeof over every object
+reachable from the tree (types, modules and functions excluded), which is what the tree holds.
+
+    python benchmarks/bench_memory.py [sizes...]
+"""
+
+import gc, os, sys, types, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import juggler, jsonjuggler
+
+SIZES = [1000, 10000, 100000]
+
+SKIP_TYPES = (type, types.ModuleType, types.FunctionType, types.BuiltinFunctionType)
+if hasattr(types, 'ClassType'):
+    SKIP_TYPES += (types.ClassType,)
+
+def make_issues(count):
+    issues = [{"id": 1, "effort": 1, "allocate": "me"}]
+    for i in range(2, count + 1):
+        issue = {"id": i, "effort": 1 + i % 8, "allocate": "me", "summary": "Task %d" % i}
+        if i % 3:
+            issue["depends"] = [i - 1]
+        issues.append(issue)
+    return issues
+
+def build(issues):
+    jg = jsonjuggler.DictJuggler(issues)
+    jg.juggle()
+    return jg
+
+def reachable_size(root):
+    seen = set()
+    stack = [root]
+    total = 0
+    while stack:
+        obj = stack.pop()
+        if id(obj) in seen or isinstance(obj, SKIP_TYPES):
+            continue
+        seen.add(id(obj))
+        total += sys.getsizeof(obj)
+        stack.extend(gc.get_referents(obj))
+    return total
+
+def tree_bytes(issues):
+    try:
+        import tracemalloc
+    except ImportError:
+        return reachable_size(build(issues).src)
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    jg = build(issues)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return size
+
+def main(sizes):
+    logging.getLogger().setLevel(logging.WARNING)
+    print("%10s %14s %14s" % ("tasks", "MB", "bytes/task"))
+    for count in sizes:
+        size = tree_bytes(make_issues(count))
+        print("%10d %14.1f %14d" % (count, size / 1e6, size // count))
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or SIZES)
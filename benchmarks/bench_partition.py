@@ -0,0 +1,55 @@
+#!/usr/bin/env python
+
+"""
+Partitioned scheduling benchmark on synthetic multi-team plans
+
+Every team has its own resource and a dependency chain, so each team is an independent
+part. Times the union-find partitioning itself and, if tj3 is installed, a monolithic run()
+against run_partitioned(), checking that both produce the same bookings.
+
+    python benchmarks/bench_partition.py [teams] [tasks per team]
+"""
+
+import os, sys, time, logging
+from distutils.spawn import find_executable
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import juggler, jsonjuggler
+
+def make_issues(teams, tasks):
+    issues = []
+    for team in range(teams):
+        for i in range(tasks):
+            id = team * tasks + i + 1
+            issue = {"id": id, "effort": 1 + i % 4, "allocate": "team%s" % team, "priority": 100 + i % 50}
+            if i % 4:
+                issue["depends"] = [id - 1]
+            issues.append(issue)
+    return issues
+
+def bookings(jg):
+    return dict((t.get_id(), [b.decode() for b in t.walk(juggler.JugglerBooking)]) for t in jg.walk(juggler.JugglerTask))
+
+def timed(func, *args):
+    started = time.time()
+    func(*args)
+    return time.time() - started
+
+def main(teams=8, tasks=500):
+    logging.getLogger().setLevel(logging.WARNING)
+    issues = make_issues(teams, tasks)
+    jg = jsonjuggler.DictJuggler(issues)
+    jg.juggle()
+    print("partitioning %d tasks: %.3fs" % (len(issues), timed(juggler.partition_tasks, jg.walk(juggler.JugglerTask))))
+    if not find_executable("tj3"):
+        print("tj3 not found, skipping scheduling runs")
+        return
+    mono = jsonjuggler.DictJuggler(issues)
+    parted = jsonjuggler.DictJuggler(issues)
+    print("run():             %.3fs" % timed(mono.run))
+    print("run_partitioned(): %.3fs" % timed(parted.run_partitioned))
+    print("identical bookings: %s" % (bookings(mono) == bookings(parted)))
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+"""
+Paged loading benchmark: serial against prefetched pages from a fake slow backend
+
+Every page costs a fixed latency, like a round trip to Airtable or Jira, and its issues
+are built into tasks as usual, so prefetching can hide the latency behind the building.
+
+    python benchmarks/bench_prefetch.py [tasks] [page size] [latency ms]
+"""
+
+import os, sys, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import jsonjuggler
+from synthetic import make_plan
+
+class SlowPagedJuggler(jsonjuggler.DictJuggler):
+    '''DictJuggler whose pages are fetched by number with a latency'''
+
+    def __init__(self, issues, page_size, latency):
+        super(SlowPagedJuggler, self).__init__(issues)
+        self.page_size = page_size
+        self.latency = latency
+
+    def load_issues_page(self, page):
+        time.sleep(self.latency)
+        return self.issues[page * self.page_size:(page + 1) * self.page_size]
+
+def bench(issues, page_size, latency, prefetch, concurrency):
+    jg = SlowPagedJuggler(issues, page_size, latency)
+    jg.prefetch, jg.concurrency = prefetch, concurrency
+    started = time.time()
+    jg.juggle()
+    return time.time() - started
+
+def main(count=20000, page_size=500, latency_ms=50):
+    logging.getLogger().setLevel(logging.WARNING)
+    issues = make_plan(count)
+    pages = count // page_size + 1
+    print("%d tasks, %d pages of %d, %d ms per page (%.2f s of latency)" % (
+        count, pages, page_size, latency_ms, pages * latency_ms / 1000.0))
+    print("%10s %12s %10s" % ("prefetch", "concurrency", "seconds"))
+    for prefetch, concurrency in [(0, 1), (1, 1), (4, 1), (4, 4)]:
+        print("%10d %12d %10.3f" % (prefetch, concurrency,
+                                     bench(issues, page_size, latency_ms / 1000.0, prefetch, concurrency)))
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
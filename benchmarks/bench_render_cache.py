@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+"""
+What-if rendering benchmark: write_file() again after changing the priority of one task,
+with and without the render cache of the source
+
+    python benchmarks/bench_render_cache.py [tasks] [changes]
+"""
+
+import os, sys, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import juggler, jsonjuggler
+from synthetic import make_plan
+
+def bench(jg, changes):
+    '''
+    Returns:
+        tuple: seconds of the first rendering, mean seconds of a rendering after one change
+    '''
+    tasks = jg.walk(juggler.JugglerTask)
+    with open(os.devnull, 'w') as out:
+        started = time.time()
+        jg.write_file(out)
+        first = time.time() - started
+        started = time.time()
+        for change in range(changes):
+            priority = juggler.JugglerTaskPriority()
+            priority.set_value(100 + change % 900)
+            tasks[change * 7919 % len(tasks)].set_property(priority)
+            jg.write_file(out)
+    return first, (time.time() - started) / changes
+
+def main(count=20000, changes=20):
+    logging.getLogger().setLevel(logging.WARNING)
+    plan = make_plan(count)
+    print("%8s %12s %16s" % ("cache", "first s", "after change s"))
+    for cached in (False, True):
+        jg = jsonjuggler.DictJuggler(plan)
+        jg.juggle()
+        jg.src.enable_render_cache(cached)
+        print("%8s %12.3f %16.4f" % ((cached,) + bench(jg, changes)))
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+
+"""
+DictJuggler build benchmark: resources looked up in the source's resource index against
+setting a new resource for every task (the resource of the record replaces the one set before)
+
+    python benchmarks/bench_resources.py [sizes...]
+"""
+
+import os, sys, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import jsonjuggler
+from synthetic import make_plan
+
+class ResourcePerTaskJuggler(jsonjuggler.DictJuggler):
+    def create_task_instance(self, issue):
+        self.src.set_property(jsonjuggler.DictJugglerResource(issue))
+        return jsonjuggler.DictJugglerTask(issue)
+
+def build(cls, plan):
+    started = time.time()
+    jg = cls(plan)
+    jg.juggle()
+    jg.walk(jsonjuggler.JugglerTask)
+    return time.time() - started
+
+def main(*sizes):
+    logging.getLogger().setLevel(logging.WARNING)
+    print("%8s %18s %18s" % ("tasks", "resource/task s", "index s"))
+    for size in sizes or (10000, 25000, 50000):
+        plan = make_plan(size)
+        print("%8d %18.3f %18.3f" % (size, build(ResourcePerTaskJuggler, plan), build(jsonjuggler.DictJuggler, plan)))
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
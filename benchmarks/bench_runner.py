@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+
+"""
+tj3 runner latency benchmark: one-shot tj3 process against a tj3d daemon
+
+Needs TaskJuggler (tj3, tj3d, tj3client) on the PATH. The daemon is started once
+before timing, the way a long-running service would keep it.
+
+    python benchmarks/bench_runner.py [tasks] [runs]
+"""
+
+import json, os, sys, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import juggler, jsonjuggler
+
+def make_issues(count):
+    return [{"id": i, "effort": 2, "priority": i % 10, "depends": [i - 1] if i % 3 else []}
+            for i in range(1, count + 1)]
+
+def bench(runner, issues, runs):
+    latencies = []
+    for _ in range(runs):
+        jg = jsonjuggler.DictJuggler(issues)
+        jg.runner = runner
+        started = time.time()
+        jg.run()
+        latencies.append(time.time() - started)
+    latencies.sort()
+    return sum(latencies) / len(latencies), latencies[len(latencies) // 2]
+
+def main(count=50, runs=10):
+    logging.getLogger().setLevel(logging.WARNING)
+    issues = make_issues(count)
+    daemon = juggler.JugglerDaemonRunner()
+    try:
+        daemon.ensure_daemon()
+        print("%12s %10s %10s" % ("runner", "mean s", "median s"))
+        for name, runner in [("tj3", juggler.JugglerSubprocessRunner()), ("tj3d", daemon)]:
+            print("%12s %10.3f %10.3f" % ((name,) + bench(runner, issues, runs)))
+    finally:
+        daemon.terminate()
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
@@ -0,0 +1,95 @@
+#!/usr/bin/env python
+
+"""
+Benchmark suite: wall time and memory peak of every phase on synthetic plans (see synthetic.py)
+
+Phases: juggle, validate_tasks, write_file, read_ical_result, toJSON and a full run() of a
+fresh juggler. Every size runs in its own process, so the peak RSS belongs to that size only.
+tj3 is the stub in benchmarks/bin unless --real-tj3 is given, so only the Python side is timed;
+--backend list times the run with the in-process list scheduler instead.
+
+    python benchmarks/bench_suite.py [--sizes 1000 10000 100000] [--seed 0] [--backend list] [--json results.json]
+"""
+
+import argparse, json, logging, os, resource, shutil, subprocess, sys, tempfile, time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+
+from taskjuggler_python import juggler, jsonjuggler
+from synthetic import make_plan
+
+SIZES = [1000, 10000, 100000]
+PHASES = ["juggle", "validate_tasks", "write_file", "read_ical_result", "toJSON", "run"]
+
+def peak_rss():
+    '''Peak resident set size of this process in MB'''
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024.0 * 1024.0) if sys.platform == 'darwin' else peak / 1024.0
+
+def measure(size, seed, backend=juggler.BACKEND_TJ3):
+    '''
+    Time the phases on one plan
+
+    Returns:
+        dict: phase -> (seconds, peak RSS in MB after the phase)
+    '''
+    records = json.dumps(make_plan(size, seed))
+    results = {}
+
+    def phase(name, func, *args):
+        started = time.time()
+        func(*args)
+        results[name] = (time.time() - started, peak_rss())
+
+    jg = jsonjuggler.JsonJuggler(records)
+    phase("juggle", jg.juggle)
+    phase("validate_tasks", jg.validate_tasks, jg.walk(juggler.JugglerTask))
+    outfolder = tempfile.mkdtemp("TJPBENCH")
+    try:
+        jg.walk(juggler.JugglerOutputdir)[0].set_value(outfolder)
+        tjp = os.path.join(outfolder, "plan.tjp")
+        phase("write_file", jg.write_file, tjp)
+        subprocess.check_call(juggler.JugglerSubprocessRunner.COMMAND + [tjp])
+        ics = os.path.join(outfolder, jg.walk(juggler.JugglerIcalreport)[0].get_value().strip('"') + ".ics")
+        phase("read_ical_result", jg.read_ical_result, ics)
+        phase("toJSON", jg.toJSON)
+    finally:
+        shutil.rmtree(outfolder)
+    phase("run", jsonjuggler.JsonJuggler(records).run, None, None, juggler.REPORT_ICAL, backend)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the phases of a scheduling run")
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', dest='json_out', help='Also write the results to this file')
+    parser.add_argument('--real-tj3', action='store_true', help='Use the tj3 on PATH instead of the stub')
+    parser.add_argument('--backend', default=juggler.BACKEND_TJ3, choices=[juggler.BACKEND_TJ3, juggler.BACKEND_LIST],
+                        help='Scheduling backend of the run phase')
+    parser.add_argument('--child', type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.child:
+        json.dump(measure(args.child, args.seed, args.backend), sys.stdout)
+        return
+
+    env = dict(os.environ)
+    if not args.real_tj3:
+        env["PATH"] = os.path.join(BENCH_DIR, "bin") + os.pathsep + env.get("PATH", "")
+    print("%8s %s %9s" % ("tasks", " ".join("%16s" % name for name in PHASES), "peak MB"))
+    all_results = {}
+    for size in args.sizes:
+        out = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--child", str(size),
+                                       "--seed", str(args.seed), "--backend", args.backend], env=env)
+        results = json.loads(out)
+        all_results[size] = results
+        print("%8d %s %9.1f" % (size, " ".join("%15.3fs" % results[name][0] for name in PHASES),
+                                max(peak for _, peak in results.values())))
+    if args.json_out:
+        with open(args.json_out, 'w') as out:
+            json.dump({"seed": args.seed, "backend": args.backend, "results": all_results}, out, indent=2, sort_keys=True)
+
+if __name__ == '__main__':
+    main()
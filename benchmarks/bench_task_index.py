@@ -0,0 +1,64 @@
+#!/usr/bin/env python
+
+"""
+Scaling benchmark for id lookups: booking import, JSON export and dependency validation
+
+Runs without tj3: the booking import reads a synthetic ICS file shaped like the tj3 icalreport.
+Per-task cost should stay flat from 1k to 100k tasks.
+
+    python benchmarks/bench_task_index.py [sizes...]
+"""
+
+import datetime, json, os, sys, tempfile, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import juggler, jsonjuggler
+
+SIZES = [1000, 10000, 100000]
+
+def make_issues(count):
+    issues = [{"id": 1, "effort": 1, "allocate": "me"}]
+    for i in range(2, count + 1):
+        issues.append({"id": i, "effort": 1, "allocate": "me", "depends": [i - 1]})
+    return issues
+
+def make_ics(count, path):
+    start = datetime.datetime(2017, 10, 10, 9)
+    with open(path, 'w') as ics:
+        ics.write("BEGIN:VCALENDAR\r\nVERSION:2.0\r\n")
+        for i in range(1, count + 1):
+            end = start + datetime.timedelta(hours=1)
+            ics.write("BEGIN:VEVENT\r\nUID:default-%s-VEVENT\r\nDTSTART:%s\r\nDTEND:%s\r\nEND:VEVENT\r\n" % (
+                juggler.to_identifier(i), start.strftime("%Y%m%dT%H%M%SZ"), end.strftime("%Y%m%dT%H%M%SZ")))
+            start = end
+        ics.write("END:VCALENDAR\r\n")
+
+def timed(func, *args):
+    started = time.time()
+    func(*args)
+    return time.time() - started
+
+def bench(count):
+    issues = make_issues(count)
+    jg = jsonjuggler.JsonJuggler(json.dumps(issues))
+    jg.juggle()
+    tasks = jg.walk(juggler.JugglerTask)
+    ics = tempfile.mkstemp(".ics")[1]
+    try:
+        make_ics(count, ics)
+        return (timed(jg.validate_tasks, tasks),
+                timed(jg.read_ical_result, ics),
+                timed(jg.toJSON))
+    finally:
+        os.remove(ics)
+
+def main(sizes):
+    logging.getLogger().setLevel(logging.WARNING)
+    print("%10s %14s %14s %14s" % ("tasks", "validate us/t", "ical us/t", "toJSON us/t"))
+    for count in sizes:
+        result = bench(count)
+        print("%10d %14.2f %14.2f %14.2f" % ((count,) + tuple(x * 1e6 / count for x in result)))
+
+if __name__ == '__main__':
+    main([int(x) for x in sys.argv[1:]] or SIZES)
@@ -0,0 +1,40 @@
+#!/usr/bin/env python
+
+"""
+walk() benchmark: the registry of the source against a full traversal of the tree
+
+    python benchmarks/bench_walk.py [tasks] [repeat]
+"""
+
+import os, sys, time, logging
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from taskjuggler_python import juggler, jsonjuggler
+from synthetic import make_plan
+
+def timed(func, repeat):
+    started = time.time()
+    for _ in range(repeat):
+        func()
+    return (time.time() - started) / repeat
+
+def main(count=100000, repeat=5):
+    logging.getLogger().setLevel(logging.WARNING)
+    jg = jsonjuggler.DictJuggler(make_plan(count))
+    jg.juggle()
+    src = jg.src
+    traverse = juggler.JugglerCompoundKeyword.walk
+    src.walk(juggler.JugglerTask) # builds the registry
+    print("%-28s %12s %12s" % ("", "traversal s", "registry s"))
+    for name, cls in [("walk(JugglerTask)", juggler.JugglerTask), ("walk(JugglerProject)", juggler.JugglerProject),
+                      ("walk(JugglerOutputdir)", juggler.JugglerOutputdir)]:
+        print("%-28s %12.4f %12.4f" % (name, timed(lambda: traverse(src, cls), repeat), timed(lambda: src.walk(cls), repeat)))
+    print("%-28s %12.4f %12.4f" % ("first of iter_walk(Project)",
+                                   timed(lambda: next(juggler.JugglerCompoundKeyword.iter_walk(src, juggler.JugglerProject)), repeat),
+                                   timed(lambda: next(src.iter_walk(juggler.JugglerProject)), repeat)))
+    src.registry = None
+    print("%-28s %12s %12.4f" % ("rebuilding the registry", "", timed(lambda: src.walk(juggler.JugglerTask), 1)))
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:]])
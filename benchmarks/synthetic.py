@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+
+"""
+Seeded generator of synthetic plans, as DictJuggler/JsonJuggler records
+
+Tasks are laid out in layers (the DAG depth); every task outside the first layer depends
+on up to max_depends tasks of the layer before, so width = tasks / depth. A share of the
+tasks are appointments with a fixed start and no priority, as tjp-client sets them up.
+
+    python benchmarks/synthetic.py 1000 > plan.json
+"""
+
+import datetime, json, math, random, sys
+
+PLAN_START = datetime.datetime(2017, 10, 10, 9)
+
+def make_plan(tasks, seed=0, depth=20, max_depends=3, appointments=0.02, resources=10):
+    '''
+    Generate a plan
+
+    Args:
+        tasks (int):          Number of tasks
+        seed (int):           Random seed, the same arguments always give the same plan
+        depth (int):          Number of dependency layers
+        max_depends (int):    Maximum dependencies per task
+        appointments (float): Share of tasks with a fixed start
+        resources (int):      Number of resources the tasks are allocated to
+
+    Returns:
+        list: Task dicts with id, summary, effort, allocate and depends/priority/start
+    '''
+    rng = random.Random(seed)
+    depth = max(1, min(depth, tasks))
+    width = int(math.ceil(tasks / float(depth)))
+    plan = []
+    for i in range(tasks):
+        layer = i // width
+        rec = {"id": i + 1,
+               "summary": "Task %d" % (i + 1),
+               "effort": max(1, int(rng.lognormvariate(1, 0.8))),
+               "allocate": "r%d" % rng.randrange(resources)}
+        if layer:
+            first = (layer - 1) * width
+            count = rng.randint(0, max_depends)
+            rec["depends"] = sorted(set(first + 1 + rng.randrange(width) for _ in range(count)))
+        if rng.random() < appointments:
+            rec["start"] = (PLAN_START + datetime.timedelta(days=rng.randrange(90))).isoformat()
+        else:
+            rec["priority"] = rng.choice([100, 200, 300]) + rng.randrange(50)
+        plan.append(rec)
+    return plan
+
+if __name__ == '__main__':
+    json.dump(make_plan(int(sys.argv[1]) if len(sys.argv) > 1 else 1000), sys.stdout)
@@ -75,6 +75,11 @@ setuptools.setup(
         # "testpackage ~= 2.26",
         "icalendar>=3.11",
         "airtable-python-wrapper>=0.8",
-        "python-dateutil>=2.6"
-    ]
+        "python-dateutil>=2.6",
+        "pytz"
+    ],
+
+    extras_require={
+        'simulation': ["numpy>=1.11"],
+    }
 )
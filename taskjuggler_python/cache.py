@@ -0,0 +1,125 @@
+"""
+content-addressed cache of tj3 scheduling results
+
+Stores the report tj3 wrote for a project (the .ics or export .tjp file) under the hash of
+the rendered project source, so an unchanged project can be restored without running tj3.
+"""
+
+import hashlib, logging, os, shutil, tempfile, time
+
+DEFAULT_MAX_SIZE = 256 * 1024 * 1024 # bytes
+DEFAULT_MAX_AGE = 7 * 24 * 3600 # seconds
+
+class JugglerScheduleCache(object):
+    '''
+    Scheduling result cache on local disk with size/age LRU eviction
+
+    Entries are keyed by make_key() of the rendered project. A hit refreshes the entry's
+    modification time, eviction drops entries older than max_age and then the least
+    recently used ones until the cache fits into max_size.
+    '''
+
+    def __init__(self, path, max_size=DEFAULT_MAX_SIZE, max_age=DEFAULT_MAX_AGE):
+        '''
+        Args:
+            path (str):     Cache directory, created if missing
+            max_size (int): Maximum total size of the entries in bytes (None for unlimited)
+            max_age (int):  Maximum entry age in seconds since last use (None for unlimited)
+        '''
+        self.path = path
+        self.max_size = max_size
+        self.max_age = max_age
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    @staticmethod
+    def make_key(chunks, *extra):
+        '''
+        Canonical key of a rendered project
+
+        Args:
+            chunks (iterable): Rendered project fragments, e.g. JugglerSource.iter_chunks()
+            extra (str):       Anything else the result depends on (e.g. the report mode)
+
+        Returns:
+            str: Hex digest
+        '''
+        digest = hashlib.sha256()
+        for chunk in chunks:
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode('utf-8')
+            digest.update(chunk)
+        for item in extra:
+            digest.update(b'\0' + str(item).encode('utf-8'))
+        return digest.hexdigest()
+
+    def entry_path(self, key):
+        return os.path.join(self.path, key)
+
+    def get(self, key):
+        '''
+        Look up a cached report
+
+        Returns:
+            str: Path to the cached report file, or None on a miss
+        '''
+        path = self.entry_path(key)
+        try:
+            os.utime(path, None)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def put(self, key, report):
+        '''
+        Store a copy of a report file and evict old entries
+
+        Args:
+            key (str):    Key from make_key()
+            report (str): Path to the report file tj3 wrote
+        '''
+        fd, tmp = tempfile.mkstemp(dir=self.path, prefix='.tmp')
+        os.close(fd)
+        shutil.copyfile(report, tmp)
+        os.rename(tmp, self.entry_path(key)) # atomic, concurrent readers never see partial entries
+        self.evict()
+
+    def invalidate(self, key=None):
+        '''
+        Drop one entry, or every entry if no key is given
+        '''
+        if key is not None:
+            keys = [key]
+        else:
+            keys = [name for name in os.listdir(self.path) if not name.startswith('.')]
+        for key in keys:
+            try:
+                os.remove(self.entry_path(key))
+            except OSError:
+                pass
+
+    def evict(self):
+        '''Remove expired entries, then least recently used ones until max_size is met'''
+        now = time.time()
+        entries = []
+        for name in os.listdir(self.path):
+            if name.startswith('.'):
+                continue
+            try:
+                st = os.stat(self.entry_path(name))
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, name))
+        entries.sort()
+        total = sum(size for _, size, _ in entries)
+        for mtime, size, name in entries:
+            expired = self.max_age is not None and now - mtime > self.max_age
+            if not expired and (self.max_size is None or total <= self.max_size):
+                break
+            logging.debug('Evicting cached schedule %s', name)
+            self.invalidate(name)
+            total -= size
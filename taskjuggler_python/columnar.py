@@ -0,0 +1,388 @@
+"""
+columnar task store for large flat imports
+
+Keeps the tasks of DictJuggler-style records in columns instead of an object tree per task,
+renders TJP straight from the columns and materializes JugglerTask views only on access.
+"""
+
+import array, calendar, datetime, gc, logging, math, re
+
+import pytz
+
+from juggler import (JugglerCompoundKeyword, JugglerTask, JugglerTaskProperty, JugglerTaskDepends, JugglerBooking,
+                     JugglerTaskGraph, JugglerProperties, get_identifiers, to_tj3time,
+                     to_tj3interval, TAB)
+from jsonjuggler import (DictJuggler, DictJugglerTask, DictJugglerTaskEffort, DictJugglerTaskAllocate,
+                         DictJugglerTaskPriority, DictJugglerResource)
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=pytz.utc)
+NOT_BOOKED = float('nan')
+
+def to_timestamp(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+def from_timestamp(ts):
+    return EPOCH + datetime.timedelta(seconds=ts)
+
+def parse_start(value):
+    '''Start of a record as DictJugglerTaskStart reads it, None if not set'''
+    if isinstance(value, basestring):
+        import dateutil.parser
+        value = dateutil.parser.parse(value)
+    if not value:
+        return None
+    if not isinstance(value, datetime.datetime):
+        raise ValueError("Task start value should be datetime object")
+    return value
+
+def parse_depends(value):
+    '''Dependencies of a record as DictJugglerTaskDepends reads them'''
+    if isinstance(value, basestring):
+        value = re.findall(r"[\w']+", value)
+    return [int(x) for x in value]
+
+class JugglerTaskTable(JugglerCompoundKeyword):
+    '''
+    Flat tasks stored column-wise, built in bulk from DictJuggler records
+
+    Columns hold id, summary, effort, allocate, start and priority per row, dependencies are
+    CSR arrays (dep_rows[dep_offsets[row]:dep_offsets[row + 1]] are the rows a row depends on)
+    and booking results go to the booked_start/booked_end arrays (UTC timestamps, NaN if not booked).
+
+    A DictJugglerTask view of a row is only built when the row is accessed (task(), get_task(),
+    walk()). Views are kept, so changes to them persist and the row is rendered from its view.
+    '''
+
+    __slots__ = ('ids', 'rows', 'summaries', 'efforts', 'allocates', 'starts', 'priorities',
+                 'dep_offsets', 'dep_rows', 'booked_start', 'booked_end', 'views')
+    LOG_STRING = "JugglerTaskTable"
+    DEFAULT_KEYWORD = 'tasks'
+    VIEW_CLASS = DictJugglerTask
+    TASK_CONTAINER = True
+
+    def _post_init(self, issue = None):
+        self.ids = []
+        self.rows = {}
+        self.summaries = []
+        self.efforts = array.array('l')
+        self.allocates = []
+        self.starts = []
+        self.priorities = array.array('l')
+        self.dep_offsets = array.array('l', [0])
+        self.dep_rows = array.array('l')
+        self.booked_start = array.array('d')
+        self.booked_end = array.array('d')
+        self.views = {}
+
+    def load_from_issue(self, records):
+        '''
+        Fill the columns from records, parsed the same way as DictJugglerTask does
+
+        Dependencies on ids that are not in the records are dropped, like validate() does.
+
+        Args:
+            records (list): Task dicts with id and optional summary, effort, allocate, start,
+                            priority and depends
+        '''
+        enabled = gc.isenabled()
+        gc.disable() # nothing collectable is created, but the collector would rescan all records
+        try:
+            self._load_columns(records)
+        finally:
+            if enabled:
+                gc.enable()
+
+    def _load_columns(self, records):
+        # one pass per column, comprehensions are much faster than appending field by field
+        self.ids = [rec["id"] for rec in records]
+        self.rows = dict((id, row) for row, id in enumerate(self.ids))
+        self.summaries = [rec.get("summary", self.VIEW_CLASS.DEFAULT_SUMMARY) for rec in records]
+        self.efforts = array.array('l', [int(math.ceil(rec["effort"])) if "effort" in rec else DictJugglerTaskEffort.DEFAULT_VALUE
+                                         for rec in records])
+        interned = {}
+        self.allocates = [interned.setdefault(alloc, alloc) for alloc in (rec.get("allocate", "me") for rec in records)]
+        self.starts = [parse_start(rec["start"]) if "start" in rec else None for rec in records]
+        self.priorities = array.array('l', [int(rec["priority"]) if "priority" in rec else DictJugglerTaskPriority.DEFAULT_VALUE
+                                            for rec in records])
+        self.booked_start = array.array('d', [NOT_BOOKED]) * len(self.ids)
+        self.booked_end = array.array('d', [NOT_BOOKED]) * len(self.ids)
+        rows = self.rows
+        for id, rec in zip(self.ids, records):
+            if "depends" in rec:
+                for dep in parse_depends(rec["depends"]):
+                    row = rows.get(dep)
+                    if row is None:
+                        logging.warning('Removing link to %s for %s, as not within scope', dep, id)
+                    else:
+                        self.dep_rows.append(row)
+            self.dep_offsets.append(len(self.dep_rows))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __nonzero__(self):
+        return True
+
+    def __contains__(self, id):
+        return id in self.rows
+
+    def __getitem__(self, id):
+        task = self.get_task(id)
+        if task is None:
+            raise KeyError(id)
+        return task
+
+    def get_task(self, id):
+        '''
+        Get the view of a task by its id
+
+        Returns:
+            JugglerTask: the task, or None if no row has this id
+        '''
+        row = self.rows.get(id)
+        if row is None:
+            return None
+        return self.task(row)
+
+    def record(self, row):
+        '''Rebuild the record of a row, as DictJugglerTask takes it'''
+        rec = {"id": self.ids[row], "summary": self.summaries[row], "allocate": self.allocates[row],
+               "depends": self.depends(row)}
+        if self.efforts[row] != DictJugglerTaskEffort.DEFAULT_VALUE:
+            rec["effort"] = self.efforts[row]
+        if self.starts[row] is not None:
+            rec["start"] = self.starts[row]
+        if self.priorities[row] != DictJugglerTaskPriority.DEFAULT_VALUE:
+            rec["priority"] = self.priorities[row]
+        return rec
+
+    def task(self, row):
+        '''
+        Materialize (once) the JugglerTask view of a row
+
+        Returns:
+            JugglerTask: the view, with the booking of the row if it is booked
+        '''
+        view = self.views.get(row)
+        if view is None:
+            view = self.VIEW_CLASS(self.record(row))
+            booking = self.booking(row)
+            if booking:
+                view.set_property(JugglerBooking({"resource": self.allocates[row], "start": booking[0], "end": booking[1]}))
+            view.parent = self
+            view.top = self.top
+            self.views[row] = view
+        return view
+
+    def depends(self, row):
+        '''
+        Ids a row depends on, from its view if it has one
+
+        Returns:
+            list: Task ids
+        '''
+        view = self.views.get(row)
+        if view is None:
+            return [self.ids[dep] for dep in self.dep_rows[self.dep_offsets[row]:self.dep_offsets[row + 1]]]
+        return [val for prop in view.properties.values() if isinstance(prop, JugglerTaskDepends)
+                for val in prop.get_value() if val in self.rows]
+
+    def booking(self, row):
+        '''
+        Returns:
+            tuple: (start, end) datetimes in UTC, or None if the row is not booked
+        '''
+        start = self.booked_start[row]
+        if start != start: # NaN
+            return None
+        return from_timestamp(start), from_timestamp(self.booked_end[row])
+
+    def book(self, row, start, end):
+        '''
+        Store the booked interval of a row, replaces the bookings of its view if it has one
+
+        Returns:
+            JugglerBooking: the booking set on the view, or None if the row has no view
+        '''
+        self.booked_start[row] = to_timestamp(start)
+        self.booked_end[row] = to_timestamp(end)
+        self.invalidate()
+        view = self.views.get(row)
+        if view is None:
+            return None
+        booking = JugglerBooking({"resource": view.walk(DictJugglerTaskAllocate)[0].get_value(), "start": start, "end": end})
+        view.clear_bookings()
+        view.set_property(booking)
+        return booking
+
+    def iter_walk(self, cls, nested = False):
+        '''
+        Lazy walk(): yields the same in the same order, materializing each view only when its row is reached
+        '''
+        if not nested and isinstance(self, cls):
+            yield self
+        if issubclass(self.VIEW_CLASS, cls) or issubclass(cls, (JugglerTaskProperty, JugglerBooking)):
+            for row in range(len(self.ids)):
+                view = self.task(row)
+                for item in view.iter_walk(cls, True):
+                    yield item
+                if isinstance(view, cls):
+                    yield view
+
+    def walk(self, cls, ls = None):
+        '''
+        Walk the rows, materializing every view if tasks or task properties are asked for
+        '''
+        if ls is None:
+            ls = []
+            if isinstance(self, cls):
+                ls.append(self)
+        if issubclass(self.VIEW_CLASS, cls) or issubclass(cls, (JugglerTaskProperty, JugglerBooking)):
+            for row in range(len(self.ids)):
+                view = self.task(row)
+                ls = view.walk(cls, ls)
+                if isinstance(view, cls):
+                    ls.append(view)
+        return ls
+
+    def iter_chunks(self, block=1000):
+        '''
+        Render the rows straight from the columns, rows with a view are rendered by their view
+
+        Args:
+            block (int): Rows per fragment
+
+        Yields:
+            str: Fragments in juggler syntax, the same as the DictJugglerTask views would render
+        '''
+        identifiers = get_identifiers(self)
+        idents = [identifiers.to_identifier(id) for id in self.ids]
+        parts = []
+        for row in range(len(self.ids)):
+            view = self.views.get(row)
+            if view is not None:
+                parts.extend(view.iter_chunks())
+            else:
+                self.render_row(row, idents, parts)
+            if row % block == block - 1:
+                yield ''.join(parts)
+                parts = []
+        if parts:
+            yield ''.join(parts)
+
+    def render_row(self, row, idents, parts):
+        '''
+        Render a row from the columns
+
+        Args:
+            row (int):     Row to render
+            idents (list): Identifiers of all rows
+            parts (list):  Rendered fragments are appended to it
+        '''
+        parts.append('\ntask ')
+        parts.append(idents[row])
+        summary = self.summaries[row]
+        if summary:
+            parts.append(' "%s"' % summary.replace('\"', '\\\"'))
+        parts.append(' {\n')
+        first, last = self.dep_offsets[row], self.dep_offsets[row + 1]
+        if last > first:
+            parts.append(TAB + 'depends !%s\n' % ', !'.join([idents[dep] for dep in self.dep_rows[first:last]]))
+        effort = self.efforts[row]
+        if effort and effort != DictJugglerTaskEffort.DEFAULT_VALUE:
+            parts.append(TAB + 'effort %s%s\n' % (effort, DictJugglerTaskEffort.UNIT))
+        alloc = self.allocates[row]
+        if alloc and alloc != DictJugglerTaskAllocate.DEFAULT_VALUE:
+            parts.append(TAB + 'allocate %s\n' % alloc)
+        if self.starts[row]:
+            parts.append(TAB + 'start %s\n' % to_tj3time(self.starts[row]))
+        priority = self.priorities[row]
+        if priority and priority != DictJugglerTaskPriority.DEFAULT_VALUE:
+            parts.append(TAB + 'priority %s\n' % priority)
+        booking = self.booking(row)
+        if booking:
+            parts.append('\nbooking %s %s ' % (get_identifiers(self).to_identifier(alloc), to_tj3interval(*booking)))
+        parts.append('\n}')
+
+class TableJuggler(DictJuggler):
+    '''
+    DictJuggler for large imports: the tasks are kept in a JugglerTaskTable
+
+    Scheduling results are stored in the table's booking arrays, the dependency graph is built
+    from its columns by run(). Anything that walks the tasks (e.g. run_partitioned, simulate) materializes
+    every view.
+    '''
+
+    table = None
+
+    def juggle(self):
+        '''
+        Build the project with all records in one task table
+        '''
+        self.src = self.create_jugglersource_instance()
+        records = self.load_issues() or []
+        resources = JugglerProperties() # last record wins, first one keeps the position like set_property
+        for rec in records:
+            resources[rec["allocate"] if "allocate" in rec else DictJugglerResource.DEFAULT_ID] = rec
+        for rec in resources.values():
+            self.src.set_property(DictJugglerResource(rec))
+        self.table = JugglerTaskTable(records)
+        self.src.set_property(self.table)
+        return self.src
+
+    def build_graph(self):
+        '''
+        Dependency graph from the table columns, tasks added to the project otherwise are walked as usual
+        '''
+        if any(isinstance(prop, JugglerTask) for prop in self.src.properties.values()):
+            return DictJuggler.build_graph(self)
+        table = self.table
+        depends = dict((id, table.depends(row)) for row, id in enumerate(table.ids))
+        return JugglerTaskGraph.from_depends(table.ids, depends, table)
+
+    def get_task(self, id):
+        if not self.src:
+            self.juggle()
+        task = self.table.get_task(id)
+        if task is None:
+            task = self.src.get_task(id)
+        return task
+
+    def set_booking(self, id, start_date, end_date, callback=None):
+        row = self.table.rows.get(id)
+        if row is None:
+            return DictJuggler.set_booking(self, id, start_date, end_date, callback)
+        booking = self.table.book(row, start_date, end_date)
+        if callback:
+            task = self.table.task(row)
+            callback(task, booking or task.walk(JugglerBooking)[0])
+
+    def set_bookings(self, bookings, callback=None):
+        '''
+        Set exact per-resource bookings, e.g. from the tj3 export report
+
+        Rows of the table only keep the overall booked interval of their task.
+        '''
+        spans = JugglerProperties()
+        others = []
+        for booking in bookings:
+            id, resource, start_date, end_date = booking
+            if id in self.table.rows:
+                span = spans.get(id)
+                spans[id] = (min(span[0], start_date), max(span[1], end_date)) if span else (start_date, end_date)
+            else:
+                others.append(booking)
+        for id, (start_date, end_date) in spans.items():
+            self.set_booking(id, start_date, end_date, callback)
+        if others:
+            DictJuggler.set_bookings(self, others, callback)
+
+    def count_bookings(self):
+        if self.stats.enabled:
+            self.stats.count("bookings", sum(1 for start in self.table.booked_start if start == start)) # not NaN
+
+    def run_partitioned(self, max_workers=None, **kwargs):
+        '''
+        Same as run(): partitioning would materialize and copy every row
+        '''
+        return self.run(**kwargs)
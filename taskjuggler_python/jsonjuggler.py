@@ -1,9 +1,62 @@
 # json parser implementation
-from juggler import *
-import json, re, math
-import dateutil.parser
+from juggler import (JugglerTaskDepends, JugglerTaskPriority, JugglerTaskStart, JugglerTaskEffort, JugglerTaskAllocate,
+                     JugglerTask, JugglerSource, JugglerProject, JugglerIcalreport, JugglerResource, JugglerBooking,
+                     GenericJuggler)
+import itertools, json, re, math
+from StringIO import StringIO
+
+READ_SIZE = 1 << 16
+
+def iter_json_records(stream, read_size=READ_SIZE):
+    '''
+    Parse records from a file-like object incrementally
+
+    Accepts one JSON array of records or NDJSON (any whitespace separated JSON values). Only the
+    read buffer and the record being parsed are held in memory.
+
+    Args:
+        stream (file):   File-like object to read from
+        read_size (int): Bytes to read at a time
+
+    Yields:
+        dict: The records, in file order
+    '''
+    decoder = json.JSONDecoder()
+    buf = ''
+    pos = 0
+    eof = False
+    array = None # whether the input is one JSON array, known after the first value
+    while True:
+        while pos < len(buf) and (buf[pos].isspace() or (array and buf[pos] == ',')):
+            pos += 1
+        if pos < len(buf):
+            if array is None:
+                array = buf[pos] == '['
+                if array:
+                    pos += 1
+                    continue
+            if array and buf[pos] == ']':
+                return
+            try:
+                value, end = decoder.raw_decode(buf, pos)
+            except ValueError:
+                if eof:
+                    raise
+            else:
+                pos = end
+                yield value
+                continue
+        elif eof:
+            if array:
+                raise ValueError('Unterminated JSON array')
+            return
+        chunk = stream.read(read_size) # the value is incomplete, or the buffer is empty
+        buf = buf[pos:] + chunk
+        pos = 0
+        eof = not chunk
 
 class DictJugglerTaskDepends(JugglerTaskDepends):
+    __slots__ = ()
     def load_from_issue(self, issue):
         """
         Args:
@@ -17,30 +70,35 @@ class DictJugglerTaskDepends(JugglerTaskDepends):
             else: self.set_value([int(x) for x in issue["depends"]])
 
 class DictJugglerTaskPriority(JugglerTaskPriority):
+    __slots__ = ()
     def load_from_issue(self, issue):
         if "priority" in issue: self.set_value(int(issue["priority"]))
         
 class DictJugglerTaskStart(JugglerTaskStart):
+    __slots__ = ()
     def load_from_issue(self, issue):
         if "start" in issue: 
             if isinstance(issue["start"], str) or isinstance(issue['start'], unicode):
+                import dateutil.parser # slow to import, only needed for string dates
                 self.set_value(dateutil.parser.parse(issue["start"]))
             else:
                 self.set_value(issue["start"])
         
 class DictJugglerTaskEffort(JugglerTaskEffort):
+    __slots__ = ()
     UNIT = "h"
     def load_from_issue(self, issue):
         if "effort" in issue: self.set_value(math.ceil(issue["effort"]))
 
 class DictJugglerTaskAllocate(JugglerTaskAllocate):
+    __slots__ = ()
     def load_from_issue(self, issue):
         if "allocate" in issue: alloc = issue["allocate"]
         else: alloc = "me" # stub!
         self.set_value(alloc) 
-        src.walk(JugglerSource)[0].set_property(DictJugglerResource(issue))
 
 class DictJugglerTask(JugglerTask):
+    __slots__ = ()
     def load_default_properties(self, issue):
         self.set_property(DictJugglerTaskDepends(issue))
         self.set_property(DictJugglerTaskEffort(issue))
@@ -53,36 +111,126 @@ class DictJugglerTask(JugglerTask):
 
 class DictJuggler(GenericJuggler):
     """ a simple dictionary based format parser """
+    PAGE_SIZE = 1000
+    
     def __init__(self, issues):
+        '''
+        Args:
+            issues (iterable): The records, a list or any iterable (e.g. a generator), which is read page by page
+        '''
         self.issues = issues
+    def iter_issues(self):
+        return iter(self.issues)
     def load_issues(self):
-        return self.issues
+        if isinstance(self.issues, (list, dict)):
+            return self.issues
+        return list(self.iter_issues())
+    def load_issues_incremetal(self):
+        '''
+        Next page of at most PAGE_SIZE records, so only one page of records is held while tasks are built
+        '''
+        if not self.loaded:
+            self.loaded = True
+            self.pending = self.iter_issues()
+        return list(itertools.islice(self.pending, self.PAGE_SIZE))
     def create_task_instance(self, issue):
+        if "allocate" in issue:
+            id = summary = issue["allocate"]
+        else:
+            id, summary = DictJugglerResource.DEFAULT_ID, DictJugglerResource.DEFAULT_SUMMARY
+        resource = self.src.get_resource(id)
+        if resource is None:
+            self.src.set_property(DictJugglerResource(issue))
+        elif resource.summary != summary:
+            resource.set_value(summary) # the last record wins, as if the resource was set again
         return DictJugglerTask(issue)
     def create_jugglersource_instance(self):
-        global src
-        src = DictJugglerSource()
-        return src
+        return DictJugglerSource()
 
 class DictJugglerSource(JugglerSource):
+    __slots__ = ()
     def load_default_properties(self, issue = None):
         self.set_property(JugglerProject())
         # self.set_property(DictJugglerResource()) # define no resource
         self.set_property(JugglerIcalreport())
         
 class DictJugglerResource(JugglerResource):
+    __slots__ = ()
     def load_from_issue(self, issue):
         if "allocate" in issue:
             self.set_id(issue["allocate"])
             self.set_value(issue["allocate"])
 
 class JsonJuggler(DictJuggler):
+    '''
+    Juggler for JSON records: JSON text, the path of a JSON or NDJSON file, a file object or an iterable of records
+
+    Files are parsed incrementally and tasks are built page by page, see iter_json_records.
+    toJSON() reads paths and seekable files again instead of keeping the records; records of
+    other file objects and iterators are kept as compact JSON text.
+    '''
     def __init__(self, json_issues):
-        self.issues = json.loads(json_issues)
-    def toJSON(self):
-        for t in self.walk(JugglerTask):
-            for i in self.issues:
-                if t.get_id() == i["id"]:
-                    i["booking"] = t.walk(JugglerBooking)[0].decode()[0].isoformat()
-        return json.dumps(self.issues, sort_keys=True, indent=4, separators=(',', ': '))
+        if isinstance(json_issues, basestring) and json_issues.lstrip()[:1] in ('[', '{'):
+            json_issues = list(iter_json_records(StringIO(json_issues)))
+        self.issues = json_issues
+        self.offset = None
+        self.kept = None
+    def iter_issues(self):
+        source = self.issues
+        if isinstance(source, basestring):
+            with open(source) as stream:
+                for rec in iter_json_records(stream):
+                    yield rec
+            return
+        if isinstance(source, (list, dict)):
+            for rec in source:
+                yield rec
+            return
+        if self.kept is not None:
+            for text in self.kept:
+                yield json.loads(text)
+            return
+        if hasattr(source, 'read'):
+            if self.offset is None:
+                try:
+                    self.offset = source.tell()
+                except (IOError, AttributeError): # pipes
+                    self.offset = False
+            else:
+                source.seek(self.offset)
+            records = iter_json_records(source)
+        else:
+            records = iter(source)
+        if self.offset is not None and self.offset is not False:
+            for rec in records:
+                yield rec
+            return
+        kept = []
+        for rec in records:
+            kept.append(json.dumps(rec, separators=(',', ':')))
+            yield rec
+        self.kept = kept
+    def toJSON(self, output=None):
+        '''
+        The records with the booking start of their task, as indented JSON
+
+        Args:
+            output (file): File-like object to stream the JSON into
+
+        Returns:
+            str: The JSON, if no output was given
+        '''
+        out = output if output is not None else StringIO()
+        out.write('[')
+        sep = '\n'
+        for i in self.iter_issues():
+            t = self.get_task(i["id"])
+            if t is not None:
+                i["booking"] = t.walk(JugglerBooking)[0].decode()[0].isoformat()
+            text = json.dumps(i, sort_keys=True, indent=4, separators=(',', ': '))
+            out.write(sep + '    ' + text.replace('\n', '\n    '))
+            sep = ',\n'
+        out.write(']' if sep == '\n' else '\n]')
+        if output is None:
+            return out.getvalue()
 
@@ -6,9 +6,12 @@ generic to task-juggler extraction script
 This script queries generic, and generates a task-juggler input file in order to generate a gant-chart.
 """
 
-import logging,tempfile,subprocess,datetime,icalendar,shutil,os
+import logging,datetime,os,pytz,re,time,binascii,copy,contextlib,itertools
 from collections import OrderedDict
 
+# icalendar, subprocess, tempfile, shutil, threading and multiprocessing are imported where
+# they are used: they are slow to import and not needed to build or render a project
+
 DEFAULT_LOGLEVEL = 'warning'
 DEFAULT_OUTPUT = 'export.tjp'
 
@@ -16,6 +19,12 @@ TAB = ' ' * 4
 
 DEBUG = False
 
+REPORT_ICAL = 'ical'
+REPORT_EXPORT = 'export'
+
+BACKEND_TJ3 = 'tj3'
+BACKEND_LIST = 'list' # in-process, see listscheduler
+
 def is_number(s):
     try:
         float(s)
@@ -45,9 +54,28 @@ def to_tj3time(dt):
 def to_tj3interval(start, end):
     return "%s - %s" % (to_tj3time(start), to_tj3time(end))
 
+def to_local_time(dt, tz):
+    '''
+    Convert a datetime to naive wall-clock time in a timezone, as to_tj3time writes it
+
+    Args:
+        dt (datetime): Timezone-aware, or naive if it is already in tz
+        tz (tzinfo):   Target timezone, e.g. of the project
+
+    Returns:
+        datetime: naive datetime in tz
+    '''
+    if dt.tzinfo is None:
+        return dt
+    return dt.astimezone(tz).replace(tzinfo=None)
+
 TJP_NUM_ID_PREFIX = "tjp_numid_"
 TJP_DASH_PREFIX = "__DASH__"
 TJP_SPACE_PREFIX = "__SPACE__"
+TJP_CHAR_TEMPLATE = "__x%x__" # any other character TaskJuggler does not accept in an identifier
+TJP_CHAR_RE = re.compile(r'__x([0-9a-f]+)__')
+IDENTIFIER_RE = re.compile(r'[A-Za-z_][A-Za-z0-9_]*\Z')
+INVALID_IDENTIFIER_CHAR_RE = re.compile(r'[^A-Za-z0-9_]')
 
 def to_identifier(key):
     '''
@@ -62,16 +90,312 @@ def to_identifier(key):
     if is_number(key):
         key = TJP_NUM_ID_PREFIX+str(key)
     key = key.replace('-', TJP_DASH_PREFIX).replace(" ", TJP_SPACE_PREFIX)
+    if key and not IDENTIFIER_RE.match(key):
+        key = INVALID_IDENTIFIER_CHAR_RE.sub(lambda m: TJP_CHAR_TEMPLATE % ord(m.group()), key)
+        if key[0].isdigit():
+            key = "_" + key
     return key
 
 def from_identifier(key):
     if TJP_NUM_ID_PREFIX in key:
         return int(key.replace(TJP_NUM_ID_PREFIX, ""))
+    if "__x" in key:
+        # escapes are code points, the key is unicode once any of them is decoded
+        key = TJP_CHAR_RE.sub(lambda m: unichr(int(m.group(1), 16)), unicode(key))
     return key.replace(TJP_DASH_PREFIX, "-").replace(TJP_SPACE_PREFIX, " ")
 
+class JugglerIdentifiers(object):
+    '''
+    Identifiers of the ids of a source, converted once and mapped back in O(1)
+    
+    An id gets the identifier of to_identifier, unless another id already has it (e.g. the
+    number 1 and the string "1", or "a-b" and "a__DASH__b"): then a numbered suffix is
+    added, so that every id gets its own identifier and is read back exactly. Identifiers
+    that were never handed out are converted back with from_identifier.
+    '''
+    __slots__ = ('identifiers', 'ids')
+    
+    def __init__(self):
+        self.identifiers = {} # id -> identifier
+        self.ids = {} # identifier -> id
+    
+    def to_identifier(self, id):
+        identifier = self.identifiers.get(id)
+        if identifier is None:
+            identifier = base = to_identifier(id)
+            suffix = 1
+            while identifier in self.ids:
+                suffix += 1
+                identifier = "%s__%d" % (base, suffix)
+            self.identifiers[id] = identifier
+            self.ids[identifier] = id
+        return identifier
+    
+    def from_identifier(self, identifier):
+        try:
+            return self.ids[identifier]
+        except KeyError:
+            return from_identifier(identifier)
+
+class JugglerNullIdentifiers(object):
+    '''Stand-in for JugglerIdentifiers outside of a source, converts without remembering'''
+    
+    def to_identifier(self, id):
+        return to_identifier(id)
+    
+    def from_identifier(self, identifier):
+        return from_identifier(identifier)
+
+NO_IDENTIFIERS = JugglerNullIdentifiers()
+
+def get_identifiers(node):
+    '''
+    Identifier table of the source a keyword or property belongs to
+
+    Returns:
+        JugglerIdentifiers: the table of the source, NO_IDENTIFIERS if the node is not in a source
+    '''
+    while node is not None:
+        if node.top is not None:
+            return node.top.identifiers
+        node = node.parent
+    return NO_IDENTIFIERS
+
+def from_ical_time(value):
+    '''
+    Parse an iCalendar DATE or DATE-TIME value as written by tj3
+
+    Args:
+        value (str): e.g. 20171010T090000Z, 20171010T090000 or 20171010
+
+    Returns:
+        datetime: UTC-aware if the value ends with Z, naive otherwise (date for DATE values)
+    '''
+    if len(value) == 8:
+        return datetime.date(int(value[0:4]), int(value[4:6]), int(value[6:8]))
+    if len(value) not in (15, 16) or value[8] != 'T':
+        raise ValueError('Unsupported iCalendar time value: %s' % value)
+    dt = datetime.datetime(int(value[0:4]), int(value[4:6]), int(value[6:8]),
+                           int(value[9:11]), int(value[11:13]), int(value[13:15]))
+    if len(value) == 16:
+        if value[15] != 'Z':
+            raise ValueError('Unsupported iCalendar time value: %s' % value)
+        dt = dt.replace(tzinfo=pytz.utc)
+    return dt
+
+def iter_ical_bookings(icalfile, decode=from_identifier):
+    '''
+    Scan a tj3 generated .ics file line by line and yield the VEVENT bookings as they are found
+    
+    Only UID, DTSTART and DTEND are looked at, nothing else is parsed or kept in memory.
+    Raises ValueError on input it does not understand (e.g. TZID parameters), use
+    iter_icalendar_bookings for such files.
+
+    Args:
+        icalfile (str):    Path to the .ics file
+        decode (callable): Converts identifiers back to ids, e.g. JugglerIdentifiers.from_identifier of the source
+
+    Yields:
+        tuple: (task id, start, end) with the task id converted back from the identifier
+    '''
+    in_event = False
+    fields = {}
+    line = None
+    with open(icalfile) as ics:
+        for raw in ics:
+            raw = raw.rstrip('\r\n')
+            if raw[:1] in (' ', '\t'): # folded continuation line
+                if line is None:
+                    raise ValueError('iCalendar file starts with a continuation line')
+                line += raw[1:]
+                continue
+            if line is not None and in_event:
+                name, sep, value = line.partition(':')
+                if not sep:
+                    raise ValueError('Malformed iCalendar line: %s' % line)
+                if name in ('UID', 'DTSTART', 'DTEND'):
+                    fields[name] = value
+                elif name.startswith('DTSTART;') or name.startswith('DTEND;'):
+                    if name.split(';', 1)[1] != 'VALUE=DATE':
+                        raise ValueError('Unsupported iCalendar parameters: %s' % name)
+                    fields[name.split(';', 1)[0]] = value
+            line = raw
+            if raw == 'BEGIN:VEVENT':
+                in_event = True
+                fields = {}
+            elif raw == 'END:VEVENT':
+                in_event = False
+                if len(fields) != 3:
+                    raise ValueError('VEVENT without UID, DTSTART or DTEND')
+                yield (decode(fields['UID'].split("-")[1]),
+                       from_ical_time(fields['DTSTART']),
+                       from_ical_time(fields['DTEND']))
+
+def iter_icalendar_bookings(icalfile, decode=from_identifier):
+    '''
+    Parse the whole .ics file with the icalendar package, fallback for input iter_ical_bookings does not support
+
+    Args:
+        icalfile (str):    Path to the .ics file
+        decode (callable): Converts identifiers back to ids
+
+    Yields:
+        tuple: (task id, start, end) with the task id converted back from the identifier
+    '''
+    import icalendar
+    cal = icalendar.Calendar.from_ical(open(icalfile).read())
+    for ev in cal.walk('VEVENT'): # pylint:disable=no-member
+        yield (decode(ev.decoded("UID").split("-")[1]),
+               ev.decoded("DTSTART"),
+               ev.decoded("DTEND"))
+
+TJ3_TIME_RE = re.compile(r'(\d{4})-(\d\d)-(\d\d)-(\d\d):(\d\d)(?::(\d\d))?(?:-([+-])(\d\d)(\d\d))?$')
+TJ3_DURATION_UNITS = {'min': 60, 'h': 3600, 'd': 86400, 'w': 604800}
+EXPORT_TASK_RE = re.compile(r'\s*supplement task (\S+) \{')
+EXPORT_BOOKING_RE = re.compile(r'\s*(?:\w+:)?booking (\S+) (.*)$')
+EXPORT_INTERVAL_RE = re.compile(r'(\S+) (?:\+ ([\d.]+)(min|h|d|w)|- ([^\s,]+))')
+
+def from_tj3time(value):
+    '''
+    Parse TJ3 time format (as written by export reports, e.g. 2017-10-10-09:00-+0000)
+
+    Returns:
+        datetime: timezone-aware if the value has an offset, naive otherwise
+    '''
+    m = TJ3_TIME_RE.match(value)
+    if not m:
+        raise ValueError('Unsupported TJ3 time value: %s' % value)
+    year, month, day, hour, minute, second, sign, off_h, off_m = m.groups()
+    dt = datetime.datetime(int(year), int(month), int(day), int(hour), int(minute), int(second or 0))
+    if sign:
+        offset = int(off_h) * 60 + int(off_m)
+        if sign == '-': offset = -offset
+        dt = dt.replace(tzinfo=pytz.utc if offset == 0 else pytz.FixedOffset(offset))
+    return dt
+
+def iter_export_bookings(exportfile, decode=from_identifier):
+    '''
+    Scan a tj3 export report line by line and yield every booked interval
+    
+    Bookings are read from the "supplement task" blocks, so split tasks and tasks with
+    several allocated resources produce several bookings.
+
+    Args:
+        exportfile (str):  Path to the .tjp file written by the export report
+        decode (callable): Converts identifiers back to ids
+
+    Yields:
+        tuple: (task id, resource id, start, end) with ids converted back from identifiers
+    '''
+    task = None
+    resource = None
+    with open(exportfile) as tjp:
+        for line in tjp:
+            if resource is None:
+                m = EXPORT_TASK_RE.match(line)
+                if m:
+                    task = decode(m.group(1).split('.')[-1])
+                    continue
+                m = EXPORT_BOOKING_RE.match(line) if task is not None else None
+                if not m:
+                    continue
+                resource = decode(m.group(1))
+                line = m.group(2)
+            for start, duration, unit, end in EXPORT_INTERVAL_RE.findall(line):
+                start = from_tj3time(start)
+                if duration:
+                    end = start + datetime.timedelta(seconds=float(duration) * TJ3_DURATION_UNITS[unit])
+                else:
+                    end = from_tj3time(end)
+                yield (task, resource, start, end)
+            if not line.rstrip().endswith(','):
+                resource = None
+
+class JugglerProperties(dict):
+    '''
+    Insertion ordered container of the properties of a keyword
+
+    A lighter OrderedDict: keys are kept in a list next to the dict instead of a linked
+    list of nodes. Deleting is O(n), which is fine for the few properties of a keyword.
+    '''
+    __slots__ = ('order',)
+
+    def __init__(self, items=()):
+        dict.__init__(self)
+        self.order = []
+        for key, value in items:
+            self[key] = value
+
+    def __setitem__(self, key, value):
+        if key not in self:
+            self.order.append(key)
+        dict.__setitem__(self, key, value)
+
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.order.remove(key)
+
+    def __iter__(self):
+        return iter(self.order)
+
+    def __reduce__(self):
+        return (type(self), (self.items(),))
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.items())
+
+    def keys(self):
+        return list(self.order)
+
+    def values(self):
+        return [dict.__getitem__(self, key) for key in self.order]
+
+    def items(self):
+        return [(key, dict.__getitem__(self, key)) for key in self.order]
+
+    iterkeys = __iter__
+
+    def itervalues(self):
+        for key in self.order:
+            yield dict.__getitem__(self, key)
+
+    def iteritems(self):
+        for key in self.order:
+            yield key, dict.__getitem__(self, key)
+
+    def pop(self, key, *default):
+        if key in self:
+            self.order.remove(key)
+        return dict.pop(self, key, *default)
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return dict.__getitem__(self, key)
+
+    def update(self, other=(), **kwargs):
+        for key, value in (other.items() if hasattr(other, 'items') else other):
+            self[key] = value
+        for key, value in kwargs.items():
+            self[key] = value
+
+    def clear(self):
+        dict.clear(self)
+        del self.order[:]
+
+    def copy(self):
+        return type(self)(self.items())
+
+    def popitem(self):
+        if not self.order:
+            raise KeyError('popitem(): dictionary is empty')
+        key = self.order[-1]
+        return key, self.pop(key)
+
 class JugglerTaskProperty(object):
     '''Class for a property of a Task Juggler'''
 
+    __slots__ = ('name', 'value', 'empty', 'parent', 'top')
     DEFAULT_NAME = 'property name'
     DEFAULT_VALUE = 'not initialized'
     PREFIX = ''
@@ -89,12 +413,11 @@ class JugglerTaskProperty(object):
             issue (class): The generic issue to load from
             value (object): Value of the property
         '''
-        logging.debug('Create %s', self.LOG_STRING)
         self.name = self.DEFAULT_NAME
-        self.set_value(self.DEFAULT_VALUE)
-        self.empty = False
         self.parent = None
         self.top = None
+        self.set_value(self.DEFAULT_VALUE)
+        self.empty = False
         self.load_default_properties(issue)
 
         if issue:
@@ -136,6 +459,7 @@ class JugglerTaskProperty(object):
             value (object): New value of the property
         '''
         self.value = value
+        self.invalidate()
 
     def append_value(self, value):
         '''
@@ -145,6 +469,12 @@ class JugglerTaskProperty(object):
             value (object): Value to append to the property
         '''
         self.value.append(value)
+        self.invalidate()
+
+    def invalidate(self):
+        '''Drop the cached rendering of the keywords the property is in, see JugglerSource.enable_render_cache'''
+        if self.parent is not None:
+            self.parent.invalidate()
 
     def get_value(self):
         '''
@@ -167,25 +497,44 @@ class JugglerTaskProperty(object):
         '''
         pass
 
-    def __str__(self):
+    def iter_chunks(self):
         '''
-        Convert task property object to the task juggler syntax
+        Render task property object to the task juggler syntax, fragment by fragment
 
-        Returns:
-            str: String representation of the task property in juggler syntax
+        Yields:
+            str: Fragments of the task property in juggler syntax
         '''
 
         if self.get_value(): 
             # TODO: list support (like allocate multiple) (copy from taskdepends)
             # TODO: identifier conversion support?
-            return self.TEMPLATE.format(prop=self.get_name(),
-                                        value=self.VALUE_TEMPLATE.format(prefix=self.PREFIX,
-                                                                         value=self.get_value(),
-                                                                         suffix=self.SUFFIX))
-        return ''
+            yield self.TEMPLATE.format(prop=self.get_name(),
+                                       value=self.VALUE_TEMPLATE.format(prefix=self.PREFIX,
+                                                                        value=self.get_value(),
+                                                                        suffix=self.SUFFIX))
+
+    def write_to(self, stream):
+        '''
+        Write task property object in the task juggler syntax to a stream
+
+        Args:
+            stream (file): File-like object to write to
+        '''
+        for chunk in self.iter_chunks():
+            stream.write(chunk)
+
+    def __str__(self):
+        '''
+        Convert task property object to the task juggler syntax
+
+        Returns:
+            str: String representation of the task property in juggler syntax
+        '''
+        return ''.join(self.iter_chunks())
 
 class JugglerTaskAllocate(JugglerTaskProperty):
     '''Class for the allocate (assignee) of a juggler task'''
+    __slots__ = ()
 
     DEFAULT_NAME = 'allocate'
     DEFAULT_VALUE = 'not initialized'
@@ -203,6 +552,7 @@ class JugglerTaskAllocate(JugglerTaskProperty):
 
 class JugglerTaskPriority(JugglerTaskProperty):
     '''Class for task priority'''
+    __slots__ = ()
     LOG_STRING = "JugglerTaskPriority"
     DEFAULT_NAME = "priority"
     DEFAULT_VALUE = 1000
@@ -211,6 +561,7 @@ class JugglerTaskPriority(JugglerTaskProperty):
         return self.get_name()
 
 class JugglerTaskStart(JugglerTaskProperty):
+    __slots__ = ()
     LOG_STRING = "JugglerTaskStart"
     DEFAULT_NAME = "start"
     DEFAULT_VALUE = ""
@@ -218,10 +569,11 @@ class JugglerTaskStart(JugglerTaskProperty):
     def set_value(self, dt):
         if not dt: 
             self.value = ""
-            return
-        if not isinstance(dt, datetime.datetime):
+        elif not isinstance(dt, datetime.datetime):
             raise ValueError("Task start value should be datetime object")
-        self.value = dt
+        else:
+            self.value = dt
+        self.invalidate()
     
     def get_value(self):
         # TODO: fix API
@@ -235,6 +587,7 @@ class JugglerTaskStart(JugglerTaskProperty):
 
 class JugglerTaskEffort(JugglerTaskProperty):
     '''Class for the effort (estimate) of a juggler task'''
+    __slots__ = ()
 
     #For converting the seconds (generic) to days
     UNIT = 'h'
@@ -242,10 +595,10 @@ class JugglerTaskEffort(JugglerTaskProperty):
     DEFAULT_NAME = 'effort'
     MINIMAL_VALUE = 1 # TODO: should be project resolution, add check
     DEFAULT_VALUE = -1 
-    SUFFIX = UNIT
 
-    def load_default_properties(self, issue = None):
-        self.SUFFIX = self.UNIT
+    @property
+    def SUFFIX(self):
+        return self.UNIT
 
     def load_from_issue(self, issue):
         '''
@@ -263,6 +616,7 @@ class JugglerTaskEffort(JugglerTaskProperty):
         Default class unit is 'days'. Can be overrided by setting "UNIT" global class attribute
         '''
         self.value = int(value) # TODO: support for FP?
+        self.invalidate()
     def get_hash(self):
         return self.get_name()
     
@@ -285,6 +639,7 @@ class JugglerTaskEffort(JugglerTaskProperty):
 
 class JugglerTaskDepends(JugglerTaskProperty):
     '''Class for the effort (estimate) of a juggler task'''
+    __slots__ = ()
 
     DEFAULT_NAME = 'depends'
     DEFAULT_VALUE = []
@@ -298,6 +653,7 @@ class JugglerTaskDepends(JugglerTaskProperty):
             value (object): New value of the property
         '''
         self.value = list(value)
+        self.invalidate()
 
     def load_from_issue(self, issue):
         '''
@@ -320,34 +676,32 @@ class JugglerTaskDepends(JugglerTaskProperty):
 
         Args:
             task (JugglerTask): Task to which the property belongs
-            tasks (list):       List of JugglerTask's to which the current task belongs. Will be used to
+            tasks (dict):       JugglerTask's to which the current task belongs, indexed by id. Will be used to
                                 verify relations to other tasks.
         '''
         # TODO: add support for nested tasks with self.parent
         for val in list(self.get_value()):
-             if val not in [tsk.get_id() for tsk in tasks]:
+             if val not in tasks:
                  logging.warning('Removing link to %s for %s, as not within scope', val, task.get_id())
                  self.value.remove(val)
+                 self.invalidate()
 
-    def __str__(self):
+    def iter_chunks(self):
         '''
-        Convert task property object to the task juggler syntax
+        Render task property object to the task juggler syntax, fragment by fragment
 
-        Returns:
-            str: String representation of the task property in juggler syntax
+        Yields:
+            str: Fragments of the task property in juggler syntax
         '''
 
         if self.get_value():
-            valstr = ''
-            for val in self.get_value():
-                if valstr:
-                    valstr += ', '
-                valstr += self.VALUE_TEMPLATE.format(prefix=self.PREFIX,
-                                                     value=to_identifier(val),
-                                                     suffix=self.SUFFIX)
-            return self.TEMPLATE.format(prop=self.get_name(),
-                                        value=valstr)
-        return ''
+            identifiers = get_identifiers(self)
+            valstr = ', '.join(self.VALUE_TEMPLATE.format(prefix=self.PREFIX,
+                                                          value=identifiers.to_identifier(val),
+                                                          suffix=self.SUFFIX)
+                               for val in self.get_value())
+            yield self.TEMPLATE.format(prop=self.get_name(),
+                                       value=valstr)
 
 # class NonEmptyObject(object):
 #     def __init__(self):
@@ -361,6 +715,8 @@ class JugglerCompoundKeyword(object):
 
     '''Class for a general compound object in TJ syntax'''
 
+    __slots__ = ('empty', 'parent', 'top', 'keyword', 'id', 'summary', 'option2', 'properties', 'rendered')
+
     COMMENTS_HEADER = ""
     LOG_STRING = "DefaultKeyword"
     DEFAULT_KEYWORD = 'unknown_keyword'
@@ -368,17 +724,18 @@ class JugglerCompoundKeyword(object):
     DEFAULT_SUMMARY = '' # no summary is possible everywhere
     TEMPLATE = '''{header}\n{keyword} {id}'''
     ENCLOSED_BLOCK = True
+    TASK_CONTAINER = False # holds tasks without being a JugglerTask, e.g. a task table
 
     def __init__(self, issue=None):
-        logging.debug('Create %s', self.LOG_STRING)
         self.empty = False
+        self.rendered = None # cached rendering, see JugglerSource.enable_render_cache
         self.parent = None
         self.top = None
         self.keyword = self.DEFAULT_KEYWORD
         self.id = self.DEFAULT_ID
         self.summary = self.DEFAULT_SUMMARY
         self.option2 = ""
-        self.properties = OrderedDict()
+        self.properties = JugglerProperties()
         self.load_default_properties(issue)
         self._post_init(issue)
 
@@ -407,6 +764,13 @@ class JugglerCompoundKeyword(object):
     def get_id(self):
         return self.id
     
+    def get_identifier(self):
+        '''
+        Returns:
+            str: The id as written to the project, see JugglerIdentifiers
+        '''
+        return get_identifiers(self).to_identifier(self.id)
+    
     def get_hash(self):
         """Used to generate unique hash. 
         
@@ -419,12 +783,44 @@ class JugglerCompoundKeyword(object):
 
     def set_property(self, prop):
         if prop: 
-            self.properties[prop.get_hash()] = prop
+            hash = prop.get_hash()
+            replaced = self.properties.get(hash)
+            self.properties[hash] = prop
             prop.parent = self # TODO: control un-set?, GC?
             prop.top = self.top
+            if self.top is not None:
+                self.top.update_index(prop, replaced, self)
+            self.invalidate()
+    
+    def remove_property(self, hash):
+        '''
+        Remove a property
+
+        Args:
+            hash (str): The hash the property is stored under, see get_hash
+        '''
+        prop = self.properties.pop(hash)
+        if self.top is not None:
+            self.top.update_index(None, prop, self)
+        self.invalidate()
     
     def set_id(self, id):
+        old_id = self.id
         self.id = id
+        if self.top is not None:
+            self.top.update_index_id(self, old_id)
+        self.invalidate()
+    
+    def invalidate(self):
+        '''
+        Drop the cached rendering of the keyword and of the keywords it is in, see JugglerSource.enable_render_cache
+        
+        The setters call it, call it after changing attributes (e.g. summary) directly.
+        '''
+        node = self
+        while node is not None:
+            node.rendered = None
+            node = node.parent
     
     def decode(self):
         return self.option2
@@ -441,21 +837,76 @@ class JugglerCompoundKeyword(object):
                 ls.append(item)
         return ls
     
-    def __str__(self):
-        if self.empty: return ""
-        out = self.TEMPLATE.format(header=self.COMMENTS_HEADER,keyword=self.keyword, id=to_identifier(self.id))
+    def iter_walk(self, cls, nested = False):
+        '''
+        Lazy walk(): yields what walk(cls) returns, in the same order, without building the list
+        
+        Args:
+            cls (type):    Class of the keywords and properties to yield
+            nested (bool): Leave out the keyword itself, as when a parent is walked
+        '''
+        if not nested and isinstance(self, cls):
+            yield self
+        for item in self.properties.values():
+            if isinstance(item, JugglerCompoundKeyword):
+                for nested_item in item.iter_walk(cls, True):
+                    yield nested_item
+            if isinstance(item, cls):
+                yield item
+    
+    def iter_chunks(self):
+        '''
+        Render the keyword with all its properties, fragment by fragment
+        
+        If the source caches renderings, the keyword is rendered as one fragment that is kept until
+        it or one of its properties changes.
+
+        Returns:
+            iterator: Fragments (str) of the keyword in juggler syntax
+        '''
+        rendered = self.rendered
+        if rendered is None:
+            top = self.top
+            if top is None or not top.render_cache:
+                return self.iter_fragments()
+            rendered = self.rendered = ''.join(self.iter_fragments())
+        return iter((rendered,))
+    
+    def iter_fragments(self):
+        '''
+        Render the keyword with all its properties, fragment by fragment, without the cache
+
+        Yields:
+            str: Fragments of the keyword in juggler syntax
+        '''
+        if self.empty: return
+        yield self.TEMPLATE.format(header=self.COMMENTS_HEADER, keyword=self.keyword, id=self.get_identifier())
         if self.summary:
-            out += ' "%s"' % self.summary.replace('\"', '\\\"')
+            yield ' "%s"' % self.summary.replace('\"', '\\\"')
         if self.option2:
-            out += ' %s ' % self.option2
-        if self.properties and self.ENCLOSED_BLOCK: out += " {\n"
-        for prop in self.properties:
-            out += str(self.properties[prop])
-        if self.properties and self.ENCLOSED_BLOCK: out += "\n}"
-        return out
+            yield ' %s ' % self.option2
+        if self.properties and self.ENCLOSED_BLOCK: yield " {\n"
+        for prop in self.properties.values():
+            for chunk in prop.iter_chunks():
+                yield chunk
+        if self.properties and self.ENCLOSED_BLOCK: yield "\n}"
+    
+    def write_to(self, stream):
+        '''
+        Write the keyword in juggler syntax to a stream without building the whole string
+
+        Args:
+            stream (file): File-like object to write to
+        '''
+        for chunk in self.iter_chunks():
+            stream.write(chunk)
+    
+    def __str__(self):
+        return ''.join(self.iter_chunks())
 
 class JugglerSimpleProperty(JugglerCompoundKeyword):
     """By default only one simple property is allowed."""
+    __slots__ = ()
     LOG_STRING = "Default Simple Property"
     DEFAULT_NAME = 'unknown_property'
     DEFAULT_VALUE = ''
@@ -479,8 +930,12 @@ class JugglerSimpleProperty(JugglerCompoundKeyword):
     def get_value(self):
         return self.id
     
+    def get_identifier(self):
+        return self.id # the value, written as is
+    
     def set_value(self, val):
         if val or val == 0: self.id = repr(val).replace("'",'"')
+        self.invalidate()
     
 class JugglerTimezone(JugglerSimpleProperty):
     '''
@@ -490,32 +945,93 @@ class JugglerTimezone(JugglerSimpleProperty):
     Supports all tzdata values, see https://en.wikipedia.org/wiki/List_of_tz_database_time_zones
     or https://stackoverflow.com/q/13866926
     '''
+    __slots__ = ()
     DEFAULT_NAME = 'timezone'
     DEFAULT_VALUE = 'UTC'
     # DEFAULT_VALUE = 'Europe/Dublin'
     
     # TODO: checks!
+    
+    def get_tzinfo(self):
+        '''
+        Returns:
+            tzinfo: The pytz timezone of the value
+        '''
+        value = self.get_value() # quoted by set_value, with the u prefix of unicode values
+        if value.startswith('u'):
+            value = value[1:]
+        return pytz.timezone(value.strip('"'))
 
 class JugglerOutputdir(JugglerSimpleProperty):
+    __slots__ = ()
     LOG_STRING = "outputdir property"
     DEFAULT_NAME = 'outputdir'
     DEFAULT_VALUE = 'REPORT'
     # TODO HERE: need to create the outputdir folder for this to execute!
 
-class JugglerIcalreport(JugglerSimpleProperty):
+class JugglerReport(JugglerSimpleProperty):
+    '''Report with an output file name as value and an optional report id'''
+    __slots__ = ()
+    
+    def set_report_id(self, report_id = None):
+        '''
+        Set (or remove) the report id, needed to request the report from tj3d
+        '''
+        self.keyword = self.DEFAULT_NAME
+        if report_id:
+            self.keyword += ' ' + report_id
+        self.invalidate()
+    
+    def get_hash(self):
+        return self.DEFAULT_NAME
+
+class JugglerIcalreport(JugglerReport):
+    __slots__ = ()
     LOG_STRING = "icalreport property"
     DEFAULT_NAME = 'icalreport'
     DEFAULT_VALUE = 'calendar'
 
+class JugglerReportAttribute(JugglerTaskProperty):
+    '''Attribute of a report, written as is. Created from a (name, value) tuple'''
+    __slots__ = ()
+    LOG_STRING = "report attribute"
+    DEFAULT_VALUE = ''
+    
+    def load_from_issue(self, issue):
+        self.name, value = issue
+        self.set_value(value)
+    
+    def get_hash(self):
+        return self.get_name()
+
+class JugglerExport(JugglerReport):
+    '''
+    Export report with the bookings of every task, in TJP syntax.
+    Used to read back exact per-resource, per-segment bookings.
+    '''
+    __slots__ = ()
+    LOG_STRING = "export report"
+    DEFAULT_NAME = 'export'
+    DEFAULT_VALUE = 'bookings'
+    
+    def load_default_properties(self, issue = None):
+        JugglerSimpleProperty.load_default_properties(self, issue)
+        self.set_property(JugglerReportAttribute(("definitions", "-")))
+        self.set_property(JugglerReportAttribute(("taskattributes", "booking")))
+        self.set_property(JugglerReportAttribute(("resourceattributes", "-")))
+
 class JugglerResource(JugglerCompoundKeyword):
+    __slots__ = ()
     DEFAULT_KEYWORD = "resource"
     DEFAULT_ID = "me"
     DEFAULT_SUMMARY = "Default Resource"
     
     def set_value(self, value):
         self.summary = value
+        self.invalidate()
 
 class JugglerWorkingHours(JugglerCompoundKeyword):
+    __slots__ = ()
     DEFAULT_KEYWORD = "workinghours"
     DEFAULT_ID = "mon"
     DEFAULT_SUMMARY = ""
@@ -523,6 +1039,7 @@ class JugglerWorkingHours(JugglerCompoundKeyword):
     def set_id(self, id):
         if not id in ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]: raise ValueError('id for workinghours must be one of: "mon", "tue", "wed", "thu", "fri", "sat", "sun"')
         self.id = id
+        self.invalidate()
     
     def set_weekday(self, d = "mon"):
         """
@@ -536,10 +1053,12 @@ class JugglerWorkingHours(JugglerCompoundKeyword):
         
     def set_hour_interval(self, start = 9, end = 19):
         self.option2 = "%s:00 - %s:00" % (start, end)
+        self.invalidate()
 
 class JugglerTask(JugglerCompoundKeyword):
 
     '''Class for a task for Task-Juggler'''
+    __slots__ = ()
 
     LOG_STRING = "JugglerTask"
     DEFAULT_KEYWORD = 'task'
@@ -569,14 +1088,24 @@ class JugglerTask(JugglerCompoundKeyword):
         Validate (and correct) the current task
 
         Args:
-            tasks (list): List of JugglerTask's to which the current task belongs. Will be used to
-                          verify relations to other tasks.
+            tasks (dict): JugglerTask's to which the current task belongs, indexed by id. Will be used to
+                          verify relations to other tasks. A list is accepted too and indexed on the fly.
         '''
         if self.id == self.DEFAULT_ID:
             logging.error('Found a task which is not initialized')
 
-        for prop in self.properties:
-            self.properties[prop].validate(self, tasks)
+        if not isinstance(tasks, dict):
+            tasks = dict((tsk.get_id(), tsk) for tsk in tasks)
+
+        for prop in self.properties.values():
+            if isinstance(prop, JugglerTaskProperty): # not bookings of an earlier run
+                prop.validate(self, tasks)
+
+    def clear_bookings(self):
+        '''Remove all bookings of the task, e.g. before loading new scheduling results'''
+        for key, prop in list(self.properties.items()):
+            if isinstance(prop, JugglerBooking):
+                self.remove_property(key)
 
     # def __str__(self):
     #     '''
@@ -597,6 +1126,7 @@ class JugglerTimesheet():
     pass
 
 class JugglerBooking(JugglerCompoundKeyword):
+    __slots__ = ('start', 'end')
     LOG_STRING = "JugglerBooking"
     DEFAULT_KEYWORD = "booking"
     DEFAULT_ID = "me" # resource
@@ -612,6 +1142,11 @@ class JugglerBooking(JugglerCompoundKeyword):
         self.start = start
         self.end = end
         self.option2 = to_tj3interval(self.start, self.end)
+        self.invalidate()
+    
+    def get_hash(self):
+        '''A task may have several bookings, one per resource and interval'''
+        return self.get_name() + repr(self.get_id()) + self.option2
     
     def decode(self):
         return [self.start, self.end]
@@ -622,9 +1157,18 @@ class JugglerBooking(JugglerCompoundKeyword):
         self.set_interval(start, end)
         self.set_resource(issue["resource"])
 
+class JugglerScenario(JugglerCompoundKeyword):
+    '''Project scenario, derived scenarios are added as properties'''
+    __slots__ = ()
+    LOG_STRING = "JugglerScenario"
+    DEFAULT_KEYWORD = "scenario"
+    DEFAULT_ID = "plan"
+    DEFAULT_SUMMARY = "Plan"
+
 class JugglerProject(JugglerCompoundKeyword):
     
     '''Template for TaskJuggler project'''
+    __slots__ = ()
     
     LOG_STRING = "JugglerProject"
     DEFAULT_KEYWORD = 'project'
@@ -636,8 +1180,19 @@ class JugglerProject(JugglerCompoundKeyword):
         self.set_property(JugglerOutputdir())
         self.set_interval()
     
-    def set_interval(self, start = datetime.datetime.now().replace(microsecond=0,second=0,minute=0), end = datetime.datetime(2035, 1, 1)):
+    def set_interval(self, start = None, end = datetime.datetime(2035, 1, 1)):
+        '''
+        Set the project interval
+
+        Args:
+            start (datetime): Project start, defaults to the current hour (evaluated on every call,
+                              so cached schedules of an unchanged project expire when the hour changes)
+            end (datetime):   Project end
+        '''
+        if start is None:
+            start = datetime.datetime.now().replace(microsecond=0,second=0,minute=0)
         self.option2 = to_tj3interval(start, end)
+        self.invalidate()
         
 
 class JugglerSource(JugglerCompoundKeyword):
@@ -648,6 +1203,7 @@ class JugglerSource(JugglerCompoundKeyword):
     
     Must be extended with load_from_issue(self,issue) appending tasks 
     """
+    __slots__ = ('task_index', 'task_containers', 'resource_index', 'identifiers', 'render_cache', 'registry')
     
     LOG_STRING = "JugglerSource"
     DEFAULT_KEYWORD = ''
@@ -666,12 +1222,716 @@ class JugglerSource(JugglerCompoundKeyword):
     
     def _post_init(self, issue = None):
         self.top = self
+        self.task_index = {}
+        self.task_containers = [] # e.g. task tables, which look their rows up themselves
+        self.resource_index = self.index_resources() # the default resources are set before the source is its own top
+        self.identifiers = JugglerIdentifiers()
+        self.render_cache = False
+        self.registry = None # built on the first walk
+    
+    def enable_render_cache(self, enabled=True):
+        '''
+        Keep the rendering of every keyword until it changes, so that rendering the project
+        again after a few changes only renders the changed keywords (and joins the others)
         
+        Costs the memory of a second copy of the rendered project.
+
+        Args:
+            enabled (bool): False drops the cached renderings
+        '''
+        self.render_cache = enabled
+        if not enabled:
+            for node in self.iter_walk(JugglerCompoundKeyword):
+                node.rendered = None
+    
+    def index_resources(self):
+        '''
+        Returns:
+            dict: The resources of the project by id
+        '''
+        return dict((prop.get_id(), prop) for prop in self.properties.values() if isinstance(prop, JugglerResource))
+    
+    def update_index(self, prop, replaced = None, parent = None):
+        '''
+        Keep the task and resource indexes and the registry in sync after a property was set or removed anywhere in the tree
+
+        Args:
+            prop (object):     The property that was set, None if one was removed
+            replaced (object): The property previously stored under the same hash, if any
+            parent (object):   The keyword the property was set on or removed from
+        '''
+        if isinstance(replaced, JugglerResource) and self.resource_index.get(replaced.get_id()) is replaced:
+            del self.resource_index[replaced.get_id()]
+        if isinstance(prop, JugglerResource):
+            self.resource_index[prop.get_id()] = prop
+        if isinstance(replaced, JugglerCompoundKeyword) and replaced is not prop:
+            if self.registry is not False:
+                self.registry = None # rebuilt on the next walk
+            for node in self.subtree(replaced):
+                if isinstance(node, JugglerTask) and self.task_index.get(node.get_id()) is node:
+                    del self.task_index[node.get_id()]
+                if node.TASK_CONTAINER:
+                    self.task_containers = [container for container in self.task_containers if container is not node]
+                if node.top is self:
+                    node.top = None # out of the tree, changes to it are no longer reported here
+        if isinstance(prop, JugglerCompoundKeyword):
+            nodes = self.subtree(prop)
+            for node in nodes:
+                if isinstance(node, JugglerTask):
+                    self.task_index[node.get_id()] = node
+                elif node.TASK_CONTAINER and all(container is not node for container in self.task_containers):
+                    self.task_containers.append(node)
+            self.register(prop, parent is self and replaced is None, nodes)
+    
+    @staticmethod
+    def subtree(prop):
+        '''
+        Returns:
+            list: The keywords in a keyword and the keyword itself, in walk order; only the keyword for a task container, which indexes its rows itself
+        '''
+        if prop.TASK_CONTAINER:
+            return [prop]
+        nodes = prop.walk(JugglerCompoundKeyword, [])
+        nodes.append(prop)
+        return nodes
+    
+    def register(self, prop, last, nodes = None):
+        '''
+        Add a keyword and the keywords in it to the registry, see lookup
+        
+        A keyword of a type the registry already has is only appended if it comes last in walk
+        order, which is known when it is a new property of the source itself. Otherwise the
+        registry is rebuilt on the next walk.
+
+        Args:
+            prop (JugglerCompoundKeyword): Keyword just set somewhere in the tree
+            last (bool):                   It is the last property of the source
+            nodes (list):                  subtree(prop), if already walked
+        '''
+        if prop.TASK_CONTAINER:
+            self.registry = False # walks its rows itself
+            return
+        if nodes is None:
+            nodes = self.subtree(prop)
+        registry = self.registry
+        for node in nodes:
+            if node.top is None:
+                node.top = self # keywords set before they were in the source report here from now on
+            if registry: # not None (to be built) or False (disabled)
+                same = registry.get(type(node))
+                if same is None:
+                    registry[type(node)] = [node]
+                elif last or not same:
+                    same.append(node)
+                else:
+                    registry = self.registry = None
+    
+    def build_registry(self):
+        '''
+        Returns:
+            dict: type -> keywords of exactly that type in walk order, False if the tree has a task container
+        '''
+        if any(prop.TASK_CONTAINER for prop in self.properties.itervalues()):
+            return False
+        registry = {JugglerSource: []} # never empty, so that it is true when built
+        for node in JugglerCompoundKeyword.walk(self, JugglerCompoundKeyword, []):
+            if node.TASK_CONTAINER:
+                return False
+            if node.top is None:
+                node.top = self
+            registry.setdefault(type(node), []).append(node)
+        return registry
+    
+    def lookup(self, cls):
+        '''
+        Keywords of a class in walk order from the registry, in O(number of types)
+        
+        Returns:
+            list: The registry's own list of the keywords below the source (do not modify),
+                  None if the registry cannot answer: cls is not a keyword class, the keywords
+                  are of several types, or the tree has a task container
+        '''
+        if not isinstance(cls, type) or not issubclass(cls, JugglerCompoundKeyword):
+            return None
+        registry = self.registry
+        if registry is None:
+            registry = self.registry = self.build_registry()
+        if registry is False:
+            return None
+        found = [nodes for type_, nodes in registry.items() if nodes and issubclass(type_, cls)]
+        if len(found) > 1:
+            return None
+        return found[0] if found else []
+    
+    def walk(self, cls, ls = None):
+        '''
+        Keywords and properties of a class in the tree, see JugglerCompoundKeyword.walk
+        
+        Keywords are looked up in the registry, properties are searched for.
+        '''
+        nodes = self.lookup(cls) if ls is None else None
+        if nodes is None:
+            return JugglerCompoundKeyword.walk(self, cls, ls)
+        return ([self] if isinstance(self, cls) else []) + nodes
+    
+    def iter_walk(self, cls, nested = False):
+        nodes = self.lookup(cls)
+        if nodes is None:
+            return JugglerCompoundKeyword.iter_walk(self, cls, nested)
+        return itertools.chain([self] if isinstance(self, cls) and not nested else [], nodes)
+    
+    def update_index_id(self, prop, old_id):
+        '''
+        Re-key an indexed task or resource after its id was changed
+
+        Args:
+            prop (object): The keyword whose id was changed
+            old_id:        The id it was indexed under
+        '''
+        for index in (self.task_index, self.resource_index):
+            if index.get(old_id) is prop:
+                del index[old_id]
+                index[prop.get_id()] = prop
+    
+    def get_task(self, id):
+        '''
+        Get task by its (original, not converted to identifier) id, also from the task containers in the tree
+
+        Returns:
+            JugglerTask: the task, or None if no task with this id is in the tree
+        '''
+        task = self.task_index.get(id)
+        if task is None:
+            for container in self.task_containers:
+                task = container.get_task(id)
+                if task is not None:
+                    break
+        return task
+    
+    def get_resource(self, id):
+        '''
+        Get resource by its id in O(1)
+
+        Returns:
+            JugglerResource: the resource, or None if the project has no resource with this id
+        '''
+        return self.resource_index.get(id)
+    
+    def subset(self, tasks):
+        '''
+        Source with a private copy of the project settings and only the given tasks
+        
+        The tasks are referenced, not copied or re-parented, so bookings read into the
+        subset land in this tree.
+
+        Args:
+            tasks (list): JugglerTask's of this source
+
+        Returns:
+            JugglerSource: a source of the same class
+        '''
+        sub = type(self)()
+        sub.properties = JugglerProperties()
+        sub.identifiers = self.identifiers # the tasks render with the identifiers of this source
+        sub.registry = False # and report changes to this source
+        memo = {id(self): sub}
+        for key, prop in self.properties.items():
+            if not isinstance(prop, JugglerTask) and not prop.TASK_CONTAINER:
+                sub.properties[key] = copy.deepcopy(prop, memo)
+        for task in tasks:
+            sub.properties[task.get_hash()] = task
+            sub.task_index[task.get_id()] = task
+        sub.resource_index = sub.index_resources()
+        return sub
+
+def partition_tasks(tasks):
+    '''
+    Split tasks into groups that share no resources and no dependencies (union-find)
+    
+    Such groups can be scheduled independently with the same result.
+
+    Args:
+        tasks (list): List of JugglerTask's
+
+    Returns:
+        list: Lists of tasks, in order of first appearance, tasks keep their order within a group
+    '''
+    parent = {}
+    
+    def find(node):
+        root = node
+        while parent[root] != root:
+            root = parent[root]
+        while parent[node] != root: # path compression
+            parent[node], node = root, parent[node]
+        return root
+    
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a != b:
+            parent[b] = a
+    
+    ids = set(task.get_id() for task in tasks)
+    for task in tasks:
+        parent.setdefault(('task', task.get_id()), ('task', task.get_id()))
+    for task in tasks:
+        node = ('task', task.get_id())
+        for prop in task.properties.values():
+            if isinstance(prop, JugglerTaskAllocate):
+                value = prop.get_value()
+                resources = value if isinstance(value, (list, tuple)) else str(value).split(',')
+                for resource in resources:
+                    resource = ('resource', str(resource).strip())
+                    parent.setdefault(resource, resource)
+                    union(node, resource)
+            elif isinstance(prop, JugglerTaskDepends):
+                for dep in prop.get_value():
+                    if dep in ids:
+                        union(node, ('task', dep))
+    groups = OrderedDict()
+    for task in tasks:
+        groups.setdefault(find(('task', task.get_id())), []).append(task)
+    return list(groups.values())
+
+class JugglerDependencyError(ValueError):
+    '''Raised when the task dependencies can not be scheduled (e.g. contain cycles)'''
+    
+    def __init__(self, cycles):
+        self.cycles = cycles
+        ValueError.__init__(self, 'Dependency cycles found: %s' % '; '.join(
+            ' -> '.join(repr(id) for id in cycle + cycle[:1]) for cycle in cycles))
+
+class JugglerTaskGraph(object):
+    '''
+    Dependency graph of a set of tasks, built once in O(V+E)
+    
+    Holds the tasks indexed by id, the in-scope dependency edges, the dangling references,
+    a topological order (dependencies first) and every dependency cycle by original task id.
+    '''
+    
+    def __init__(self, tasks):
+        '''
+        Build the graph
+
+        Args:
+            tasks (list): List of JugglerTask's
+        '''
+        self.ids = [task.get_id() for task in tasks]
+        self.tasks = dict(zip(self.ids, tasks))
+        self.depends = {}
+        self.dangling = []
+        for id, task in zip(self.ids, tasks):
+            depends = []
+            for prop in task.properties.values():
+                if not isinstance(prop, JugglerTaskDepends):
+                    continue
+                for val in prop.get_value():
+                    if val in self.tasks:
+                        depends.append(val)
+                    else:
+                        self.dangling.append((id, val))
+            self.depends[id] = depends
+        self._build()
+    
+    @classmethod
+    def from_depends(cls, ids, depends, tasks):
+        '''
+        Build the graph from already resolved dependencies, without walking task properties
+
+        Args:
+            ids (list):     Task ids
+            depends (dict): Task id -> list of in-scope ids it depends on
+            tasks (dict):   Task id -> task, any mapping (e.g. a columnar task table)
+
+        Returns:
+            JugglerTaskGraph: graph without dangling references
+        '''
+        graph = cls.__new__(cls)
+        graph.ids = ids
+        graph.tasks = tasks
+        graph.depends = depends
+        graph.dangling = []
+        graph._build()
+        return graph
+    
+    def _build(self):
+        self.order = self._sort()
+        self.cycles = self._find_cycles() if len(self.order) < len(self.depends) else []
+    
+    def _sort(self):
+        '''Kahn's topological sort, nodes on or behind a cycle are left out'''
+        dependents = dict((id, []) for id in self.depends)
+        pending = {}
+        for id, depends in self.depends.items():
+            pending[id] = len(depends)
+            for dep in depends:
+                dependents[dep].append(id)
+        order = [id for id in self.ids if not pending[id]]
+        for id in order: # order grows while iterating
+            for dep in dependents[id]:
+                pending[dep] -= 1
+                if not pending[dep]:
+                    order.append(dep)
+        return order
+    
+    def _find_cycles(self):
+        '''Iterative Tarjan SCC over the unsorted rest, one cycle path per strongly connected component'''
+        sorted_ids = set(self.order)
+        index = {}
+        lowlink = {}
+        stack = []
+        on_stack = set()
+        cycles = []
+        for root in self.ids:
+            if root in sorted_ids or root in index:
+                continue
+            work = [(root, iter(self.depends[root]))]
+            index[root] = lowlink[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            while work:
+                id, edges = work[-1]
+                for dep in edges:
+                    if dep in sorted_ids:
+                        continue
+                    if dep not in index:
+                        index[dep] = lowlink[dep] = len(index)
+                        stack.append(dep)
+                        on_stack.add(dep)
+                        work.append((dep, iter(self.depends[dep])))
+                        break
+                    if dep in on_stack:
+                        lowlink[id] = min(lowlink[id], index[dep])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[id])
+                    if lowlink[id] == index[id]:
+                        component = set()
+                        while True:
+                            member = stack.pop()
+                            on_stack.discard(member)
+                            component.add(member)
+                            if member == id:
+                                break
+                        if len(component) > 1 or id in self.depends[id]:
+                            cycles.append(self._cycle_path(id, component))
+        return cycles
+    
+    def _cycle_path(self, start, component):
+        '''Follow in-component edges from start until a node repeats'''
+        path = []
+        seen = {}
+        id = start
+        while id not in seen:
+            seen[id] = len(path)
+            path.append(id)
+            id = next(dep for dep in self.depends[id] if dep in component)
+        return path[seen[id]:]
+    
+    def check(self):
+        '''
+        Raise JugglerDependencyError if the graph has cycles
+
+        Returns:
+            list: Task ids in topological order
+        '''
+        if self.cycles:
+            raise JugglerDependencyError(self.cycles)
+        return self.order
+
+def cpu_time():
+    '''CPU time of this process and of its finished child processes (e.g. tj3), in seconds'''
+    times = os.times()
+    return times[0] + times[1] + times[2] + times[3]
+
+class JugglerStats(object):
+    '''
+    Per-phase timing and counters of juggle() and run()
+    
+    A phase accumulates wall and CPU time over every time it is entered, CPU time includes
+    child processes such as tj3. Hooks are called as hook(stats, phase) after every phase.
+    '''
+    
+    enabled = True
+    
+    def __init__(self, hooks=()):
+        '''
+        Args:
+            hooks (list): Callables called as hook(stats, phase) when a phase ends
+        '''
+        self.phases = OrderedDict() # name -> [wall seconds, cpu seconds]
+        self.counters = OrderedDict()
+        self.hooks = list(hooks)
+    
+    @contextlib.contextmanager
+    def phase(self, name):
+        '''Time the enclosed block as the given phase'''
+        wall, cpu = time.time(), cpu_time()
+        try:
+            yield self
+        finally:
+            spent = self.phases.setdefault(name, [0.0, 0.0])
+            spent[0] += time.time() - wall
+            spent[1] += cpu_time() - cpu
+            for hook in self.hooks:
+                hook(self, name)
+    
+    def count(self, name, value):
+        '''Set a counter, e.g. number of tasks or tj3 exit code'''
+        self.counters[name] = value
+    
+    def report(self):
+        '''
+        Returns:
+            str: The phases and counters as a table
+        '''
+        lines = ["%-16s %10s %10s" % ("phase", "wall s", "cpu s")]
+        lines += ["%-16s %10.3f %10.3f" % (name, wall, cpu) for name, (wall, cpu) in self.phases.items()]
+        lines += ["%-16s %10s" % (name, value) for name, value in self.counters.items()]
+        return "\n".join(lines)
+
+class JugglerNullStats(object):
+    '''Stand-in for JugglerStats when stats are disabled, every call is a no-op'''
+    
+    enabled = False
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc):
+        return False
+    
+    def phase(self, name):
+        return self
+    
+    def count(self, name, value):
+        pass
+
+NO_STATS = JugglerNullStats()
+
+class JugglerRunError(RuntimeError):
+    '''Raised when tj3 fails and does not write the report that is read back'''
+    
+    def __init__(self, exit_code, report_path):
+        self.exit_code = exit_code
+        self.report_path = report_path
+        RuntimeError.__init__(self, 'tj3 failed with exit code %s, report %s was not written' % (exit_code, report_path))
+
+class JugglerRunner(object):
+    '''Runs tj3 on a rendered project file'''
+    
+    def run(self, infile, outfolder, project_id, reports):
+        '''
+        Schedule the project and write the reports
+
+        Args:
+            infile (str):     The .tjp file to schedule
+            outfolder (str):  Folder the project's outputdir points to
+            project_id (str): Identifier of the project in the file
+            reports (list):   (report id, path) tuples of the reports that are read back afterwards
+
+        Returns:
+            int: tj3 exit code
+        '''
+        raise NotImplementedError
+
+class JugglerSubprocessRunner(JugglerRunner):
+    '''Runs a one-shot tj3 process for every project'''
+    
+    COMMAND = ["/usr/bin/env", "tj3"]
+    
+    def run(self, infile, outfolder, project_id, reports):
+        import subprocess
+        return subprocess.call(self.COMMAND + [infile])
+
+class JugglerDaemonRunner(JugglerRunner):
+    '''
+    Submits projects to a local tj3d daemon with tj3client, so Ruby and the
+    TaskJuggler gems are loaded only once instead of on every run.
+    
+    Attaches to a daemon already answering on the given config, otherwise starts one.
+    Falls back to the one-shot runner if the daemon can not be used.
+    
+    A daemon started here and the generated config are removed by terminate(), which is
+    called at exit or when the runner is used as a context manager.
+    '''
+    
+    TJ3D = "tj3d"
+    TJ3CLIENT = "tj3client"
+    START_TIMEOUT = 30 # seconds
+    
+    def __init__(self, config = None, port = 8474, fallback = None):
+        '''
+        Args:
+            config (str):            tj3 config file with the daemon authKey, a private one is created if not given
+            port (int):              Port of the daemon, used for the created config
+            fallback (JugglerRunner): Runner to use when the daemon fails, JugglerSubprocessRunner by default
+        '''
+        import atexit, tempfile, threading
+        self.tempdir = None
+        if config is None:
+            self.tempdir = tempfile.mkdtemp("TJ3D")
+            config = os.path.join(self.tempdir, "taskjugglerrc")
+            with open(config, 'w') as rc:
+                rc.write("_global:\n  authKey: %s\n  port: %s\n" % (binascii.hexlify(os.urandom(16)).decode(), port))
+        self.config = config
+        self.fallback = fallback or JugglerSubprocessRunner()
+        self.lock = threading.Lock() # projects share ids, submit one at a time
+        self.started = False
+        atexit.register(self.terminate)
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, *exc_info):
+        self.terminate()
+    
+    def client(self, *args, **kwargs):
+        import subprocess
+        return subprocess.Popen([self.TJ3CLIENT, "--silent", "-c", self.config] + list(args),
+                                stdout=kwargs.get("stdout", subprocess.PIPE), stderr=subprocess.PIPE)
+    
+    def client_call(self, *args):
+        proc = self.client(*args)
+        out, err = proc.communicate()
+        if proc.returncode:
+            raise OSError("tj3client %s failed: %s" % (args[0], err.strip()))
+        return out
+    
+    def ensure_daemon(self):
+        '''Attach to the daemon, or start it and wait until it answers'''
+        try:
+            self.client_call("status")
+            return
+        except OSError:
+            pass
+        import subprocess
+        subprocess.check_call([self.TJ3D, "-c", self.config])
+        self.started = True
+        deadline = time.time() + self.START_TIMEOUT
+        while True:
+            try:
+                self.client_call("status")
+                return
+            except OSError:
+                if time.time() > deadline:
+                    raise
+                time.sleep(0.1)
+    
+    def run(self, infile, outfolder, project_id, reports):
+        import subprocess
+        try:
+            with self.lock:
+                self.ensure_daemon()
+                self.client_call("add", infile)
+                try:
+                    for report_id, path in reports:
+                        with open(path, 'w') as out:
+                            proc = self.client("report", project_id, report_id, stdout=out)
+                            err = proc.communicate()[1]
+                        if proc.returncode:
+                            raise OSError("tj3client report failed: %s" % err.strip())
+                finally:
+                    self.client_call("remove", project_id)
+            return 0
+        except (OSError, subprocess.CalledProcessError) as e:
+            logging.warning("tj3d failed, running tj3 directly: %s", e)
+            return self.fallback.run(infile, outfolder, project_id, reports)
+    
+    def terminate(self):
+        '''Stop the daemon if this runner started it and remove the config it generated'''
+        if self.started:
+            try: self.client_call("terminate")
+            except OSError: pass
+            self.started = False
+        if self.tempdir is not None:
+            import shutil
+            shutil.rmtree(self.tempdir, ignore_errors=True)
+            self.tempdir = None
+
+def iter_prefetched_pages(fetch, prefetch=1, concurrency=1):
+    '''
+    Fetch pages on background threads while the caller works on the ones already fetched
+    
+    Pages are fetched in order of their number, at most prefetch pages ahead of the one the
+    caller is at, and yielded in order up to and including the first empty one. An exception
+    raised by fetch is raised here when the caller gets to its page.
+    
+    Args:
+        fetch (callable):  Called as fetch(page number), returns the list of issues on that page.
+                           With one thread the pages are requested one after the other.
+        prefetch (int):    Number of pages fetched ahead, bounds the pages held in memory
+        concurrency (int): Number of fetch threads
+    
+    Yields:
+        list: The pages
+    '''
+    import threading
+    cond = threading.Condition()
+    pages = {} # page number -> (issues, exception)
+    state = {"next": 0, "consumed": 0, "end": None, "closed": False}
+    
+    def done(number):
+        return state["closed"] or (state["end"] is not None and number > state["end"])
+    
+    def worker():
+        while True:
+            with cond:
+                while not done(state["next"]) and state["next"] >= state["consumed"] + prefetch:
+                    cond.wait()
+                number = state["next"]
+                if done(number):
+                    return
+                state["next"] += 1
+            try:
+                page = (fetch(number), None)
+            except Exception as e: # pylint:disable=broad-except
+                logging.debug('Fetching page %d failed', number, exc_info=True)
+                page = (None, e)
+            with cond:
+                pages[number] = page
+                if page[1] is not None or not page[0]:
+                    state["end"] = number if state["end"] is None else min(state["end"], number)
+                cond.notify_all()
+    
+    threads = [threading.Thread(target=worker, name="prefetch-%d" % i) for i in range(max(1, concurrency))]
+    for thread in threads:
+        thread.daemon = True
+        thread.start()
+    try:
+        number = 0
+        while True:
+            with cond:
+                while number not in pages:
+                    cond.wait()
+                issues, error = pages.pop(number)
+                state["consumed"] = number + 1
+                cond.notify_all()
+            if error is not None:
+                raise error
+            yield issues
+            if not issues:
+                return
+            number += 1
+    finally:
+        with cond:
+            state["closed"] = True
+            cond.notify_all()
+
 class GenericJuggler(object):
 
     '''Class for task-juggling generic results'''
     
     src = None
+    graph = None
+    cache = None # optional JugglerScheduleCache, see cache module
+    runner = JugglerSubprocessRunner()
+    stats = NO_STATS # see enable_stats
+    temporary = () # folder and file the last run() created, removed by clean()
+    prefetch = 0 # pages fetched ahead on a background thread while tasks are built, 0 loads serially
+    concurrency = 1 # fetch threads when prefetching, more than one needs load_issues_page to be overridden
     
     def __init__(self):
         '''
@@ -683,6 +1943,19 @@ class GenericJuggler(object):
 
         logging.info('generic load')
 
+    def enable_stats(self, hook=None):
+        '''
+        Record per-phase timing and counters of juggle() and run() in self.stats
+        
+        Args:
+            hook (callable): Called as hook(stats, phase) whenever a phase ends
+        
+        Returns:
+            JugglerStats: the stats object
+        '''
+        self.stats = JugglerStats([hook] if hook else [])
+        return self.stats
+    
     def set_query(self, query):
         '''
         Set the query for the generic juggler object
@@ -702,9 +1975,20 @@ class GenericJuggler(object):
 
         Args:
             tasks (list): List of JugglerTask's to validate
+
+        Returns:
+            JugglerTaskGraph: dependency graph of the tasks, with topological order and cycles
         '''
+        graph = JugglerTaskGraph(tasks)
         for task in tasks:
-            task.validate(tasks)
+            task.validate(graph.tasks)
+        return graph
+    
+    def build_graph(self):
+        '''
+        Validate the tasks of the project and build their dependency graph, see validate_tasks
+        '''
+        return self.validate_tasks(self.src.walk(JugglerTask))
     
     def load_issues(self):
         raise NotImplementedError
@@ -725,6 +2009,33 @@ class GenericJuggler(object):
         self.loaded = True
         return self.load_issues()
     
+    def load_issues_page(self, page):
+        '''
+        Load one page of issues, loading stops at the first empty page
+        
+        The default returns the next page of load_issues_incremetal, whatever the page number.
+        Override it to fetch pages by number, so that several can be fetched at once.
+        
+        Args:
+            page (int): Number of the page, from 0
+        
+        Returns:
+            list: The issues on the page
+        '''
+        return self.load_issues_incremetal()
+    
+    def iter_pages(self):
+        '''
+        Yields:
+            list: The pages of issues up to and including the first empty one, prefetched if self.prefetch is set
+        '''
+        if self.prefetch <= 0:
+            return (self.load_issues_page(number) for number in itertools.count())
+        concurrency = self.concurrency
+        if getattr(type(self).load_issues_page, '__func__', None) is GenericJuggler.load_issues_page.__func__:
+            concurrency = 1 # load_issues_incremetal returns pages in the order it is called
+        return iter_prefetched_pages(self.load_issues_page, self.prefetch, concurrency)
+    
     def create_task_instance(self, issue):
         return JugglerTask(issue)
 
@@ -740,27 +2051,37 @@ class GenericJuggler(object):
         self.loaded = False
         self.issue_count = 0
         
-        while busy:
-            try:
-                issues = self.load_issues_incremetal()
-            except NotImplementedError:
-                logging.error('Loading Issues is not implemented in upstream library')
-                return None
-                
-            except:
-                logging.error('Could not get issue')
-                return None
-
-            if len(issues) <= 0:
-                busy = False
-
-            self.issue_count += len(issues)
-
-            for issue in issues:
-                logging.debug('Retrieved %s', repr(issue))
-                tasks.append(self.create_task_instance(issue))
-
-        self.validate_tasks(tasks)
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
+        pages = self.iter_pages()
+        
+        try:
+            while busy:
+                try:
+                    with self.stats.phase("load"):
+                        issues = next(pages)
+                except NotImplementedError:
+                    logging.error('Loading Issues is not implemented in upstream library')
+                    return None
+                except Exception as e:
+                    logging.error('Could not get issues: %s', e)
+                    raise
+
+                if len(issues) <= 0:
+                    busy = False
+
+                self.issue_count += len(issues)
+
+                with self.stats.phase("build"):
+                    for issue in issues:
+                        if debug:
+                            logging.debug('Retrieved %s', repr(issue))
+                        tasks.append(self.create_task_instance(issue))
+        finally:
+            pages.close()
+
+        with self.stats.phase("validate"):
+            self.graph = self.validate_tasks(tasks)
+        self.stats.count("issues", self.issue_count)
 
         return tasks
     
@@ -776,111 +2097,461 @@ class GenericJuggler(object):
         if not issues:
             # return None
             issues = []
-        for issue in issues:
-            self.src.set_property(issue)
+        with self.stats.phase("build"):
+            for issue in issues:
+                self.src.set_property(issue)
         return self.src
 
     def write_file(self, output=None):
         '''
         Query generic and generate task-juggler output from given issues
+        
+        The project is written to the output fragment by fragment. The rendered text is returned
+        in any case; use self.src.write_to() to stream without keeping it.
 
         Args:
-            output (str): Name of output file, for task-juggler
+            output (str): Name of output file, or a file-like object, for task-juggler
+
+        Returns:
+            str: The rendered project
         '''
         
         if not self.src:
             self.juggle()
-            
-        s = str(self.src)
         
         if output and isinstance(output, str):
             with open(output, 'w') as out:
-                out.write(s)
-        elif output and isinstance(output, file):
-            output.write(s)
+                return self._write_chunks(out)
+        elif output and hasattr(output, 'write'):
+            return self._write_chunks(output)
         # else:
         #     raise ValueError("output should be a filename string or a file handler")
-        return s
+        return str(self.src)
     
-    def read_ical_result(self, icalfile):
-        tasks = self.src.walk(JugglerTask)
-        cal = icalendar.Calendar.from_ical(file(icalfile).read())
-        for ev in cal.walk('VEVENT'): # pylint:disable=no-member
-            start_date = ev.decoded("DTSTART")
-            end_date = ev.decoded("DTEND")
-            id = from_identifier(ev.decoded("UID").split("-")[1])
-            for t in tasks:
-                if t.id == id:
-                    # logging.info("Testing %s" % str(t))
-                    # logging.info("Got %s" % repr(t.walk(JugglerTaskAllocate)))
-                    
-                    # ical does not support resource allocation reporting
-                    # so we do not support multiple resource here
-                    # and we don't support them yet anyways
-                    t.set_property(JugglerBooking({
-                        "resource":t.walk(JugglerTaskAllocate)[0].get_value(),
-                        "start": start_date,
-                        "end": end_date
-                        }))
-    
-    def run(self, outfolder=None, infile=None):
+    def _write_chunks(self, stream):
+        chunks = []
+        for chunk in self.src.iter_chunks():
+            stream.write(chunk)
+            chunks.append(chunk)
+        return ''.join(chunks)
+    
+    def read_ical_result(self, icalfile, callback=None):
+        '''
+        Load bookings from the tj3 icalreport into the tasks
+        
+        The file is scanned as a stream; if it contains something the scanner does not support,
+        it is re-read with the icalendar package (callback may then see a task twice).
+
+        Args:
+            icalfile (str):      Path to the .ics file
+            callback (callable): Called as callback(task, booking) as soon as each booking is set
+        '''
+        try:
+            for id, start_date, end_date in iter_ical_bookings(icalfile, self.src.identifiers.from_identifier):
+                self.set_booking(id, start_date, end_date, callback)
+        except ValueError as e:
+            logging.info('Falling back to icalendar parser: %s', e)
+            for id, start_date, end_date in iter_icalendar_bookings(icalfile, self.src.identifiers.from_identifier):
+                self.set_booking(id, start_date, end_date, callback)
+    
+    def set_booking(self, id, start_date, end_date, callback=None):
+        '''
+        Book the allocated resource of a task for the given interval
+
+        Args:
+            id:                  Task id
+            start_date (datetime): Start of the booking
+            end_date (datetime):   End of the booking
+            callback (callable):   Called as callback(task, booking) once the booking is set
+        '''
+        t = self.src.get_task(id)
+        if t is None:
+            return
+        # ical does not support resource allocation reporting
+        # so we do not support multiple resource here
+        # use read_export_result for exact per-resource bookings
+        booking = JugglerBooking({
+            "resource":t.walk(JugglerTaskAllocate)[0].get_value(),
+            "start": start_date,
+            "end": end_date
+            })
+        t.clear_bookings()
+        t.set_property(booking)
+        if callback:
+            callback(t, booking)
+    
+    def read_export_result(self, exportfile, callback=None):
+        '''
+        Load exact bookings from the tj3 export report into the tasks
+        
+        Every booked interval of every resource becomes a JugglerBooking of its task.
+
+        Args:
+            exportfile (str):    Path to the .tjp file written by the export report
+            callback (callable): Called as callback(task, booking) as soon as each booking is set
+        '''
+        self.set_bookings(iter_export_bookings(exportfile, self.src.identifiers.from_identifier), callback)
+    
+    def set_bookings(self, bookings, callback=None):
+        '''
+        Replace the bookings of the tasks with exact per-resource bookings
+
+        Args:
+            bookings (iterable): (task id, resource, start, end) tuples, the bookings of a task are replaced
+                                 when its first one is seen
+            callback (callable): Called as callback(task, booking) as soon as each booking is set
+        '''
+        cleared = set()
+        for id, resource, start_date, end_date in bookings:
+            t = self.src.get_task(id)
+            if t is None:
+                continue
+            if id not in cleared:
+                t.clear_bookings()
+                cleared.add(id)
+            booking = JugglerBooking({
+                "resource": resource,
+                "start": start_date,
+                "end": end_date
+                })
+            t.set_property(booking)
+            if callback:
+                callback(t, booking)
+    
+    def run(self, outfolder=None, infile=None, mode=REPORT_ICAL, backend=BACKEND_TJ3):
         '''
         Run the taskjuggler task
+        
+        Raises JugglerDependencyError before tj3 is started if the dependencies contain cycles,
+        JugglerRunError if tj3 fails without writing the report.
 
         Args:
-            output (str): Name of output file, for task-juggler
+            output (str):  Name of output file, for task-juggler
+            mode (str):    How bookings are read back: REPORT_ICAL (one span per task, first allocated resource)
+                           or REPORT_EXPORT (every booked interval with its real resource)
+            backend (str): BACKEND_TJ3, or BACKEND_LIST to schedule in-process without tj3 (supported
+                           subset only, raises listscheduler.JugglerScheduleError otherwise)
         '''
+        if mode not in (REPORT_ICAL, REPORT_EXPORT):
+            raise ValueError('mode must be one of: "%s", "%s"' % (REPORT_ICAL, REPORT_EXPORT))
+        if backend not in (BACKEND_TJ3, BACKEND_LIST):
+            raise ValueError('backend must be one of: "%s", "%s"' % (BACKEND_TJ3, BACKEND_LIST))
         if not self.src:
             self.juggle()
+        
+        with self.stats.phase("validate"):
+            self.graph = self.build_graph()
+            self.graph.check()
+        self.stats.count("tasks", len(self.graph.ids))
+        
+        if backend == BACKEND_LIST:
+            import listscheduler
+            with self.stats.phase("schedule"):
+                scheduler = listscheduler.JugglerListScheduler(self.src, self.graph)
+                scheduler.schedule()
+            with self.stats.phase("read"):
+                if mode == REPORT_EXPORT:
+                    self.set_bookings(scheduler.iter_export_bookings())
+                else:
+                    for id, start_date, end_date in scheduler.iter_ical_bookings():
+                        self.set_booking(id, start_date, end_date)
+            self.count_bookings()
+            return
+        
+        if self.cache is not None:
+            with self.stats.phase("cache"):
+                cache_key = self.cache_key(mode)
+                cached = self.cache.get(cache_key)
+            if cached:
+                logging.debug("Restoring schedule %s from cache" % cache_key)
+                with self.stats.phase("read"):
+                    self.read_result(cached, mode)
+                self.count_bookings()
+                return
             
+        import tempfile
+        self.clean() # of an earlier run
+        self.temporary = [] # only what is created here is removed afterwards, never the caller's files
         if outfolder is None:
             outfolder = tempfile.mkdtemp("TJP")
+            self.temporary.append(outfolder)
         self.outfolder = outfolder
         
         if infile is None:
-            infile = tempfile.mkstemp(".tjp")[1]
+            fd, infile = tempfile.mkstemp(".tjp")
+            os.close(fd)
+            self.temporary.append(infile)
         self.infile = infile
         
         reportdir = self.src.walk(JugglerOutputdir)
         orig_rep = reportdir[0].get_value()
-        reportdir[0].set_value(outfolder)
-        
         ical_report_name = "calendar_out"
         ical_report_path = os.path.join(outfolder, ical_report_name)
         icalreport = self.src.walk(JugglerIcalreport)
         orig_cal = icalreport[0].get_value()
-        icalreport[0].set_value(ical_report_name)
+        exportreport = None
+        try:
+            reportdir[0].set_value(outfolder)
+            icalreport[0].set_value(ical_report_name)
+            icalreport[0].set_report_id(ical_report_name)
+            
+            if mode == REPORT_EXPORT:
+                export_report_name = "bookings_out"
+                report_path = os.path.join(outfolder, export_report_name)
+                exportreport = JugglerExport(export_report_name)
+                exportreport.set_report_id(export_report_name)
+                self.src.set_property(exportreport)
+                reports = [(export_report_name, report_path+".tjp")]
+            else:
+                report_path = ical_report_path+".ics"
+                reports = [(ical_report_name, report_path)]
+            
+            with self.stats.phase("render"):
+                with open(infile, 'w') as out:
+                    self.src.write_to(out) # not write_file(), the text is not needed here
+            if self.stats.enabled:
+                self.stats.count("rendered_bytes", os.path.getsize(infile))
+            
+            logging.debug("Running from %s to out %s" % (self.infile, self.outfolder))
+            
+            project_id = self.src.walk(JugglerProject)[0].get_identifier() # as rendered, see JugglerIdentifiers
+            with self.stats.phase("tj3"):
+                exit_code = self.runner.run(infile, outfolder, project_id, reports)
+            self.stats.count("tj3_exit_code", exit_code)
+            
+            if mode == REPORT_EXPORT and os.path.exists(report_path+".tjp"):
+                report_path += ".tjp"
+            if not os.path.exists(report_path):
+                raise JugglerRunError(exit_code, report_path)
+            if exit_code:
+                logging.warning("tj3 exited with code %s, reading the report it wrote anyway" % exit_code)
+            
+            with self.stats.phase("read"):
+                self.read_result(report_path, mode)
+            self.count_bookings()
+            if self.cache is not None:
+                with self.stats.phase("cache"):
+                    self.cache.put(cache_key, report_path)
+        finally:
+            if exportreport is not None:
+                self.src.remove_property(exportreport.get_hash())
+            icalreport[0].id = orig_cal # get_value() is already quoted, set_value() would quote again
+            icalreport[0].set_report_id()
+            reportdir[0].id = orig_rep
+            reportdir[0].invalidate()
+            self.clean()
         
-        self.write_file(infile)
+        # TODO HERE: load the ical file back to the actual tree (no tree support yet?)
         
-        logging.debug("Running from %s to out %s" % (self.infile, self.outfolder))
+    def count_bookings(self):
+        if self.stats.enabled:
+            self.stats.count("bookings", sum(1 for _ in self.src.iter_walk(JugglerBooking)))
+    
+    def run_partitioned(self, max_workers=None, **kwargs):
+        '''
+        Run taskjuggler separately on groups of tasks that share no resources and no dependencies
         
-        subprocess.call(["/usr/bin/env", "tj3", infile])
+        The groups are scheduled concurrently (see run_many) and the bookings land in
+        this tree, the same as a single run() would produce.
+
+        Args:
+            max_workers (int): Maximum number of concurrent tj3 runs
+            kwargs:            Passed to run(), e.g. mode
+        '''
+        if not self.src:
+            self.juggle()
+        groups = partition_tasks(self.src.walk(JugglerTask))
+        if len(groups) <= 1:
+            return self.run(**kwargs)
+        logging.debug("Scheduling %s independent parts" % len(groups))
+        parts = []
+        for tasks in groups:
+            part = GenericJuggler()
+            part.src = self.src.subset(tasks)
+            part.runner = self.runner
+            part.cache = self.cache
+            parts.append(part)
+        for error in run_many(parts, max_workers, **kwargs):
+            if error is not None:
+                raise error
+    
+    def run_incremental(self, now=None, previous=None, **kwargs):
+        '''
+        Reschedule only the future: tasks booked to start before now keep their bookings
         
-        self.read_ical_result(ical_report_path+".ics")
+        Started and completed tasks are frozen and left out of the project that is scheduled,
+        so tj3 only sees the tasks that have not started yet. Those are pinned to start no
+        earlier than the end of the frozen tasks they depend on, and of the frozen work still
+        running on their resource; the project interval starts at now.
+
+        Args:
+            now (datetime):           Cutoff in project time if naive, converted to it if timezone-aware,
+                                      defaults to the current hour (as JugglerProject does)
+            previous (GenericJuggler): Juggler of an earlier run to take the bookings from, defaults to this one
+            kwargs:                   Passed to run(), e.g. mode or backend
+
+        Returns:
+            list: Ids of the frozen tasks
+        '''
+        if not self.src:
+            self.juggle()
+        if now is None:
+            now = datetime.datetime.now().replace(microsecond=0,second=0,minute=0)
+        timezones = self.src.walk(JugglerTimezone)
+        tz = timezones[0].get_tzinfo() if timezones else pytz.utc
+        now = to_local_time(now, tz) # times as written to the project, see to_tj3time
+        if previous is None:
+            previous = self
         
-        icalreport[0].set_value(orig_cal)
-        reportdir[0].set_value(orig_rep)
+        frozen = {}
+        busy = {}
+        kept = []
+        tasks = self.src.walk(JugglerTask)
+        for task in tasks:
+            before = previous.get_task(task.get_id())
+            bookings = before.walk(JugglerBooking) if before is not None else []
+            intervals = [[to_local_time(dt, tz) for dt in booking.decode()] for booking in bookings]
+            if not intervals or min(start for start, end in intervals) >= now:
+                continue
+            end = max(end for start, end in intervals)
+            frozen[task.get_id()] = end
+            for booking in bookings:
+                busy[booking.get_id()] = max(busy.get(booking.get_id(), now), end)
+                kept.append((task.get_id(), booking.get_id()) + tuple(booking.decode()))
+        if previous is not self:
+            self.set_bookings(kept)
+        self.stats.count("frozen", len(frozen))
         
-        if DEBUG or logging.getLogger().getEffectiveLevel() >= logging.DEBUG: return
-        shutil.rmtree(self.outfolder)
-        os.remove(self.infile)
+        remaining = []
+        pinned = []
+        for task in tasks:
+            if task.get_id() in frozen:
+                continue
+            part = task
+            depends = [prop for prop in task.properties.values() if isinstance(prop, JugglerTaskDepends)]
+            deps = [dep for prop in depends for dep in prop.get_value()]
+            earliest = max([frozen[dep] for dep in deps if dep in frozen] +
+                           [busy.get(prop.get_value(), now) for prop in task.properties.values()
+                            if isinstance(prop, JugglerTaskAllocate)] + [now])
+            if earliest > now or any(dep in frozen for dep in deps):
+                part = self.pin_task(task, earliest, frozen, tz)
+                pinned.append(part)
+            else:
+                task.clear_bookings() # would be fixed bookings to the scheduler
+            remaining.append(part)
+        if not remaining:
+            return sorted(frozen)
         
-        # TODO HERE: load the ical file back to the actual tree (no tree support yet?)
+        project_end = from_tj3time(self.src.walk(JugglerProject)[0].option2.split(" - ")[1].strip())
+        part = GenericJuggler()
+        part.src = self.src.subset(remaining)
+        for task in pinned:
+            task.parent = task.top = part.src # bookings read into the copies stay out of this tree
+        part.src.walk(JugglerProject)[0].set_interval(now, project_end)
+        part.runner = self.runner
+        part.cache = self.cache
+        part.stats = self.stats
+        part.run(**kwargs)
+        # also lands the bookings of the pinned copies in the original tasks
+        self.set_bookings([(task.get_id(), booking.get_id()) + tuple(booking.decode())
+                           for task in remaining for booking in task.walk(JugglerBooking)])
+        return sorted(frozen)
+    
+    @staticmethod
+    def pin_task(task, earliest, frozen, tz=pytz.utc):
+        '''
+        Copy of a task that starts no earlier than the given time and does not depend on frozen tasks
+
+        The copy is detached from the tree and has its own properties list, new depends and
+        start and no bookings; the other properties, which are not changed, are shared with the task.
+        The start is naive in the project timezone tz, like earliest.
+        '''
+        pinned = copy.copy(task)
+        pinned.parent = pinned.top = None
+        pinned.rendered = None
+        pinned.properties = JugglerProperties()
+        start = None
+        for key, prop in task.properties.items():
+            if isinstance(prop, JugglerTaskDepends):
+                prop = type(prop)()
+                prop.set_value([dep for dep in task.properties[key].get_value() if dep not in frozen])
+                prop.parent = pinned # renders its links with the identifiers of the tree the copy is in
+            elif isinstance(prop, JugglerTaskStart):
+                start = prop
+                continue
+            elif isinstance(prop, JugglerBooking):
+                continue
+            pinned.properties[key] = prop
+        start_prop = type(start)() if start is not None else JugglerTaskStart()
+        start_prop.set_value(max(earliest, to_local_time(start.value, tz)) if start is not None and start.value else earliest)
+        pinned.set_property(start_prop)
+        return pinned
+    
+    def simulate(self, distributions, samples, seed=None, percentiles=(50, 90), max_workers=None, samples_per_run=1):
+        '''
+        Monte Carlo simulation of the schedule with random task efforts, see montecarlo.simulate
+        '''
+        import montecarlo
+        return montecarlo.simulate(self, distributions, samples, seed=seed, percentiles=percentiles,
+                                   max_workers=max_workers, samples_per_run=samples_per_run)
+    
+    def read_result(self, report, mode=REPORT_ICAL):
+        '''
+        Load bookings from a tj3 report of the given run() mode
+        '''
+        if mode == REPORT_EXPORT:
+            self.read_export_result(report)
+        else:
+            self.read_ical_result(report)
+    
+    def cache_key(self, mode=REPORT_ICAL):
+        '''
+        Key of the current project in the schedule cache
         
+        Hashes the project as written by write_file (before run() points the reports
+        to its temporary folder), so it includes the project interval and any bookings.
+        '''
+        if not self.src:
+            self.juggle()
+        return self.cache.make_key(self.src.iter_chunks(), mode)
+    
     def clean(self):
-        "clean after running"
-        if DEBUG or logging.getLogger().getEffectiveLevel() >= logging.DEBUG: return
-        try: shutil.rmtree(self.outfolder)
-        except:  pass
-        try: os.remove(self.infile)
-        except: pass
+        "clean after running: remove the temporary folder and file run() created, kept when debugging"
+        if not self.temporary: return # also keeps __del__ from importing at exit
+        if DEBUG or logging.getLogger().getEffectiveLevel() <= logging.DEBUG: return
+        import shutil
+        for path in self.temporary:
+            if os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+            elif os.path.exists(path):
+                os.remove(path)
+        self.temporary = []
     
     def walk(self, cls):
         if not self.src:
             self.juggle()
         return self.src.walk(cls)
     
+    def iter_walk(self, cls):
+        '''Lazy walk(), see JugglerCompoundKeyword.iter_walk'''
+        if not self.src:
+            self.juggle()
+        return self.src.iter_walk(cls)
+    
+    def get_task(self, id):
+        '''
+        Get task by its id in O(1)
+
+        Args:
+            id: Original task id (as loaded from the issue)
+
+        Returns:
+            JugglerTask: the task, or None if not found
+        '''
+        if not self.src:
+            self.juggle()
+        return self.src.get_task(id)
+    
     def __inter__(self):
         "provide dict(j) method to generate dictionary structure for tasks"
         raise NotImplementedError
@@ -888,4 +2559,38 @@ class GenericJuggler(object):
     def __del__(self):
         self.clean()
 
+def run_many(jugglers, max_workers=None, **kwargs):
+    '''
+    Schedule many independent projects concurrently
+    
+    Every juggler is rendered, scheduled and gets its bookings back from its own run() in its
+    own temporary folder. tj3 runs in separate processes, so a thread pool keeps the cores busy.
+    A failing project does not stop the others.
 
+    Args:
+        jugglers (list):   GenericJuggler's to run
+        max_workers (int): Maximum number of concurrent runs, defaults to the number of CPUs
+        kwargs:            Passed to every run(), e.g. mode
+
+    Returns:
+        list: For every juggler (in order) None if it was scheduled, or the exception it raised
+    '''
+    jugglers = list(jugglers)
+    if not jugglers:
+        return []
+    
+    def run_one(jg):
+        try:
+            jg.run(**kwargs)
+        except Exception as e: # pylint:disable=broad-except
+            logging.error('Scheduling failed: %s', e)
+            return e
+    
+    import multiprocessing
+    from multiprocessing.pool import ThreadPool
+    pool = ThreadPool(min(max_workers or multiprocessing.cpu_count(), len(jugglers)))
+    try:
+        return pool.map(run_one, jugglers)
+    finally:
+        pool.close()
+        pool.join()
@@ -0,0 +1,260 @@
+"""
+In-process list scheduler, an alternative to running tj3 for simple plans
+
+Supports the subset of TaskJuggler most plans here use: effort-based (hours) ASAP tasks
+allocated to a single resource each, with priorities, dependencies and fixed starts,
+scheduled in the project working hours within the project interval. Like tj3 it books
+one task at a time, always the ready one with the highest priority (ties broken by path
+criticalness, then by order in the project), into the free working hours of its resource.
+A task starts with its first and ends with its last booked hour.
+
+Time is scheduled in slots of one hour (tj3's default timingresolution) of project local
+time, so daylight saving transitions are not taken into account.
+"""
+
+import datetime, heapq
+
+import pytz
+
+from juggler import (JugglerCompoundKeyword, JugglerTask, JugglerTaskEffort, JugglerTaskAllocate, JugglerTaskPriority, JugglerTaskStart,
+                     JugglerBooking, JugglerProject, JugglerTimezone, JugglerWorkingHours, JugglerScenario,
+                     from_tj3time)
+
+SLOT = datetime.timedelta(hours=1)
+WEEKDAYS = ["mon", "tue", "wed", "thu", "fri", "sat", "sun"]
+TJ3_DEFAULT_PRIORITY = 500
+TJ3_DEFAULT_WORKINGHOURS = dict((day, [(9, 12), (13, 18)]) for day in WEEKDAYS[:5])
+
+class JugglerScheduleError(ValueError):
+    '''Raised when a plan uses features the list scheduler does not support, or does not fit the project'''
+
+def parse_workinghours(value):
+    '''
+    Parse the intervals of a workinghours attribute
+
+    Args:
+        value (str): e.g. "9:00 - 12:00, 13:00 - 18:00" or "off"
+
+    Returns:
+        list: (start hour, end hour) tuples
+    '''
+    if value.strip() == "off":
+        return []
+    hours = []
+    for interval in value.split(","):
+        start, end = [part.strip() for part in interval.split("-")]
+        bounds = []
+        for time in (start, end):
+            hour, minute = [int(x) for x in time.split(":")]
+            if minute:
+                raise JugglerScheduleError('Working hours must be whole hours: %s' % value)
+            bounds.append(hour)
+        hours.append(tuple(bounds))
+    return hours
+
+class JugglerListScheduler(object):
+    '''
+    Priority list schedule of a project, see module documentation
+
+    Call schedule() once, then read the results with iter_ical_bookings() or iter_export_bookings().
+    '''
+
+    def __init__(self, src, graph):
+        '''
+        Read the project settings
+
+        Args:
+            src (JugglerSource):       The project
+            graph (JugglerTaskGraph):  Checked dependency graph of its tasks
+        '''
+        self.graph = graph
+        settings = [] # everything but the tasks, walking them would cost more than scheduling
+        for prop in src.properties.values():
+            if not isinstance(prop, JugglerTask):
+                settings.append(prop)
+                if isinstance(prop, JugglerCompoundKeyword):
+                    settings.extend(prop.walk(JugglerCompoundKeyword))
+        if any(isinstance(prop, JugglerScenario) and prop.properties for prop in settings):
+            raise JugglerScheduleError('Scenarios are not supported')
+        project = [prop for prop in settings if isinstance(prop, JugglerProject)][0]
+        start, end = [from_tj3time(value.strip()) for value in project.option2.split(" - ")]
+        self.start = start.replace(minute=0, second=0)
+        self.slots = int((end - self.start).total_seconds() // 3600)
+        timezone = [prop for prop in settings if isinstance(prop, JugglerTimezone)]
+        self.tz = pytz.timezone(timezone[0].get_value().strip('"') if timezone else "UTC")
+        hours = dict(TJ3_DEFAULT_WORKINGHOURS)
+        for day in settings:
+            if isinstance(day, JugglerWorkingHours):
+                hours[day.get_id()] = parse_workinghours(day.option2)
+        week = bytearray(7 * 24)
+        for day, intervals in hours.items():
+            for first, last in intervals:
+                for hour in range(first, last):
+                    week[WEEKDAYS.index(day) * 24 + hour] = 1
+        # working[i] tells whether slot i of the project is a working hour, the week pattern repeated
+        offset = self.start.weekday() * 24 + self.start.hour
+        week = week[offset:] + week[:offset]
+        self.working = (week * (self.slots // len(week) + 1))[:self.slots]
+        self.busy = {}
+        self.free_from = {}
+        self.results = []
+
+    def to_slot(self, dt):
+        '''Slot of a date as written to the project: the time zone is dropped, the time is project time'''
+        dt = dt.replace(tzinfo=None)
+        return int((dt - self.start).total_seconds() // 3600)
+
+    def to_date(self, slot):
+        '''UTC start of a slot, the same as tj3 reports write'''
+        local = self.tz.localize(self.start + slot * SLOT, is_dst=False)
+        return local.astimezone(pytz.utc)
+
+    def read_task(self, task):
+        '''
+        Scheduling attributes of a task
+
+        Returns:
+            tuple: effort (hours), resource, priority, earliest start slot, already booked slots
+        '''
+        effort = resource = None
+        priority = TJ3_DEFAULT_PRIORITY
+        earliest = 0
+        booked = []
+        for prop in task.properties.values():
+            if ":" in prop.get_name():
+                raise JugglerScheduleError('Scenarios are not supported (task %s)' % task.get_id())
+            if isinstance(prop, JugglerTaskEffort):
+                effort = prop.decode()
+            elif isinstance(prop, JugglerTaskAllocate):
+                resource = prop.get_value()
+            elif isinstance(prop, JugglerTaskPriority):
+                priority = prop.get_value() or TJ3_DEFAULT_PRIORITY
+            elif isinstance(prop, JugglerTaskStart):
+                if prop.value:
+                    earliest = max(0, self.to_slot(prop.value))
+            elif isinstance(prop, JugglerBooking):
+                first, last = [self.to_slot(dt) for dt in prop.decode()]
+                booked.extend(slot for slot in range(max(first, 0), min(last, self.slots)) if self.working[slot])
+        booked.sort()
+        if not effort or effort <= 0:
+            raise JugglerScheduleError('Task %s has no effort' % task.get_id())
+        if not resource or not isinstance(resource, basestring) or "," in resource:
+            raise JugglerScheduleError('Task %s must be allocated to exactly one resource' % task.get_id())
+        return effort, resource, priority, earliest, booked
+
+    def timeline(self, resource):
+        '''Booked slots of a resource, bytearray with 1 for every busy slot'''
+        busy = self.busy.get(resource)
+        if busy is None:
+            busy = self.busy[resource] = bytearray(self.slots)
+            self.free_from[resource] = 0
+        return busy
+
+    def book(self, resource, slot, effort):
+        '''
+        Book the first free working slots of a resource from the given slot on
+
+        Returns:
+            list: The booked slots, None if they do not fit into the project
+        '''
+        busy = self.timeline(resource)
+        working = self.working
+        slot = max(slot, self.free_from[resource])
+        booked = []
+        end = self.slots
+        while effort:
+            if slot >= end:
+                return None
+            if working[slot] and not busy[slot]:
+                busy[slot] = 1
+                booked.append(slot)
+                effort -= 1
+            slot += 1
+        free = self.free_from[resource]
+        while free < self.slots and (busy[free] or not working[free]):
+            free += 1
+        self.free_from[resource] = free
+        return booked
+
+    def path_criticalness(self, order, attributes, dependents):
+        '''
+        tj3's tie breaker between tasks of the same priority: the criticalness of the most
+        critical path from a task on, a task's criticalness being its effort weighed by how
+        loaded (allocated effort per working hour) its resource is
+        '''
+        load = {}
+        for effort, resource, _, _, _ in attributes.values():
+            load[resource] = load.get(resource, 0) + effort
+        available = float(max(1, sum(self.working)))
+        criticalness = {}
+        for id in reversed(order):
+            effort, resource = attributes[id][:2]
+            follow = max([criticalness[dep] for dep in dependents[id]] or [0])
+            criticalness[id] = effort * load[resource] / available + follow
+        return criticalness
+
+    def schedule(self):
+        '''
+        Schedule every task of the graph
+
+        Bookings the tasks already have are kept: they count against the effort and
+        the rest is booked after them.
+
+        Returns:
+            list: (task id, resource, booked slots) in scheduling order
+        '''
+        graph = self.graph
+        order = graph.check()
+        attributes = dict((id, self.read_task(graph.tasks[id])) for id in order)
+        dependents = dict((id, []) for id in order)
+        for id in order:
+            for dep in graph.depends[id]:
+                dependents[dep].append(id)
+            effort, resource, _, _, booked = attributes[id]
+            busy = self.timeline(resource)
+            for slot in booked:
+                busy[slot] = 1
+        criticalness = self.path_criticalness(order, attributes, dependents)
+        sequence = dict((id, seq) for seq, id in enumerate(graph.ids))
+        pending = dict((id, len(graph.depends[id])) for id in order)
+        earliest = dict((id, attributes[id][3]) for id in order)
+        ready = [(-attributes[id][2], -criticalness[id], sequence[id], id) for id in order if not pending[id]]
+        heapq.heapify(ready)
+        while ready:
+            id = heapq.heappop(ready)[-1]
+            effort, resource, _, _, booked = attributes[id]
+            if effort > len(booked):
+                more = self.book(resource, max([earliest[id]] + [slot + 1 for slot in booked[-1:]]), effort - len(booked))
+                if more is None:
+                    raise JugglerScheduleError('Task %s does not fit into the project interval' % id)
+                booked = booked + more
+            self.results.append((id, resource, booked))
+            end = booked[-1] + 1
+            for dep in dependents[id]:
+                earliest[dep] = max(earliest[dep], end)
+                pending[dep] -= 1
+                if not pending[dep]:
+                    heapq.heappush(ready, (-attributes[dep][2], -criticalness[dep], sequence[dep], dep))
+        return self.results
+
+    def iter_ical_bookings(self):
+        '''
+        Yields:
+            tuple: (task id, start, end) of every task, as read from a tj3 icalreport
+        '''
+        for id, resource, booked in self.results:
+            yield id, self.to_date(booked[0]), self.to_date(booked[-1] + 1)
+
+    def iter_export_bookings(self):
+        '''
+        Yields:
+            tuple: (task id, resource, start, end) of every contiguous booked interval, as read from a tj3 export report
+        '''
+        for id, resource, booked in self.results:
+            first = last = booked[0]
+            for slot in booked[1:] + [None]:
+                if slot == last + 1:
+                    last = slot
+                    continue
+                yield id, resource, self.to_date(first), self.to_date(last + 1)
+                first = last = slot
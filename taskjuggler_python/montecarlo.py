@@ -0,0 +1,231 @@
+"""
+Monte Carlo simulation of taskjuggler schedules
+
+Samples task efforts from per-task distributions, schedules every sample with tj3 and
+aggregates the booked start/end times into per-task percentiles (e.g. P50/P90 delivery dates).
+"""
+
+import calendar, collections, copy, logging, math, multiprocessing, os, random, shutil, tempfile
+from multiprocessing.pool import ThreadPool
+
+import juggler
+from juggler import (JugglerTask, JugglerTaskEffort, JugglerOutputdir, JugglerIcalreport, JugglerProject,
+                     JugglerScenario, JugglerReportAttribute, iter_ical_bookings)
+
+def triangular(low, mode, high):
+    '''Triangular effort distribution from optimistic, most likely and pessimistic estimates'''
+    return lambda rng: rng.triangular(low, high, mode)
+
+def uniform(low, high):
+    '''Uniform effort distribution'''
+    return lambda rng: rng.uniform(low, high)
+
+def normal(mu, sigma):
+    '''Normal effort distribution, negative samples are clipped'''
+    return lambda rng: max(0, rng.gauss(mu, sigma))
+
+def lognormal(mu, sigma):
+    '''Log-normal effort distribution (mu and sigma of the underlying normal distribution)'''
+    return lambda rng: rng.lognormvariate(mu, sigma)
+
+def sample_efforts(distributions, ids, seed, index):
+    '''
+    Draw the efforts of one sample
+
+    Every sample has its own random generator derived from the seed and the sample index,
+    so results do not depend on the order in which samples are scheduled.
+
+    Args:
+        distributions (dict): Task id -> callable(random.Random) returning hours, or a fixed number
+        ids (list):           Task ids to sample, in a fixed order
+        seed (int):           Simulation seed
+        index (int):          Sample index
+
+    Returns:
+        dict: Task id -> effort in whole hours
+    '''
+    rng = random.Random(seed * 1000003 + index)
+    efforts = {}
+    for id in ids:
+        dist = distributions[id]
+        value = dist(rng) if callable(dist) else dist
+        efforts[id] = max(JugglerTaskEffort.MINIMAL_VALUE, int(math.ceil(value)))
+    return efforts
+
+def to_timestamp(dt):
+    return calendar.timegm(dt.utctimetuple())
+
+class JugglerSampleReport(JugglerIcalreport):
+    '''Calendar report of one sample, several of them may exist in a project'''
+
+    def get_hash(self):
+        return self.get_name()
+
+class JugglerSimulationResult(object):
+    '''
+    Streaming aggregate of simulated schedules
+
+    Keeps a count per task and booked minute instead of every sample, so memory is bounded by
+    the spread of the schedule, not by the number of samples. Percentiles are exact at minute resolution.
+    '''
+
+    def __init__(self, ids, seed):
+        '''
+        Args:
+            ids (list): Ids of all tasks, in tree order
+            seed (int): Seed the simulation was run with
+        '''
+        self.ids = ids
+        self.seed = seed
+        self.samples = 0
+        self.unscheduled = [0] * len(ids)
+        self.start_counts = [collections.Counter() for _ in ids]
+        self.end_counts = [collections.Counter() for _ in ids]
+        self.percentiles = None
+        self.start = None
+        self.end = None
+
+    def add_sample(self, starts, ends):
+        '''
+        Add one scheduled sample
+
+        Args:
+            starts (list): Start timestamp (seconds, UTC) per task, None if the task was not booked
+            ends (list):   End timestamp per task
+        '''
+        self.samples += 1
+        for i, start in enumerate(starts):
+            if start is None:
+                self.unscheduled[i] += 1
+                continue
+            self.start_counts[i][start // 60] += 1
+            self.end_counts[i][ends[i] // 60] += 1
+
+    def compute(self, percentiles=(50, 90)):
+        '''
+        Compute per-task percentiles of start and end (nearest rank)
+
+        Sets percentiles, and start and end as numpy datetime64[m] arrays of shape
+        (tasks, percentiles), NaT for tasks that were never booked.
+        '''
+        try:
+            import numpy
+        except ImportError:
+            raise ImportError('numpy is required for simulation percentiles, install taskjuggler_python[simulation]')
+        self.percentiles = numpy.asarray(percentiles, dtype=float)
+        self.start = self._compute(numpy, self.start_counts)
+        self.end = self._compute(numpy, self.end_counts)
+        return self
+
+    def _compute(self, numpy, counts):
+        out = numpy.empty((len(self.ids), len(self.percentiles)), dtype='datetime64[m]')
+        out[:] = numpy.datetime64('NaT')
+        for i, counter in enumerate(counts):
+            if not counter:
+                continue
+            minutes = numpy.array(sorted(counter), dtype=numpy.int64)
+            cumulative = numpy.cumsum([counter[m] for m in minutes])
+            ranks = numpy.maximum(numpy.ceil(self.percentiles / 100.0 * cumulative[-1]), 1)
+            out[i] = minutes[numpy.searchsorted(cumulative, ranks)].astype('datetime64[m]')
+        return out
+
+def run_samples(jg, ids, distributions, seed, first, count):
+    '''
+    Schedule samples first..first+count-1 in one tj3 run, as scenarios if count > 1
+
+    Returns:
+        list: (starts, ends) per sample, timestamps aligned with ids
+    '''
+    src = copy.deepcopy(jg.src)
+    outfolder = tempfile.mkdtemp("TJPMC")
+    try:
+        src.walk(JugglerOutputdir)[0].set_value(outfolder)
+        for report in src.walk(JugglerIcalreport):
+            report.parent.remove_property(report.get_hash())
+        project = src.walk(JugglerProject)[0]
+        sampled = [id for id in ids if id in distributions]
+        if count > 1:
+            plan = JugglerScenario()
+            project.set_property(plan)
+        reports = []
+        for index in range(first, first + count):
+            name = "sample_%d" % index
+            efforts = sample_efforts(distributions, sampled, seed, index)
+            report = JugglerSampleReport(name)
+            report.set_report_id(name)
+            if count > 1:
+                scenario = JugglerScenario()
+                scenario.set_id("s%d" % index)
+                scenario.summary = "Sample %d" % index
+                plan.set_property(scenario)
+                report.set_property(JugglerReportAttribute(("scenario", scenario.get_id())))
+                for id, effort in efforts.items():
+                    prop = JugglerTaskEffort(effort)
+                    prop.name = "%s:effort" % scenario.get_id()
+                    src.get_task(id).set_property(prop)
+            else:
+                for id, effort in efforts.items():
+                    src.get_task(id).walk(JugglerTaskEffort)[0].set_value(effort)
+            src.set_property(report)
+            reports.append((name, os.path.join(outfolder, name + ".ics")))
+        infile = os.path.join(outfolder, "sample.tjp")
+        with open(infile, 'w') as out:
+            src.write_to(out)
+        jg.runner.run(infile, outfolder, project.get_identifier(), reports)
+        positions = dict((id, i) for i, id in enumerate(ids))
+        results = []
+        for name, path in reports:
+            starts = [None] * len(ids)
+            ends = [None] * len(ids)
+            for id, start, end in iter_ical_bookings(path, src.identifiers.from_identifier):
+                if id in positions:
+                    starts[positions[id]] = to_timestamp(start)
+                    ends[positions[id]] = to_timestamp(end)
+            results.append((starts, ends))
+        return results
+    finally:
+        if not juggler.DEBUG:
+            shutil.rmtree(outfolder, ignore_errors=True)
+
+def simulate(jg, distributions, samples, seed=None, percentiles=(50, 90), max_workers=None, samples_per_run=1):
+    '''
+    Monte Carlo simulation of the schedule with random task efforts
+
+    Samples are scheduled concurrently with the juggler's runner (tj3 runs out of process, so
+    a thread pool keeps the cores busy) and aggregated as they complete.
+
+    Args:
+        jg (GenericJuggler):  The juggler with the project to simulate, left unchanged
+        distributions (dict): Task id -> callable(random.Random) returning the effort in hours
+                              (see triangular, uniform, normal, lognormal), or a fixed number
+        samples (int):        Number of samples
+        seed (int):           Seed for reproducible results, a random one is used (and stored
+                              in the result) if not given
+        percentiles (tuple):  Percentiles to compute
+        max_workers (int):    Maximum number of concurrent tj3 runs, defaults to the number of CPUs
+        samples_per_run (int): Samples packed into one tj3 run as scenarios
+
+    Returns:
+        JugglerSimulationResult: with start/end percentile arrays computed
+    '''
+    if not jg.src:
+        jg.juggle()
+    if seed is None:
+        seed = random.SystemRandom().randint(0, 2 ** 31)
+    ids = [task.get_id() for task in jg.src.walk(JugglerTask)]
+    result = JugglerSimulationResult(ids, seed)
+    jobs = [(first, min(samples_per_run, samples - first)) for first in range(0, samples, samples_per_run)]
+
+    def run_job(job):
+        return run_samples(jg, ids, distributions, seed, *job)
+
+    pool = ThreadPool(min(max_workers or multiprocessing.cpu_count(), len(jobs) or 1))
+    try:
+        for sampled in pool.imap_unordered(run_job, jobs):
+            for starts, ends in sampled:
+                result.add_sample(starts, ends)
+    finally:
+        pool.close()
+        pool.join()
+    logging.debug('Simulated %s samples with seed %s', result.samples, seed)
+    return result.compute(percentiles)
@@ -0,0 +1,58 @@
+"""Unit tests for the schedule cache."""
+# pylint: disable=redefined-outer-name,unused-variable,expression-not-assigned,singleton-comparison
+
+import datetime, os, time
+
+from expecter import expect
+
+from taskjuggler_python import juggler, cache
+from taskjuggler_python.tests.test_juggler import ICS_EVENTS, make_juggler
+juggler.DEBUG = True
+
+def describe_JugglerScheduleCache():
+    def counts_hits_and_misses(tmpdir):
+        c = cache.JugglerScheduleCache(str(tmpdir.join("cache")))
+        report = tmpdir.join("report.ics")
+        report.write("report")
+        key = c.make_key(["a", "b"], "ical")
+        expect(c.get(key)) == None
+        c.put(key, str(report))
+        expect(open(c.get(key)).read()) == "report"
+        expect((c.hits, c.misses)) == (1, 1)
+        c.invalidate(key)
+        expect(c.get(key)) == None
+
+    def key_depends_on_content():
+        make_key = cache.JugglerScheduleCache.make_key
+        expect(make_key(["a", "b"])) == make_key(["ab"])
+        expect(make_key(["ab"], "ical")) != make_key(["ab"], "export")
+
+    def evicts_least_recently_used(tmpdir):
+        c = cache.JugglerScheduleCache(str(tmpdir.join("cache")), max_size=10)
+        report = tmpdir.join("report.ics")
+        report.write("x" * 6)
+        c.put("old", str(report))
+        os.utime(c.entry_path("old"), (time.time() - 100, time.time() - 100))
+        c.put("new", str(report))
+        expect(c.get("old")) == None
+        expect(c.get("new")) != None
+
+    def evicts_expired(tmpdir):
+        c = cache.JugglerScheduleCache(str(tmpdir.join("cache")), max_age=60)
+        report = tmpdir.join("report.ics")
+        report.write("x")
+        c.put("old", str(report))
+        os.utime(c.entry_path("old"), (time.time() - 100, time.time() - 100))
+        c.evict()
+        expect(c.get("old")) == None
+
+    def restores_without_tj3(tmpdir):
+        jg = make_juggler([1, "two-words"])
+        jg.walk(juggler.JugglerProject)[0].set_interval(datetime.datetime(2017, 10, 10))
+        jg.cache = cache.JugglerScheduleCache(str(tmpdir.join("cache")))
+        report = tmpdir.join("calendar.ics")
+        report.write(ICS_EVENTS % ("", "Z"))
+        jg.cache.put(jg.cache_key(), str(report))
+        jg.run()
+        expect(jg.cache.hits) == 1
+        expect(len(jg.walk(juggler.JugglerBooking))) == 2
@@ -0,0 +1,58 @@
+"""Unit tests for the columnar task table."""
+# pylint: disable=redefined-outer-name,unused-variable,expression-not-assigned,singleton-comparison
+
+import datetime
+
+from expecter import expect
+
+from taskjuggler_python import juggler, jsonjuggler, columnar
+
+from .test_juggler import ICS_EVENTS, CannedRunner
+
+RECORDS = [{"id": 1, "effort": 3, "allocate": "me", "summary": 'say "hi"'},
+           {"id": 2, "effort": 1.2, "depends": "1, 7", "priority": 300},
+           {"id": 3, "allocate": "bob", "start": "2017-10-10T09:00", "depends": [1, 2]}]
+
+def render(jg):
+    jg.walk(juggler.JugglerProject)[0].set_interval(datetime.datetime(2017, 10, 10))
+    return str(jg.src)
+
+def describe_JugglerTaskTable():
+    def renders_like_dict_juggler():
+        expect(render(columnar.TableJuggler(RECORDS))) == render(jsonjuggler.DictJuggler(RECORDS))
+
+    def materializes_views_on_access():
+        jg = columnar.TableJuggler(RECORDS)
+        jg.juggle()
+        expect(jg.table.views) == {}
+        task = jg.get_task(2)
+        expect(jg.table.views) == {1: task}
+        expect(task.walk(juggler.JugglerTaskDepends)[0].get_value()) == [1]
+        task.walk(juggler.JugglerTaskEffort)[0].set_value(5)
+        expect(render(jg)).contains("    effort 5h\n")
+        expect(len(jg.walk(juggler.JugglerTask))) == 3
+
+    def walks_rows_lazily():
+        jg = columnar.TableJuggler(RECORDS)
+        jg.juggle()
+        tasks = jg.src.iter_walk(juggler.JugglerTask)
+        expect(next(tasks).get_id()) == 1
+        expect(list(jg.table.views)) == [0]
+        expect([task.get_id() for task in tasks]) == [2, 3]
+        for cls in (juggler.JugglerTask, juggler.JugglerTaskEffort, juggler.JugglerBooking, columnar.JugglerTaskTable):
+            expect(list(jg.src.iter_walk(cls))) == jg.src.walk(cls)
+
+    def builds_the_graph_from_columns():
+        jg = columnar.TableJuggler(RECORDS)
+        jg.juggle()
+        expect(jg.build_graph().check()) == [1, 2, 3]
+
+    def books_into_arrays():
+        jg = columnar.TableJuggler([{"id": 1, "effort": 3}, {"id": "two-words", "effort": 1}])
+        dj = jsonjuggler.DictJuggler([{"id": 1, "effort": 3}, {"id": "two-words", "effort": 1}])
+        for j in (jg, dj):
+            j.runner = CannedRunner(ICS_EVENTS % ("", "Z"))
+            j.run()
+        expect(jg.table.views) == {}
+        expect(list(jg.table.booking(0))) == dj.get_task(1).walk(juggler.JugglerBooking)[0].decode()
+        expect(render(jg)) == render(dj)
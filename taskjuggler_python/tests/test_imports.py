@@ -0,0 +1,36 @@
+"""Import-time tests: heavy dependencies are loaded lazily."""
+# pylint: disable=redefined-outer-name,unused-variable,expression-not-assigned,singleton-comparison
+
+import json, os, subprocess, sys
+
+from expecter import expect
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+# milliseconds, median of fresh interpreters; the package itself takes ~25ms here
+IMPORT_BUDGET_MS = 250
+
+LAZY = ["icalendar", "dateutil", "subprocess", "tempfile", "shutil", "multiprocessing", "airtable"]
+
+PROBE = '''
+import sys, time, json
+started = time.time()
+import %s
+elapsed = time.time() - started
+print(json.dumps([elapsed * 1000, sorted(name for name in %r if sys.modules.get(name) is not None)]))
+'''
+
+def probe(module):
+    out = subprocess.check_output([sys.executable, "-c", PROBE % (module, LAZY)], cwd=ROOT)
+    return json.loads(out.decode())
+
+def describe_imports():
+    def jsonjuggler_loads_no_heavy_dependencies():
+        expect(probe("taskjuggler_python.jsonjuggler")[1]) == []
+
+    def cli_loads_no_heavy_dependencies():
+        expect(probe("taskjuggler_python.tjpy_client")[1]) == []
+
+    def stays_within_budget():
+        times = sorted(probe("taskjuggler_python.tjpy_client")[0] for _ in range(5))
+        expect(times[2] < IMPORT_BUDGET_MS) == True
@@ -5,6 +5,7 @@ from expecter import expect
 
 from taskjuggler_python import jsonjuggler, juggler
 import json, datetime, pytz
+from StringIO import StringIO
 juggler.DEBUG = True
 
 def describe_DictJuggler():
@@ -12,6 +13,20 @@ def describe_DictJuggler():
     def when_dict():
         expect((jsonjuggler.DictJuggler({})).issues) == {}
 
+    def keeps_unset_properties_per_task():
+        jg = jsonjuggler.DictJuggler([{"id": 1}, {"id": 2}])
+        other = jsonjuggler.DictJuggler([{"id": 1}])
+        jg.juggle()
+        other.juggle()
+        jg.src.enable_render_cache()
+        jg.write_file()
+        before = str(jg.get_task(2))
+        jg.get_task(1).walk(juggler.JugglerTaskPriority)[0].set_value(300)
+        expect(str(jg.get_task(1))).contains("priority 300")
+        expect(str(jg.get_task(2))) == before
+        expect("priority 300" in str(other.get_task(1))) == False
+        expect(str(jg.write_file())).contains("priority 300")
+
 json_test_tasks = json.dumps([{"id": 2, "depends": [1], "allocate": "me", "effort": 1.2},{"id": 1, "effort": 3, "allocate": "me", "summary": "test"}])
 
 def describe_JsonJuggler():
@@ -81,4 +96,56 @@ task tjp_numid_1 "test" {
         "id": 1,
         "summary": "test"
     }
-]"""
\ No newline at end of file
+]"""
+
+def book_all(jg):
+    for t in jg.walk(juggler.JugglerTask):
+        t.set_property(juggler.JugglerBooking({"resource": "me", "start": datetime.datetime(2017, 10, 10, 9),
+                                               "end": datetime.datetime(2017, 10, 10, 10)}))
+    return jg.toJSON()
+
+def describe_streaming():
+    def parses_arrays_and_ndjson_in_chunks():
+        records = json.loads(json_test_tasks)
+        ndjson = "\n".join(json.dumps(rec) for rec in records)
+        for text in (json_test_tasks, ndjson):
+            expect(list(jsonjuggler.iter_json_records(StringIO(text), read_size=5))) == records
+
+    def reads_files_and_iterators(tmpdir):
+        path = tmpdir.join("tasks.ndjson")
+        path.write("\n".join(json.dumps(rec) for rec in json.loads(json_test_tasks)))
+        expected = book_all(jsonjuggler.JsonJuggler(json_test_tasks))
+        for source in (str(path), open(str(path)), iter(json.loads(json_test_tasks))):
+            expect(book_all(jsonjuggler.JsonJuggler(source))) == expected
+
+    def builds_tasks_page_by_page():
+        jg = jsonjuggler.DictJuggler({"id": i, "effort": 1} for i in range(5))
+        jg.PAGE_SIZE = 2
+        pages = []
+        load = jg.load_issues_incremetal
+        jg.load_issues_incremetal = lambda: pages.append(load()) or pages[-1]
+        jg.juggle()
+        expect([len(page) for page in pages]) == [2, 2, 1, 0]
+        expect(len(jg.walk(juggler.JugglerTask))) == 5
+
+def describe_DictJugglerResource():
+    def registers_on_own_source():
+        first = jsonjuggler.DictJuggler([{"id": 1, "allocate": "alice"}])
+        second = jsonjuggler.DictJuggler([{"id": 1, "allocate": "bob"}])
+        first.juggle()
+        second.juggle()
+        expect([r.get_id() for r in first.walk(juggler.JugglerResource)]) == ["alice"]
+        expect([r.get_id() for r in second.walk(juggler.JugglerResource)]) == ["bob"]
+
+    def are_created_once_per_id():
+        jg = jsonjuggler.DictJuggler([{"id": 1, "allocate": "me"}, {"id": 2, "allocate": "bob"}, {"id": 3}])
+        jg.juggle()
+        me = jg.src.get_resource("me")
+        expect([r.get_id() for r in jg.walk(juggler.JugglerResource)]) == ["me", "bob"]
+        expect(me.summary) == juggler.JugglerResource.DEFAULT_SUMMARY # the last record wins
+        jg.add_task(jg.create_task_instance({"id": 4, "allocate": "me"}))
+        expect(jg.src.get_resource("me") is me) == True
+        expect(str(me)) == '\nresource me "me"'
+        me.set_id("alice")
+        expect(jg.src.get_resource("alice") is me) == True
+        expect(jg.src.get_resource("me")) == None
@@ -1,7 +1,10 @@
 """Sample unit test module using pytest-describe and expecter."""
 # pylint: disable=redefined-outer-name,unused-variable,expression-not-assigned,singleton-comparison
 
-import datetime
+import datetime, os, time
+
+import pytest
+import pytz
 
 from expecter import expect
 
@@ -12,6 +15,39 @@ def describe_to_identifier():
     def test_it():
         expect(juggler.to_identifier("ab-c")) == "ab"+juggler.TJP_DASH_PREFIX+"c"
 
+def describe_JugglerIdentifiers():
+    def round_trips_colliding_ids():
+        ids = [1, "1", "a-b", "a__DASH__b", "x.y", "2nd", u"caf\xe9"]
+        table = juggler.JugglerIdentifiers()
+        identifiers = [table.to_identifier(id) for id in ids]
+        expect(identifiers[:3]) == ["tjp_numid_1", "tjp_numid_1__2", "a__DASH__b"]
+        expect(len(set(identifiers))) == len(ids)
+        expect([juggler.IDENTIFIER_RE.match(ident) is not None for ident in identifiers]) == [True] * len(ids)
+        expect([table.from_identifier(ident) for ident in identifiers]) == ids
+        expect(table.from_identifier("never__DASH__seen")) == "never-seen"
+
+    def decodes_any_code_point():
+        for id in [u"\u0416x", u"caf\xe9", u"a.b", u"\u20ac 1"]:
+            expect(juggler.from_identifier(juggler.to_identifier(id))) == id
+
+    def name_the_project_as_rendered():
+        jg = make_juggler([1])
+        jg.src.identifiers.to_identifier("a b")
+        jg.src.walk(juggler.JugglerProject)[0].set_id("a__SPACE__b")
+        jg.runner = CannedRunner(ICS_EVENTS % ("", "Z"))
+        jg.run()
+        expect(jg.runner.calls[0][0]) == "a__SPACE__b__2"
+        expect(str(jg.src)).contains("project a__SPACE__b__2 ")
+
+    def are_used_to_read_results(tmpdir):
+        ics = tmpdir.join("calendar.ics")
+        ics.write(ICS_EVENTS.replace("tjp_numid_1-", "tjp_numid_1__2-") % ("", "Z"))
+        jg = make_juggler([1, "1", "two-words"])
+        expect(jg.write_file()).contains("task tjp_numid_1__2")
+        jg.read_ical_result(str(ics))
+        expect(jg.get_task(1).walk(juggler.JugglerBooking)) == []
+        expect(len(jg.get_task("1").walk(juggler.JugglerBooking))) == 1
+
 def describe_JugglerSimpleProperty():
     def default_create():
         expect(str(juggler.JugglerSimpleProperty())) == '\nunknown_property '
@@ -38,6 +74,89 @@ def describe_JugglerSource():
         s.set_property(t)
         expect(str(s)) == juggler.JugglerSource.COMMENTS_HEADER + '\n \nproject default "Default Project" 2017-10-10-00:00:00 - 2035-10-10-00:00:00  {\n\ntimezone "UTC"\noutputdir "REPORT"\n}\nresource me "Default Resource"\nicalreport "calendar"\ntask unknown_task "Task is not initialized" {\n    allocate me\n    effort 1h\n\n}'
 
+def describe_task_index():
+    def indexes_added_tasks():
+        s = juggler.JugglerSource()
+        t = juggler.JugglerTask()
+        t.set_id("a")
+        s.set_property(t)
+        expect(s.get_task("a")) == t
+        expect(s.get_task("b")) == None
+
+    def follows_set_id():
+        s = juggler.JugglerSource()
+        t = juggler.JugglerTask()
+        s.set_property(t)
+        t.set_id(42)
+        expect(s.get_task(42)) == t
+        expect(s.get_task(juggler.JugglerTask.DEFAULT_ID)) == None
+
+    def drops_replaced_tasks():
+        s = juggler.JugglerSource()
+        t1 = juggler.JugglerTask()
+        t2 = juggler.JugglerTask()
+        s.set_property(t1)
+        s.set_property(t2)
+        expect(s.get_task(juggler.JugglerTask.DEFAULT_ID)) == t2
+
+    def indexes_nested_tasks():
+        s = juggler.JugglerSource()
+        parent = juggler.JugglerTask()
+        parent.set_id("a")
+        child = juggler.JugglerTask()
+        child.set_id("b")
+        parent.set_property(child)
+        s.set_property(parent)
+        expect(s.get_task("b")) == child
+        grandchild = juggler.JugglerTask()
+        grandchild.set_id("c")
+        child.set_property(grandchild)
+        expect(s.get_task("c")) == grandchild
+
+    def drops_nested_tasks_of_removed_and_replaced_parents():
+        s = juggler.JugglerSource()
+        for parent_id in ("a", "x"):
+            parent = juggler.JugglerTask()
+            parent.set_id(parent_id)
+            s.set_property(parent)
+            child = juggler.JugglerTask()
+            child.set_id(parent_id * 2)
+            parent.set_property(child)
+        expect(s.get_task("aa")) != None
+        s.remove_property(s.get_task("a").get_hash())
+        expect(s.get_task("aa")) == None
+        s.set_property(make_task("x"))
+        expect(s.get_task("xx")) == None
+        expect(s.get_task("x").walk(juggler.JugglerTask)) == [s.get_task("x")]
+
+def describe_JugglerTaskDepends():
+    def removes_out_of_scope_links():
+        t1 = juggler.JugglerTask()
+        t1.set_id(1)
+        t2 = juggler.JugglerTask()
+        t2.set_id(2)
+        dep = juggler.JugglerTaskDepends()
+        dep.set_value([1, 3])
+        t2.set_property(dep)
+        juggler.GenericJuggler.validate_tasks([t1, t2])
+        expect(dep.get_value()) == [1]
+
+def describe_JugglerProperties():
+    def keeps_insertion_order():
+        props = juggler.JugglerProperties()
+        for key in ["c", "a", "b"]:
+            props[key] = key.upper()
+        props["a"] = "A2"
+        del props["c"]
+        expect(props.items()) == [("a", "A2"), ("b", "B")]
+        expect(list(props)) == ["a", "b"]
+
+    def survives_deepcopy():
+        t = make_task(1, [2])
+        copied = juggler.copy.deepcopy(t)
+        expect(copied.properties.keys()) == t.properties.keys()
+        expect(str(copied)) == str(t)
+
 def describe_JugglerTaskPriority():
     p = juggler.JugglerTaskPriority()
     p.set_value(100)
@@ -55,4 +174,437 @@ def describe_JugglerTaskStart():
     p = juggler.JugglerTaskStart()
     d = datetime.datetime.now()
     p.set_value(d)
-    expect(str(p)) == "    start "+juggler.to_tj3time(d)+"\n"
\ No newline at end of file
+    expect(str(p)) == "    start "+juggler.to_tj3time(d)+"\n"
+
+def make_task(id, depends=()):
+    t = juggler.JugglerTask()
+    t.set_id(id)
+    dep = juggler.JugglerTaskDepends()
+    dep.set_value(depends)
+    t.set_property(dep)
+    return t
+
+def describe_JugglerTaskGraph():
+    def sorts_dependencies_first():
+        g = juggler.JugglerTaskGraph([make_task(3, [2]), make_task(2, [1]), make_task(1)])
+        expect(g.check()) == [1, 2, 3]
+        expect(g.cycles) == []
+
+    def reports_dangling():
+        g = juggler.JugglerTaskGraph([make_task(1, [5])])
+        expect(g.dangling) == [(1, 5)]
+
+    def reports_every_cycle():
+        g = juggler.JugglerTaskGraph([make_task("a", ["b"]), make_task("b", ["a"]),
+                                      make_task("c", ["c"]), make_task("d", ["a"]), make_task("e")])
+        expect(g.order) == ["e"]
+        expect(sorted(sorted(c) for c in g.cycles)) == [["a", "b"], ["c"]]
+        with expect.raises(juggler.JugglerDependencyError):
+            g.check()
+
+def describe_write_to():
+    def matches_str():
+        import StringIO
+        jg = juggler.GenericJuggler()
+        t = make_task(2, [1])
+        t.summary = 'quoted "summary"'
+        jg.add_task(make_task(1))
+        jg.add_task(t)
+        out = StringIO.StringIO()
+        jg.write_file(out)
+        expect(out.getvalue()) == jg.write_file()
+        expect(out.getvalue()) == str(jg.src)
+
+    def returns_the_text_for_every_output(tmpdir):
+        import StringIO
+        jg = make_juggler([1, 2])
+        text = str(jg.src)
+        path = tmpdir.join("plan.tjp")
+        expect(jg.write_file(str(path))) == text
+        expect(path.read()) == text
+        out = StringIO.StringIO()
+        expect(jg.write_file(out)) == text
+        expect(out.getvalue()) == text
+        expect(jg.write_file()) == text
+
+ICS_EVENTS = '''BEGIN:VCALENDAR\r
+VERSION:2.0\r
+BEGIN:VEVENT\r
+UID:default-tjp_numid_1-VEVENT\r
+DTSTART:20171010T090000Z\r
+DTEND:20171010T120000Z\r
+SUMMARY:a long summary that tj3 would fold over\r
+  several lines\r
+END:VEVENT\r
+BEGIN:VEVENT\r
+UID:default-two__DASH__words-VEVENT\r
+DTSTART%s:20171010T120000%s\r
+DTEND:20171010T130000Z\r
+END:VEVENT\r
+END:VCALENDAR\r
+'''
+
+def make_juggler(ids):
+    jg = juggler.GenericJuggler()
+    for id in ids:
+        jg.add_task(make_task(id))
+    return jg
+
+def describe_read_ical_result():
+    def streams_bookings(tmpdir):
+        ics = tmpdir.join("calendar.ics")
+        ics.write(ICS_EVENTS % ("", "Z"))
+        expect(list(juggler.iter_ical_bookings(str(ics)))[0]) == (
+            1, datetime.datetime(2017, 10, 10, 9, 0, tzinfo=pytz.utc), datetime.datetime(2017, 10, 10, 12, 0, tzinfo=pytz.utc))
+        jg = make_juggler([1, "two-words"])
+        seen = []
+        jg.read_ical_result(str(ics), lambda task, booking: seen.append(task.get_id()))
+        expect(seen) == [1, "two-words"]
+        expect(jg.get_task("two-words").walk(juggler.JugglerBooking)[0].decode()[0]) == datetime.datetime(2017, 10, 10, 12, 0, tzinfo=pytz.utc)
+
+    def falls_back_to_icalendar(tmpdir):
+        ics = tmpdir.join("calendar.ics")
+        ics.write(ICS_EVENTS % (";TZID=UTC", ""))
+        jg = make_juggler([1, "two-words"])
+        jg.read_ical_result(str(ics))
+        expect(len(jg.walk(juggler.JugglerBooking))) == 2
+
+    def rejects_leading_continuation_lines(tmpdir):
+        ics = tmpdir.join("calendar.ics")
+        ics.write(" X\r\n" + ICS_EVENTS % ("", "Z"))
+        with pytest.raises(ValueError):
+            list(juggler.iter_ical_bookings(str(ics)))
+
+EXPORT_BOOKINGS = '''supplement task tjp_numid_1 {
+  booking me 2017-10-10-09:00-+0000 + 3.0h,
+    2017-10-11-09:00-+0000 + 2.0h
+  booking bob 2017-10-10-09:00-+0000 - 2017-10-10-10:30-+0000
+}
+supplement task two__DASH__words {
+  booking me 2017-10-12-09:00-+0000 + 30min { overtime 2 }
+}
+'''
+
+def describe_read_export_result():
+    def reads_every_segment(tmpdir):
+        tjp = tmpdir.join("bookings_out.tjp")
+        tjp.write(EXPORT_BOOKINGS)
+        jg = make_juggler([1, "two-words"])
+        jg.read_export_result(str(tjp))
+        bookings = jg.get_task(1).walk(juggler.JugglerBooking)
+        expect([(b.get_id(), b.decode()) for b in bookings]) == [
+            ("me", [datetime.datetime(2017, 10, 10, 9, 0, tzinfo=pytz.utc), datetime.datetime(2017, 10, 10, 12, 0, tzinfo=pytz.utc)]),
+            ("me", [datetime.datetime(2017, 10, 11, 9, 0, tzinfo=pytz.utc), datetime.datetime(2017, 10, 11, 11, 0, tzinfo=pytz.utc)]),
+            ("bob", [datetime.datetime(2017, 10, 10, 9, 0, tzinfo=pytz.utc), datetime.datetime(2017, 10, 10, 10, 30, tzinfo=pytz.utc)])]
+        expect(jg.get_task("two-words").walk(juggler.JugglerBooking)[0].decode()[1]) == datetime.datetime(2017, 10, 12, 9, 30, tzinfo=pytz.utc)
+
+    def replaces_previous_bookings(tmpdir):
+        tjp = tmpdir.join("bookings_out.tjp")
+        tjp.write(EXPORT_BOOKINGS)
+        jg = make_juggler([1, "two-words"])
+        jg.read_export_result(str(tjp))
+        jg.read_export_result(str(tjp))
+        expect(len(jg.get_task(1).walk(juggler.JugglerBooking))) == 3
+
+class CannedRunner(juggler.JugglerRunner):
+    """Runner writing canned reports instead of running tj3."""
+    def __init__(self, report):
+        self.report = report
+        self.calls = []
+
+    def run(self, infile, outfolder, project_id, reports):
+        self.calls.append((project_id, [report_id for report_id, path in reports]))
+        for report_id, path in reports:
+            with open(path, 'w') as out:
+                out.write(self.report)
+        return 0
+
+class FailingRunner(juggler.JugglerRunner):
+    """Runner failing like tj3 on an invalid project."""
+    def run(self, infile, outfolder, project_id, reports):
+        return 1
+
+def describe_runner():
+    def is_pluggable():
+        jg = make_juggler([1, "two-words"])
+        jg.runner = CannedRunner(ICS_EVENTS % ("", "Z"))
+        jg.run()
+        expect(jg.runner.calls) == [("default", ["calendar_out"])]
+        expect(len(jg.walk(juggler.JugglerBooking))) == 2
+        expect(str(jg.src)).contains('\nicalreport "calendar"')
+
+    def reports_failures_and_restores_the_source():
+        jg = make_juggler([1, "two-words"])
+        before = str(jg.src)
+        jg.runner = FailingRunner()
+        with pytest.raises(juggler.JugglerRunError) as error:
+            jg.run(mode=juggler.REPORT_EXPORT)
+        expect(error.value.exit_code) == 1
+        expect(str(error.value)).contains("exit code 1")
+        expect(str(jg.src)) == before
+
+    def removes_only_its_own_files(tmpdir):
+        import logging
+        level = logging.getLogger().level
+        juggler.DEBUG = False
+        logging.getLogger().setLevel(logging.WARNING)
+        try:
+            outfolder = tmpdir.mkdir("out")
+            outfolder.join("keep.txt").write("mine")
+            infile = tmpdir.join("plan.tjp")
+            jg = make_juggler([1, "two-words"])
+            jg.runner = CannedRunner(ICS_EVENTS % ("", "Z"))
+            jg.run(outfolder=str(outfolder), infile=str(infile))
+            jg.clean()
+            expect(outfolder.join("keep.txt").read()) == "mine"
+            expect(infile.check()) == True
+
+            jg.run()
+            expect(os.path.exists(jg.outfolder)) == False
+            expect(os.path.exists(jg.infile)) == False
+        finally:
+            juggler.DEBUG = True
+            logging.getLogger().setLevel(level)
+
+    def daemon_falls_back():
+        runner = juggler.JugglerDaemonRunner(fallback=CannedRunner(EXPORT_BOOKINGS))
+        runner.TJ3CLIENT = runner.TJ3D = "/nonexistent/tj3"
+        jg = make_juggler([1, "two-words"])
+        jg.runner = runner
+        jg.run(mode=juggler.REPORT_EXPORT)
+        expect(runner.fallback.calls) == [("default", ["bookings_out"])]
+        expect(len(jg.walk(juggler.JugglerBooking))) == 4
+
+    def daemon_is_terminated_with_its_config(tmpdir):
+        tj3d = tmpdir.join("tj3d")
+        tj3d.write('#!/bin/sh\ntouch "$2.running"\n')
+        tj3client = tmpdir.join("tj3client")
+        tj3client.write('#!/bin/sh\necho $4 >> "$(dirname "$0")/calls"\n'
+                        'case $4 in status) test -e "$3.running";; terminate) rm "$3.running";; esac\n')
+        tj3d.chmod(0o755)
+        tj3client.chmod(0o755)
+        with juggler.JugglerDaemonRunner() as runner:
+            runner.TJ3D, runner.TJ3CLIENT = str(tj3d), str(tj3client)
+            runner.ensure_daemon()
+            expect(runner.started) == True
+            config_dir = runner.tempdir
+            expect(os.path.exists(runner.config + ".running")) == True
+        expect(tmpdir.join("calls").read().split()) == ["status", "status", "terminate"]
+        expect(os.path.exists(config_dir)) == False
+
+def describe_run_many():
+    def isolates_failures():
+        good = make_juggler([1, "two-words"])
+        bad = make_juggler([1])
+        bad.get_task(1).set_property(make_task(1, [1]).properties.values()[-1])
+        for jg in (good, bad):
+            jg.runner = CannedRunner(ICS_EVENTS % ("", "Z"))
+        errors = juggler.run_many([good, bad], max_workers=2)
+        expect(errors[0]) == None
+        expect(isinstance(errors[1], juggler.JugglerDependencyError)) == True
+        expect(len(good.walk(juggler.JugglerBooking))) == 2
+        expect(bad.walk(juggler.JugglerBooking)) == []
+
+def make_allocated_task(id, resource, depends=()):
+    t = make_task(id, depends)
+    del t.properties[juggler.JugglerTaskAllocate("me").get_hash()]
+    t.set_property(juggler.JugglerTaskAllocate(resource))
+    return t
+
+def describe_partition_tasks():
+    def groups_by_resources_and_dependencies():
+        tasks = [make_allocated_task(1, "me"), make_allocated_task(2, "bob"), make_allocated_task(3, "carol"),
+                 make_allocated_task(4, "bob", [1]), make_allocated_task(5, "carol")]
+        groups = juggler.partition_tasks(tasks)
+        expect([[t.get_id() for t in group] for group in groups]) == [[1, 2, 4], [3, 5]]
+
+    def schedules_parts_into_the_tree():
+        jg = juggler.GenericJuggler()
+        jg.src = juggler.JugglerSource()
+        jg.add_task(make_allocated_task(1, "me"))
+        jg.add_task(make_allocated_task("two-words", "bob"))
+        jg.runner = CannedRunner(ICS_EVENTS % ("", "Z"))
+        jg.run_partitioned(max_workers=2)
+        expect(len(jg.runner.calls)) == 2
+        expect(jg.get_task(1).walk(juggler.JugglerBooking)[0].get_id()) == "me"
+        expect(jg.get_task("two-words").walk(juggler.JugglerBooking)[0].get_id()) == "bob"
+        expect(jg.src.walk(juggler.JugglerOutputdir)[0].get_value()) == '"REPORT"'
+
+def describe_run_incremental():
+    def reschedules_only_unstarted_tasks():
+        jg = juggler.GenericJuggler()
+        jg.src = juggler.JugglerSource()
+        for id, depends in [(1, []), (2, [1]), (3, [2])]:
+            jg.add_task(make_task(id, depends))
+            jg.get_task(id).set_property(juggler.JugglerTaskEffort(4))
+        jg.walk(juggler.JugglerProject)[0].set_interval(datetime.datetime(2017, 10, 10, 9))
+        jg.run(backend=juggler.BACKEND_LIST)
+        booked = jg.get_task(2).walk(juggler.JugglerBooking)[0].decode()
+        jg.get_task(3).set_property(juggler.JugglerTaskEffort(2))
+        stats = jg.enable_stats()
+        expect(jg.run_incremental(now=datetime.datetime(2017, 10, 10, 15), backend=juggler.BACKEND_LIST)) == [1, 2]
+        expect(stats.counters["tasks"]) == 1
+        expect(jg.get_task(2).walk(juggler.JugglerBooking)[0].decode()) == booked
+        expect(jg.get_task(3).walk(juggler.JugglerBooking)[0].decode()) == [
+            datetime.datetime(2017, 10, 11, 9, tzinfo=pytz.utc), datetime.datetime(2017, 10, 11, 11, tzinfo=pytz.utc)]
+        expect(jg.get_task(3).walk(juggler.JugglerTaskStart)) == []
+        expect(jg.get_task(3).walk(juggler.JugglerTaskDepends)[0].get_value()) == [2]
+
+    def cuts_off_in_project_time():
+        jg = juggler.GenericJuggler()
+        jg.src = juggler.JugglerSource()
+        jg.walk(juggler.JugglerTimezone)[0].set_value("Europe/Berlin")
+        for id, depends in [(1, []), (2, [1])]:
+            jg.add_task(make_task(id, depends))
+            jg.get_task(id).set_property(juggler.JugglerTaskEffort(4))
+        jg.walk(juggler.JugglerProject)[0].set_interval(datetime.datetime(2017, 10, 10, 9))
+        jg.run(backend=juggler.BACKEND_LIST)
+        booked = [datetime.datetime(2017, 10, 10, 12, tzinfo=pytz.utc), datetime.datetime(2017, 10, 10, 16, tzinfo=pytz.utc)]
+        expect(jg.get_task(2).walk(juggler.JugglerBooking)[0].decode()) == booked # 14:00 - 18:00 project time
+        now = datetime.datetime(2017, 10, 10, 14)
+        expect(jg.run_incremental(now=now, backend=juggler.BACKEND_LIST)) == [1]
+        expect(jg.run_incremental(now=datetime.datetime(2017, 10, 10, 12, tzinfo=pytz.utc), backend=juggler.BACKEND_LIST)) == [1]
+        expect(jg.get_task(2).walk(juggler.JugglerBooking)[0].decode()) == booked
+        task = jg.get_task(2)
+        start = juggler.JugglerTaskStart()
+        start.set_value(datetime.datetime(2017, 10, 10, 13, tzinfo=pytz.utc))
+        task.set_property(start)
+        pinned = jg.pin_task(task, now, {}, pytz.timezone("Europe/Berlin"))
+        expect(pinned.walk(juggler.JugglerTaskStart)[0].get_value()) == "2017-10-10-15:00:00"
+
+    def pins_detached_copies():
+        jg = make_juggler([1, 2])
+        jg.add_task(make_task(3, [1, 2]))
+        task = jg.get_task(3)
+        jg.src.enable_render_cache()
+        before = jg.write_file()
+        pinned = jg.pin_task(task, datetime.datetime(2017, 10, 11, 9), {1: None})
+        expect(pinned.top) == None
+        expect(pinned.parent) == None
+        pinned.set_property(juggler.JugglerBooking({"resource": "me", "start": datetime.datetime(2017, 10, 11, 9),
+                                                    "end": datetime.datetime(2017, 10, 11, 10)}))
+        expect(jg.src.rendered) != None
+        expect(jg.write_file()) == before
+        expect(pinned.walk(juggler.JugglerTaskDepends)[0].get_value()) == [2]
+        expect(str(pinned)).contains("start 2017-10-11-09:00:00")
+
+def describe_stats():
+    def are_disabled_by_default():
+        expect(juggler.GenericJuggler().stats.enabled) == False
+
+    def record_phases_and_counters():
+        jg = make_juggler([1, "two-words"])
+        seen = []
+        stats = jg.enable_stats(lambda stats, phase: seen.append(phase))
+        jg.runner = CannedRunner(ICS_EVENTS % ("", "Z"))
+        jg.run()
+        expect(seen) == ["validate", "render", "tj3", "read"]
+        expect(stats.counters["tasks"]) == 2
+        expect(stats.counters["bookings"]) == 2
+        expect(stats.counters["tj3_exit_code"]) == 0
+        expect(stats.counters["rendered_bytes"] > 0) == True
+        expect(stats.report()).contains("tj3")
+
+class PagedJuggler(juggler.GenericJuggler):
+    '''Serves pages of one issue each, page number 3 fails if broken'''
+
+    def __init__(self, pages, broken=False):
+        self.pages = pages
+        self.broken = broken
+
+    def load_issues_page(self, page):
+        if self.broken and page == 3:
+            raise IOError("backend down")
+        return [{"id": page}] if page < self.pages else []
+
+    def create_task_instance(self, issue):
+        return make_task(issue["id"])
+
+def describe_prefetch():
+    def keeps_page_order():
+        jg = PagedJuggler(20)
+        jg.prefetch, jg.concurrency = 3, 4
+        jg.juggle()
+        expect([t.get_id() for t in jg.walk(juggler.JugglerTask)]) == list(range(20))
+
+    def raises_fetch_errors():
+        jg = PagedJuggler(20, broken=True)
+        jg.prefetch, jg.concurrency = 2, 2
+        with pytest.raises(IOError):
+            jg.juggle()
+
+    def bounds_pages_ahead():
+        fetched = []
+        pages = juggler.iter_prefetched_pages(lambda n: fetched.append(n) or [n], prefetch=2, concurrency=3)
+        expect(next(pages)) == [0]
+        time.sleep(0.05)
+        expect(max(fetched)) == 2
+        pages.close()
+
+def uncached(jg):
+    jg.src.enable_render_cache(False)
+    text = jg.write_file()
+    jg.src.enable_render_cache()
+    return text
+
+def describe_render_cache():
+    def rerenders_only_changes():
+        jg = make_juggler([1, 2, 3])
+        jg.src.enable_render_cache()
+        first = jg.write_file()
+        kept = jg.get_task(1).rendered
+        priority = juggler.JugglerTaskPriority()
+        priority.set_value(700)
+        jg.get_task(2).set_property(priority)
+        expect(jg.get_task(1).rendered).isinstance(str)
+        expect(jg.src.rendered) == None
+        second = jg.write_file()
+        expect(second) != first
+        expect(second).contains("priority 700")
+        expect(jg.get_task(1).rendered is kept) == True
+        priority.set_value(800)
+        jg.get_task(3).walk(juggler.JugglerTaskDepends)[0].set_value([1])
+        expect(jg.write_file()) == uncached(jg)
+
+    def follows_runs():
+        jg = make_juggler([1, "two-words"])
+        jg.src.enable_render_cache()
+        before = jg.write_file()
+        jg.runner = CannedRunner(ICS_EVENTS % ("", "Z"))
+        jg.run()
+        expect(jg.write_file()) == uncached(jg)
+        expect(jg.write_file()).contains("booking me")
+        jg.get_task(1).clear_bookings()
+        jg.get_task("two-words").clear_bookings()
+        expect(jg.write_file()) == before
+
+def booking(resource, hours):
+    return juggler.JugglerBooking({"resource": resource, "start": datetime.datetime(2017, 10, 10, 9),
+                                   "end": datetime.datetime(2017, 10, 10, 9 + hours)})
+
+def describe_walk():
+    def follows_changes_in_tree_order():
+        jg = make_juggler([1, 2, 3])
+        src = jg.src
+        traverse = lambda cls: juggler.JugglerCompoundKeyword.walk(src, cls)
+        expect(src.walk(juggler.JugglerTask)) == traverse(juggler.JugglerTask)
+        jg.get_task(3).set_property(booking("me", 1))
+        jg.get_task(1).set_property(booking("me", 2))
+        nested = make_task(4)
+        nested.set_property(booking("bob", 1))
+        jg.get_task(2).set_property(nested)
+        hours = juggler.JugglerWorkingHours()
+        hours.set_weekday("sat")
+        src.walk(juggler.JugglerProject)[0].set_property(hours)
+        src.remove_property(jg.get_task(3).get_hash())
+        jg.add_task(make_task(5))
+        for cls in [juggler.JugglerTask, juggler.JugglerBooking, juggler.JugglerWorkingHours, juggler.JugglerSource,
+                    juggler.JugglerCompoundKeyword, juggler.JugglerTaskDepends]:
+            expect(src.walk(cls)) == traverse(cls)
+            expect(list(src.iter_walk(cls))) == traverse(cls)
+        expect([t.get_id() for t in src.walk(juggler.JugglerTask)]) == [1, 4, 2, 5]
+
+    def iterates_lazily():
+        jg = make_juggler(range(100))
+        expect(next(jg.iter_walk(juggler.JugglerTask)).get_id()) == 0
+        expect(next(juggler.JugglerCompoundKeyword.iter_walk(jg.src, juggler.JugglerProject))) == jg.walk(juggler.JugglerProject)[0]
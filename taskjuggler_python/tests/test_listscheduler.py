@@ -0,0 +1,95 @@
+"""Unit tests for the in-process list scheduler."""
+# pylint: disable=redefined-outer-name,unused-variable,expression-not-assigned,singleton-comparison
+
+import datetime, subprocess
+
+import pytest
+import pytz
+from expecter import expect
+
+from taskjuggler_python import juggler, jsonjuggler, listscheduler
+
+TUESDAY = datetime.datetime(2017, 10, 10, 9)
+
+# Conformance cases: plan, project start, expected (start, end) per task in UTC as in the tj3 icalreport
+CASES = {
+    "dependencies over lunch and night": (
+        [{"id": 1, "effort": 4}, {"id": 2, "effort": 5, "depends": [1]}], TUESDAY,
+        {1: ("2017-10-10 09:00", "2017-10-10 14:00"), 2: ("2017-10-10 14:00", "2017-10-11 10:00")}),
+    "higher priority first": (
+        [{"id": 1, "effort": 2, "priority": 200}, {"id": 2, "effort": 3, "priority": 300}], TUESDAY,
+        {1: ("2017-10-10 13:00", "2017-10-10 15:00"), 2: ("2017-10-10 09:00", "2017-10-10 12:00")}),
+    "appointment is kept, work fills around it": (
+        [{"id": 1, "effort": 10, "priority": 200}, {"id": 2, "effort": 2, "start": datetime.datetime(2017, 10, 11, 13)}],
+        TUESDAY,
+        {1: ("2017-10-10 09:00", "2017-10-11 11:00"), 2: ("2017-10-11 13:00", "2017-10-11 15:00")}),
+    "weekend": (
+        [{"id": 1, "effort": 2}], datetime.datetime(2017, 10, 13, 17),
+        {1: ("2017-10-13 17:00", "2017-10-16 10:00")}),
+    "same priority, longer path first": (
+        [{"id": 1, "effort": 2}, {"id": 2, "effort": 2}, {"id": 3, "effort": 4, "depends": [2]}], TUESDAY,
+        {1: ("2017-10-10 16:00", "2017-10-10 18:00"), 2: ("2017-10-10 09:00", "2017-10-10 11:00"),
+         3: ("2017-10-10 11:00", "2017-10-10 16:00")}),
+}
+
+def utc(value):
+    return pytz.utc.localize(datetime.datetime.strptime(value, "%Y-%m-%d %H:%M"))
+
+def make_juggler(issues, start):
+    jg = jsonjuggler.DictJuggler([dict(issue, allocate="me") for issue in issues])
+    jg.juggle()
+    jg.walk(juggler.JugglerProject)[0].set_interval(start)
+    return jg
+
+def bookings(jg):
+    return dict((task.get_id(), task.walk(juggler.JugglerBooking)[0].decode()) for task in jg.walk(juggler.JugglerTask))
+
+def real_tj3():
+    try:
+        return "TaskJuggler" in subprocess.check_output(["tj3", "--version"], stderr=subprocess.STDOUT)
+    except Exception: # pylint:disable=broad-except
+        return False
+
+def describe_list_backend():
+    @pytest.mark.parametrize("case", sorted(CASES))
+    def conforms_to_tj3(case):
+        issues, start, expected = CASES[case]
+        jg = make_juggler(issues, start)
+        jg.run(backend=juggler.BACKEND_LIST)
+        expect(bookings(jg)) == dict((id, [utc(s), utc(e)]) for id, (s, e) in expected.items())
+
+    def reads_project_time_zone_and_working_hours():
+        jg = make_juggler([{"id": 1, "effort": 13}], datetime.datetime(2017, 10, 10, 8))
+        project = jg.walk(juggler.JugglerProject)[0]
+        project.walk(juggler.JugglerTimezone)[0].set_value("Europe/Berlin")
+        hours = juggler.JugglerWorkingHours()
+        hours.set_weekday("tue")
+        hours.set_hour_interval(8, 20)
+        project.set_property(hours)
+        jg.run(backend=juggler.BACKEND_LIST)
+        expect(bookings(jg)[1]) == [utc("2017-10-10 06:00"), utc("2017-10-11 08:00")]
+
+    def books_every_interval_in_export_mode():
+        jg = make_juggler([{"id": 1, "effort": 5}], TUESDAY)
+        jg.run(mode=juggler.REPORT_EXPORT, backend=juggler.BACKEND_LIST)
+        expect([b.decode() for b in jg.walk(juggler.JugglerBooking)]) == [
+            [utc("2017-10-10 09:00"), utc("2017-10-10 12:00")], [utc("2017-10-10 13:00"), utc("2017-10-10 15:00")]]
+
+    def rejects_unsupported_plans():
+        with pytest.raises(listscheduler.JugglerScheduleError):
+            make_juggler([{"id": 1}], TUESDAY).run(backend=juggler.BACKEND_LIST)
+        jg = make_juggler([{"id": 1, "effort": 10}], TUESDAY)
+        jg.walk(juggler.JugglerProject)[0].set_interval(TUESDAY, TUESDAY + datetime.timedelta(days=1))
+        with pytest.raises(listscheduler.JugglerScheduleError):
+            jg.run(backend=juggler.BACKEND_LIST)
+        with pytest.raises(juggler.JugglerDependencyError):
+            make_juggler([{"id": 1, "effort": 1, "depends": [2]}, {"id": 2, "effort": 1, "depends": [1]}],
+                         TUESDAY).run(backend=juggler.BACKEND_LIST)
+
+    @pytest.mark.skipif(not real_tj3(), reason="needs TaskJuggler's tj3 on PATH")
+    @pytest.mark.parametrize("case", sorted(CASES))
+    def matches_tj3(case):
+        issues, start, expected = CASES[case]
+        jg = make_juggler(issues, start)
+        jg.run()
+        expect(bookings(jg)) == dict((id, [utc(s), utc(e)]) for id, (s, e) in expected.items())
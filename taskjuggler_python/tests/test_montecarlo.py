@@ -0,0 +1,70 @@
+"""Unit tests for the Monte Carlo simulation."""
+# pylint: disable=redefined-outer-name,unused-variable,expression-not-assigned,singleton-comparison
+
+import re
+
+from expecter import expect
+
+from taskjuggler_python import juggler, montecarlo, columnar
+
+from .test_juggler import make_juggler
+
+class EffortRunner(juggler.JugglerRunner):
+    """Runner booking every task at 09:00 for its (scenario) effort instead of running tj3."""
+    def __init__(self):
+        self.runs = 0
+
+    def run(self, infile, outfolder, project_id, reports):
+        self.runs += 1
+        tjp = open(infile).read()
+        tasks = re.findall(r'^task (\S+) "[^"]*" \{\n((?:    .*\n)*)', tjp, re.M)
+        for report_id, path in reports:
+            scenario = re.search(r'icalreport %s "[^"]*" \{\s*scenario (\w+)' % report_id, tjp)
+            events = []
+            for id, body in tasks:
+                effort = re.search(r'^    effort (\d+)h', body, re.M).group(1)
+                if scenario:
+                    effort = re.search(r'^    %s:effort (\d+)h' % scenario.group(1), body, re.M).group(1)
+                events.append('BEGIN:VEVENT\r\nUID:%s-%s-VEVENT\r\nDTSTART:20171010T090000Z\r\n'
+                              'DTEND:20171010T%02d0000Z\r\nEND:VEVENT\r\n' % (project_id, id, 9 + int(effort)))
+            with open(path, 'w') as out:
+                out.write('BEGIN:VCALENDAR\r\n' + ''.join(events) + 'END:VCALENDAR\r\n')
+        return 0
+
+def simulate(**kwargs):
+    jg = make_juggler(["a", "b"])
+    jg.runner = EffortRunner()
+    distributions = {"a": montecarlo.triangular(1, 2, 8), "b": 3}
+    return jg, jg.simulate(distributions, 20, **kwargs)
+
+def describe_simulate():
+    def computes_percentiles():
+        jg, result = simulate(seed=7, percentiles=(0, 50, 100))
+        expect(result.samples) == 20
+        expect(result.ids) == ["a", "b"]
+        expect(result.end.shape) == (2, 3)
+        hours = (result.end - result.start).astype(int) // 60
+        expect(list(hours[1])) == [3, 3, 3]
+        expect(1 <= hours[0][0] <= hours[0][1] <= hours[0][2] <= 8) == True
+
+    def is_reproducible_from_the_seed():
+        _, first = simulate(seed=7)
+        _, again = simulate(seed=7, max_workers=1)
+        expect((first.end == again.end).all()) == True
+        _, random = simulate()
+        expect(random.seed) != None
+
+    def packs_samples_as_scenarios():
+        _, single = simulate(seed=7)
+        jg, packed = simulate(seed=7, samples_per_run=8)
+        expect(jg.runner.runs) == 3
+        expect((single.end == packed.end).all()) == True
+
+    def samples_task_tables():
+        jg = columnar.TableJuggler([{"id": 1, "effort": 2}, {"id": 2, "effort": 1, "depends": [1]}])
+        jg.runner = EffortRunner()
+        result = jg.simulate({1: montecarlo.triangular(1, 2, 8), 2: 3}, 10, seed=7, samples_per_run=4)
+        expect(result.ids) == [1, 2]
+        hours = (result.end - result.start).astype(int) // 60
+        expect(list(hours[1])) == [3, 3]
+        expect(jg.get_task(2).walk(juggler.JugglerTaskEffort)[0].get_value()) == 1
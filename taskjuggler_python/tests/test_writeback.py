@@ -0,0 +1,77 @@
+"""Unit tests for the Airtable write-back."""
+# pylint: disable=redefined-outer-name,unused-variable,expression-not-assigned,singleton-comparison
+
+import json, threading, BaseHTTPServer
+
+import pytest
+from expecter import expect
+
+from taskjuggler_python import writeback
+
+class StandInHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """Airtable stand-in: records PATCH bodies, throttles the first request."""
+    def do_PATCH(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        server = self.server
+        with server.lock:
+            server.calls += 1
+            throttle = server.calls <= server.throttle
+            if not throttle:
+                server.batches.append((self.path, self.headers['Authorization'], body['records']))
+        self.send_response(429 if throttle else 200)
+        self.end_headers()
+        self.wfile.write(json.dumps(body))
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture
+def server():
+    httpd = BaseHTTPServer.HTTPServer(('127.0.0.1', 0), StandInHandler)
+    httpd.lock = threading.Lock()
+    httpd.calls = 0
+    httpd.throttle = 1
+    httpd.batches = []
+    thread = threading.Thread(target=httpd.serve_forever)
+    thread.daemon = True
+    thread.start()
+    yield httpd
+    httpd.shutdown()
+    httpd.server_close()
+
+def describe_AirtableWriter():
+    def resolves_record_ids():
+        records = [{"id": "rec1", "fields": {"id": 1}}, {"id": "rec2", "fields": {}}]
+        expect(writeback.AirtableWriter.record_ids(records)) == {1: "rec1"}
+
+    def sends_batches_and_retries(server):
+        writer = writeback.AirtableWriter("app", "Tasks", "key", api_url="http://127.0.0.1:%s/v0" % server.server_port,
+                                          rate=1000, batch_size=10, backoff=0.01)
+        updates = [("rec%d" % i, {"booking": str(i)}) for i in range(25)]
+        expect(writer.update(updates)) == 25
+        expect(writer.requests) == 4
+        expect(sorted(len(records) for path, auth, records in server.batches)) == [5, 10, 10]
+        expect(server.batches[0][:2]) == ("/v0/app/Tasks", "Bearer key")
+        sent = sorted(record["id"] for path, auth, records in server.batches for record in records)
+        expect(sent) == sorted(id for id, fields in updates)
+
+def describe_TokenBucket():
+    def limits_rate():
+        bucket = writeback.TokenBucket(rate=100)
+        start = writeback.time.time()
+        for _ in range(6):
+            bucket.acquire()
+        expect(writeback.time.time() - start >= 0.045) == True
+
+def describe_diff_fields():
+    def keeps_changed_and_new_records():
+        previous = {1: {"booking": "2017-10-10T09:00:00.000Z"}, 2: {"booking": "2017-10-10T09:00:00.000Z"}}
+        current = {1: {"booking": "2017-10-10T09:00:00+00:00"}, 2: {"booking": "2017-10-11T09:00:00+00:00"},
+                   3: {"booking": "2017-10-12T09:00:00+00:00"}}
+        expect(sorted(writeback.diff_fields(current, previous))) == [2, 3]
+
+    def round_trips_snapshots(tmpdir):
+        path = str(tmpdir.join("snapshot.json"))
+        expect(writeback.load_snapshot(path)) == {}
+        writeback.save_snapshot(path, {1: {"booking": "x"}})
+        expect(writeback.load_snapshot(path)) == {1: {"booking": "x"}}
@@ -3,13 +3,13 @@
 import logging
 
 from getpass import getpass
-import argparse, sys, datetime
-from jsonjuggler import *
+import argparse, sys, datetime, re
+from jsonjuggler import DictJuggler
+from juggler import set_logging_level
 import juggler
 
-import dateutil.parser
-
-from airtable import Airtable
+# airtable, dateutil, the cache, the write-back and cProfile are imported in main() when needed,
+# `--help` and argument errors should not pay for them
 
 DEFAULT_LOGLEVEL = 'warning'
 # DEFAULT_OUTPUT = 'export.tjp'
@@ -40,6 +40,15 @@ def main():
     ARGPARSER.add_argument('--dry-run', dest='dryrun', default=False,
                           action='store_true', required=False,
                           help='Do not commit calculation results')
+    ARGPARSER.add_argument('--cache', dest='cache', default=None,
+                          action='store', required=False,
+                          help='Directory to cache scheduling results in, tj3 is not run again for unchanged tasks')
+    ARGPARSER.add_argument('--snapshot', dest='snapshot', default=None,
+                          action='store', required=False,
+                          help='File with the bookings written by the last run, to diff against instead of the loaded records')
+    ARGPARSER.add_argument('--profile', dest='profile', default=None, nargs='?', const='',
+                          action='store', required=False, metavar='PSTATS_FILE',
+                          help='Print time spent per phase, and dump a cProfile of the run to PSTATS_FILE if given')
     # ARGPARSER.add_argument('-o', '--output', dest='output', default=DEFAULT_OUTPUT,
     #                       action='store', required=False,
     #                       help='Output .tjp file for task-juggler')
@@ -49,9 +58,12 @@ def main():
 
     # PASSWORD = getpass('Enter generic password for {user}: '.format(user=ARGS.username))
     
+    from airtable import Airtable
+    import dateutil.parser
     airtable = Airtable(ARGS.base, ARGS.table, api_key=ARGS.apikey)
     
-    data = [x["fields"] for x in airtable.get_all(view=ARGS.view)] 
+    records = airtable.get_all(view=ARGS.view)
+    data = [x["fields"] for x in records]
     for rec in data:
         preference = 0
         if "preference" in rec:
@@ -80,12 +92,40 @@ def main():
             if rec["priority"] >= 250: rec["priority"] = 250
     
     JUGGLER = DictJuggler(data)
-    JUGGLER.run()
+    if ARGS.cache:
+        from cache import JugglerScheduleCache
+        JUGGLER.cache = JugglerScheduleCache(ARGS.cache)
+    if ARGS.profile is not None:
+        JUGGLER.enable_stats()
+    if ARGS.profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.runcall(JUGGLER.run)
+        profiler.dump_stats(ARGS.profile)
+    else:
+        JUGGLER.run()
+    if ARGS.profile is not None:
+        sys.stderr.write(JUGGLER.stats.report() + "\n")
+    if ARGS.cache:
+        log.info('Schedule cache: %s hits, %s misses', JUGGLER.cache.hits, JUGGLER.cache.misses)
     
     if ARGS.dryrun: return
     
-    for t in JUGGLER.walk(juggler.JugglerTask):
-        airtable.update_by_field("id", t.get_id(), {"booking": t.walk(juggler.JugglerBooking)[0].decode()[0].isoformat()})
+    from writeback import AirtableWriter, diff_fields, load_snapshot, save_snapshot
+    writer = AirtableWriter(ARGS.base, ARGS.table, ARGS.apikey)
+    record_ids = writer.record_ids(records) # resolved once, no lookup per task
+    current = dict((t.get_id(), {"booking": t.walk(juggler.JugglerBooking)[0].decode()[0].isoformat()})
+                   for t in JUGGLER.walk(juggler.JugglerTask) if t.get_id() in record_ids)
+    if ARGS.snapshot:
+        previous = load_snapshot(ARGS.snapshot)
+    else:
+        previous = dict((rec["fields"]["id"], rec["fields"]) for rec in records if "id" in rec["fields"])
+    changed = diff_fields(current, previous)
+    updated = writer.update((record_ids[key], fields) for key, fields in changed.items())
+    if ARGS.snapshot:
+        save_snapshot(ARGS.snapshot, current)
+    print("%s tasks: %s changed, %s unchanged, %s records updated in %s requests" % (
+        len(current), len(changed), len(current) - len(changed), updated, writer.requests))
     
 if __name__ == '__main__':  # pragma: no cover
     main()
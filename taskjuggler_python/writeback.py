@@ -0,0 +1,179 @@
+"""
+batched write-back of scheduling results to Airtable
+
+Updates are sent as multi-record PATCH requests on a worker pool, throttled by a shared
+token bucket and retried with exponential backoff when the API answers 429 or 5xx.
+diff_fields() narrows the updates down to the records that actually changed.
+"""
+
+import json, logging, os, threading, time, urllib2
+from multiprocessing.pool import ThreadPool
+
+import dateutil.parser
+
+AIRTABLE_API_URL = 'https://api.airtable.com/v0'
+AIRTABLE_BATCH_SIZE = 10 # maximum records per request accepted by the API
+AIRTABLE_RATE = 5 # requests per second per base
+
+RETRY_CODES = (429, 500, 502, 503, 504)
+
+class TokenBucket(object):
+    '''
+    Thread-safe token bucket rate limiter
+
+    Holds up to burst tokens, refilled at rate tokens per second. acquire() blocks until a
+    token is available, so concurrent workers share one request budget.
+    '''
+
+    def __init__(self, rate, burst=1):
+        self.rate = float(rate)
+        self.burst = burst
+        self.tokens = float(burst)
+        self.stamp = time.time()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.time()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+class AirtableWriter(object):
+    '''Batched, concurrent and rate-limited record updates of one Airtable table'''
+
+    def __init__(self, base, table, api_key, api_url=AIRTABLE_API_URL, rate=AIRTABLE_RATE,
+                 batch_size=AIRTABLE_BATCH_SIZE, max_workers=4, retries=5, backoff=1.0, timeout=30):
+        '''
+        Args:
+            base (str):        Base ID
+            table (str):       Table name or ID
+            api_key (str):     API key
+            api_url (str):     API endpoint, e.g. a local stand-in server for testing
+            rate (float):      Maximum requests per second
+            batch_size (int):  Records per request
+            max_workers (int): Concurrent requests
+            retries (int):     Retries of a batch on 429/5xx responses and connection errors
+            backoff (float):   Initial retry delay in seconds, doubled on every retry
+            timeout (float):   Request timeout in seconds
+        '''
+        self.url = '%s/%s/%s' % (api_url.rstrip('/'), base, urllib2.quote(table))
+        self.api_key = api_key
+        self.bucket = TokenBucket(rate)
+        self.batch_size = batch_size
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.requests = 0
+        self.lock = threading.Lock() # requests is counted by the workers
+
+    @staticmethod
+    def record_ids(records, field='id'):
+        '''
+        Map the values of a field to record ids, from an Airtable get_all() response
+
+        Returns:
+            dict: field value -> record id
+        '''
+        return dict((rec['fields'][field], rec['id']) for rec in records if field in rec['fields'])
+
+    def update(self, updates):
+        '''
+        Update records in batches
+
+        Args:
+            updates (list): (record id, fields dict) tuples
+
+        Returns:
+            int: Number of updated records
+        '''
+        updates = list(updates)
+        batches = [updates[i:i + self.batch_size] for i in range(0, len(updates), self.batch_size)]
+        if not batches:
+            return 0
+        pool = ThreadPool(min(self.max_workers, len(batches)))
+        try:
+            return sum(pool.map(self.send_batch, batches))
+        finally:
+            pool.close()
+            pool.join()
+
+    def send_batch(self, batch):
+        '''Send one batch, retrying throttled and failed requests'''
+        body = json.dumps({'records': [{'id': id, 'fields': fields} for id, fields in batch]})
+        delay = self.backoff
+        for attempt in range(self.retries + 1):
+            self.bucket.acquire()
+            request = urllib2.Request(self.url, body, {'Authorization': 'Bearer ' + self.api_key,
+                                                       'Content-Type': 'application/json'})
+            request.get_method = lambda: 'PATCH'
+            try:
+                with self.lock:
+                    self.requests += 1
+                urllib2.urlopen(request, timeout=self.timeout).read()
+                return len(batch)
+            except urllib2.HTTPError as e:
+                if e.code not in RETRY_CODES or attempt == self.retries:
+                    raise
+                logging.warning('Airtable answered %s, retrying in %ss', e.code, delay)
+            except urllib2.URLError as e:
+                if attempt == self.retries:
+                    raise
+                logging.warning('Airtable request failed (%s), retrying in %ss', e.reason, delay)
+            time.sleep(delay)
+            delay *= 2
+
+def same_value(new, old):
+    '''Compare field values, timestamps by the instant they denote (Airtable reformats dates)'''
+    if new == old:
+        return True
+    if isinstance(new, basestring) and isinstance(old, basestring):
+        try:
+            return dateutil.parser.parse(new) == dateutil.parser.parse(old)
+        except (ValueError, OverflowError, TypeError):
+            return False
+    return False
+
+def diff_fields(current, previous):
+    '''
+    Select the records whose fields changed
+
+    Args:
+        current (dict):  key -> fields computed by this run
+        previous (dict): key -> fields already stored, e.g. the loaded records or a snapshot
+
+    Returns:
+        dict: key -> fields of the new and changed records only
+    '''
+    changed = {}
+    for key, fields in current.items():
+        old = previous.get(key, {})
+        if any(name not in old or not same_value(value, old[name]) for name, value in fields.items()):
+            changed[key] = fields
+    return changed
+
+def load_snapshot(path):
+    '''
+    Load the fields written by the last run, see save_snapshot
+
+    Returns:
+        dict: key -> fields, empty if there is no snapshot yet
+    '''
+    try:
+        with open(path) as snapshot:
+            return dict((key, fields) for key, fields in json.load(snapshot))
+    except IOError:
+        return {}
+
+def save_snapshot(path, fields):
+    '''Store key -> fields as (key, fields) pairs, so non-string keys survive JSON'''
+    tmp = path + '.tmp'
+    with open(tmp, 'w') as snapshot:
+        json.dump(sorted(fields.items()), snapshot)
+    os.rename(tmp, path)